@@ -88,7 +88,8 @@ def main():
 
     # Connect to device.
     print('Connecting to ' + BLE_DEVICE_NAME)
-    ble_touch_detect.connect(device)
+    if not ble_touch_detect.connect(device).result():
+        return EXIT_FAILURE
 
     time.sleep(RATE)
 
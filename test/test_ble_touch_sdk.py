@@ -2,8 +2,13 @@
 
 """ Tests for BleGripperTouchSdk class. """
 
+import asyncio
+import time
+from types import SimpleNamespace
+
 import pytest
 
+from bleak.exc import BleakError
 from pytest_mock import MockerFixture
 
 from touch_detect_sdk.ble_touch_sdk import BleTouchSdk
@@ -12,6 +17,99 @@ from touch_detect_sdk.event import EventSuscriberInterface
 
 TEST_DEVICE_ID = 'PWRON1'
 TEST_MAC = 'DC:EE:FF:C8:6A:10'
+TEST_CONNECT_DELAY = 0.1
+TEST_PARALLEL_CONNECTIONS = 2
+TEST_DEVICES = 5
+TEST_TIMEOUT = 2.0
+TEST_SERVICE_UUID = '0000FE40-CC7A-482A-984A-7F2ED5B3E58F'
+TEST_ADVERTISEMENT_DELAY = 0.02
+# Address, name and services of the devices advertising nearby.
+TEST_ADVERTISERS = [
+    ('AA:00:00:00:00:01', 'PWRON1', [TEST_SERVICE_UUID.lower()]),
+    ('AA:00:00:00:00:02', 'HEADSET', []),
+    ('AA:00:00:00:00:03', None, []),
+    ('AA:00:00:00:00:04', 'PWRON2', []),
+    ('AA:00:00:00:00:01', 'PWRON1', [TEST_SERVICE_UUID.lower()]),
+    ('AA:00:00:00:00:05', 'PWRON3', [TEST_SERVICE_UUID.lower()]),
+]
+
+
+class FakeBleakClient:
+    """Emulates a BleakClient that takes some time to connect.
+    """
+    # Amount of clients connecting now and maximum reached.
+    connecting = 0
+    max_connecting = 0
+
+    def __init__(self, address: str):
+        self.address = address
+        self.notifying = False
+
+    async def connect(self):
+        """Emulates the connection."""
+        FakeBleakClient.connecting += 1
+        FakeBleakClient.max_connecting = max(
+            FakeBleakClient.max_connecting, FakeBleakClient.connecting)
+        await asyncio.sleep(TEST_CONNECT_DELAY)
+        FakeBleakClient.connecting -= 1
+
+    async def start_notify(self, _uuid, _callback):
+        """Emulates enabling notifications."""
+        self.notifying = True
+
+    async def stop_notify(self, _uuid):
+        """Emulates disabling notifications."""
+        self.notifying = False
+
+    async def disconnect(self):
+        """Emulates the disconnection."""
+
+
+class FailingBleakClient(FakeBleakClient):
+    """Emulates a BleakClient that connects but can not enable
+    notifications.
+    """
+    # Amount of clients connected now.
+    connected = 0
+
+    async def connect(self):
+        """Emulates the connection."""
+        FailingBleakClient.connected += 1
+
+    async def start_notify(self, _uuid, _callback):
+        """Emulates a failure enabling notifications."""
+        raise BleakError('Characteristic not found')
+
+    async def disconnect(self):
+        """Emulates the disconnection."""
+        FailingBleakClient.connected -= 1
+
+
+class FakeBleakScanner:
+    """Emulates a BleakScanner receiving TEST_ADVERTISERS repeatedly.
+    """
+
+    def __init__(self, detection_callback, service_uuids=None):
+        self._detection_callback = detection_callback
+        self.service_uuids = service_uuids
+        self._task = None
+
+    async def start(self):
+        """Starts receiving advertisements."""
+        self._task = asyncio.ensure_future(self._advertise())
+
+    async def stop(self):
+        """Stops receiving advertisements."""
+        self._task.cancel()
+
+    async def _advertise(self):
+        while True:
+            for address, name, service_uuids in TEST_ADVERTISERS:
+                await asyncio.sleep(TEST_ADVERTISEMENT_DELAY)
+                self._detection_callback(
+                    SimpleNamespace(address=address, name=name),
+                    SimpleNamespace(local_name=name,
+                                    service_uuids=service_uuids))
 
 
 class EventTester(EventSuscriberInterface):
@@ -93,4 +191,105 @@ class TestBleTouchSdk:
         # Assert
         create_task_mock.assert_called_once()
 
+    def test_parallel_connections(self, mocker: MockerFixture):
+        """All the devices share one loop and connect in parallel up to the
+        limit.
+        """
+        # Arrange
+        mocker.patch("touch_detect_sdk.ble_device.BleakClient",
+                     FakeBleakClient)
+        uut = BleTouchSdk(max_parallel_connections=TEST_PARALLEL_CONNECTIONS)
+        devices = [BleDevice(f'{TEST_MAC[:-1]}{index}', TEST_DEVICE_ID)
+                   for index in range(TEST_DEVICES)]
+        disconnected = []
+
+        def on_disconnected(sender, _earg):
+            disconnected.append(sender)
+        BleDevice.events.subscribe(on_disconnected,
+                                   {BleEventType.DISCONNECTED})
+
+        # Act
+        futures = [uut.connect(device) for device in devices]
+        results = [future.result(TEST_TIMEOUT) for future in futures]
+        loop_thread = uut._loop_thread  # pylint: disable=protected-access
+        for device in devices:
+            uut.disconnect(device)
+        loop_thread.join(TEST_TIMEOUT)
+        BleDevice.events.unsubscribe(on_disconnected)
+
+        # Assert
+        assert all(results)
+        assert FakeBleakClient.max_connecting == TEST_PARALLEL_CONNECTIONS
+        assert set(disconnected) == set(devices)
+        assert not loop_thread.is_alive()
+
+    def test_connect_notify_error(self, mocker: MockerFixture,
+                                  event_tester_setup):
+        """A failure after connecting disconnects the device and reports
+        the error.
+        """
+        # Arrange
+        mocker.patch("touch_detect_sdk.ble_device.BleakClient",
+                     FailingBleakClient)
+        uut = BleTouchSdk()
+        test_device = BleDevice(TEST_MAC, TEST_DEVICE_ID)
+        test_device.events += event_tester_setup
+
+        # Act
+        result = uut.connect(test_device).result(TEST_TIMEOUT)
+        loop_thread = uut._loop_thread  # pylint: disable=protected-access
+        loop_thread.join(TEST_TIMEOUT)
+        retry = uut.connect(test_device)
+
+        # Assert
+        assert not result
+        assert event_tester_setup.type == BleEventType.ERROR_OPENING_PORT
+        assert FailingBleakClient.connected == 0
+        assert not loop_thread.is_alive()
+        assert retry is not None
+        assert not retry.result(TEST_TIMEOUT)
+
+    def test_search_devices_filtered(self, mocker: MockerFixture):
+        """Each matching device is reported once as soon as it is seen.
+        """
+        # Arrange
+        mocker.patch("touch_detect_sdk.ble_touch_sdk.BleakScanner",
+                     FakeBleakScanner)
+        uut = BleTouchSdk()
+        found = []
+        result = []
+
+        # Act
+        thread = uut.search_devices(result.extend, found.append,
+                                    name_pattern='PWRON',
+                                    service_uuids=[TEST_SERVICE_UUID],
+                                    discovery_time=0.3)
+        thread.join(TEST_TIMEOUT)
+
+        # Assert
+        assert [device.address for device in found] == \
+            ['AA:00:00:00:00:01', 'AA:00:00:00:00:05']
+        assert result == found
+
+    def test_search_devices_early_stop(self, mocker: MockerFixture):
+        """The search finishes once all the expected devices were found.
+        """
+        # Arrange
+        mocker.patch("touch_detect_sdk.ble_touch_sdk.BleakScanner",
+                     FakeBleakScanner)
+        uut = BleTouchSdk()
+        result = []
+        start_time = time.monotonic()
+
+        # Act
+        thread = uut.search_devices(
+            result.extend, expected_addresses=['aa:00:00:00:00:04'],
+            discovery_time=TEST_TIMEOUT)
+        thread.join(TEST_TIMEOUT)
+
+        # Assert
+        assert time.monotonic() - start_time < TEST_TIMEOUT / 2
+        assert [device.device_id for device in result] == \
+            ['PWRON1', 'HEADSET', 'PWRON2']
+
 # pylint: enable=redefined-outer-name
@@ -4,7 +4,7 @@
 
 import numpy as np
 
-from touch_detect_sdk.can_touch_sdk import CanFrameDecoder
+from touch_detect_sdk.can_touch_sdk import CanFrameDecoder, CanStreamParser
 
 TEST_VALID_FRAME_1 = bytearray(
     b'\xFF\x00\x53\x00\x02\x80\x41\x80\x6D'
@@ -160,4 +160,92 @@ class TestCanFrameDecoder:
         # Assert
         assert (taxel_data == TAXEL_ARRAY_OF_VALID_PACKAGE).all()
 
+    def test_decode_package_wrong_size(self):
+        """Test decode a package with missing frames
+        """
+        # Act
+        taxel_data = CanFrameDecoder.decode_package(TEST_VALID_PACKAGE[:-1])
+
+        # Assert
+        assert taxel_data is None
+
+    def test_decode_package_batch(self):
+        """Test decode several packages at once
+        """
+        # Arrange
+        package = np.frombuffer(b''.join(TEST_VALID_PACKAGE), dtype=np.uint8)
+        packages = np.tile(package, 3).reshape((3, PACKAGE_SIZE, 22))
+        # Break the end of frame of the second package.
+        packages[1, 4, -1] = 0x00
+
+        # Act
+        taxel_data, valid = CanFrameDecoder.decode_package_batch(packages)
+
+        # Assert
+        assert taxel_data.shape == (3, 6, 6)
+        assert list(valid) == [True, False, True]
+        assert (taxel_data[0] == TAXEL_ARRAY_OF_VALID_PACKAGE).all()
+        assert not taxel_data[1].any()
+        assert (taxel_data[2] == TAXEL_ARRAY_OF_VALID_PACKAGE).all()
+
+    def test_decode_package_bad_order(self):
+        """Test decode a package whose frames are not in order
+        """
+        # Arrange
+        package = TEST_VALID_PACKAGE[1:] + TEST_VALID_PACKAGE[:1]
+
+        # Act
+        _, valid = CanFrameDecoder.decode_package_batch(b''.join(package))
+
+        # Assert
+        assert list(valid) == [False]
+
 # pylint: enable=redefined-outer-name
+
+
+class TestCanStreamParser:
+    """Test CanStreamParser.
+    """
+
+    def test_complete_frames(self):
+        """Test splitting a stream with several complete frames.
+        """
+        # Arrange
+        uut = CanStreamParser()
+
+        # Act
+        frames = uut.feed(b''.join(TEST_VALID_PACKAGE))
+
+        # Assert
+        assert frames == [bytes(frame) for frame in TEST_VALID_PACKAGE]
+        assert uut.discarded_bytes == 0
+
+    def test_split_frame(self):
+        """Test a frame that arrives in two reads.
+        """
+        # Arrange
+        uut = CanStreamParser()
+
+        # Act
+        first_frames = uut.feed(TEST_VALID_FRAME_1[:10])
+        second_frames = uut.feed(TEST_VALID_FRAME_1[10:] + TEST_VALID_FRAME_2)
+
+        # Assert
+        assert not first_frames
+        assert second_frames == [TEST_VALID_FRAME_1, TEST_VALID_FRAME_2]
+
+    def test_resynchronize(self):
+        """Test recovering the frame alignment after invalid data.
+        """
+        # Arrange
+        uut = CanStreamParser()
+
+        # Act
+        frames = uut.feed(TEST_EMBEDDED_FRAME_IN_MESSAGE)
+        frames += uut.feed(TEST_MISSING_END_FRAME + TEST_VALID_FRAME_2)
+
+        # Assert
+        assert len(frames) == 2
+        assert CanFrameDecoder.get_frame_id(frames[0]) == 0x302
+        assert frames[1] == TEST_VALID_FRAME_2
+        assert uut.discarded_bytes > 0
@@ -2,12 +2,36 @@
 
 """ Tests for can_device.py class. """
 
+import os
+import sys
+from threading import Event
+import time
+import tty
+
 import pytest
+from pytest_mock import MockerFixture
+import serial  # pyserial
 
+from touch_detect_sdk.can_device import CanDevice, CanEventType
 from touch_detect_sdk.can_touch_sdk import CanTouchSdk
+from .test_can_frame_decoder import TEST_VALID_PACKAGE, \
+    TAXEL_ARRAY_OF_VALID_PACKAGE
 
 SUPPORTED_DEVICE_DESCRIPTION = 'USB Serial Port'
 SUPPORTED_MANUFACTURERS_LIST = 'FTDI'
+# Maximum time in sec to get the data of a device.
+MAX_LATENCY_SEC = 0.1
+
+
+def open_fake_port() -> tuple:
+    """Opens a pseudo terminal that behaves as a serial port.
+
+    :return: file descriptor to write data and name of the port.
+    :rtype: tuple
+    """
+    master_fd, slave_fd = os.openpty()
+    tty.setraw(slave_fd)
+    return master_fd, os.ttyname(slave_fd)
 
 
 @pytest.fixture
@@ -30,4 +54,38 @@ class TestCanTouchSdk:
         # Assert
         assert default_can_touch_sdk is not None
 
+    @pytest.mark.skipif(sys.platform != "linux", reason="requires linux")
+    def test_quiet_device(self, default_can_touch_sdk,
+                          mocker: MockerFixture):
+        """A device without data does not delay the others.
+        """
+        # Arrange
+        # Pseudo terminals do not have DTR and RTS lines.
+        mocker.patch.object(serial.Serial, 'setDTR')
+        mocker.patch.object(serial.Serial, 'setRTS')
+        active_fd, active_port = open_fake_port()
+        _, quiet_port = open_fake_port()
+        active_device = CanDevice(active_port)
+        quiet_device = CanDevice(quiet_port)
+        new_data = Event()
+
+        def handler(_sender: object, earg: object):
+            if earg.type == CanEventType.NEW_DATA:
+                new_data.set()
+        active_device.events += handler
+        default_can_touch_sdk.connect(quiet_device)
+        default_can_touch_sdk.connect(active_device)
+        time.sleep(0.1)
+
+        # Act
+        os.write(active_fd, b''.join(TEST_VALID_PACKAGE))
+        received = new_data.wait(MAX_LATENCY_SEC)
+        default_can_touch_sdk.disconnect(active_device)
+        default_can_touch_sdk.disconnect(quiet_device)
+
+        # Assert
+        assert received
+        assert (active_device.taxels_array ==
+                TAXEL_ARRAY_OF_VALID_PACKAGE).all()
+
 # pylint: enable=redefined-outer-name
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+""" Tests for device_cache.py class. """
+
+from threading import Event
+from types import SimpleNamespace
+
+import pytest
+from pytest_mock import MockerFixture
+
+from touch_detect_sdk.ble_device import BleDevice
+from touch_detect_sdk.can_device import CanDevice
+from touch_detect_sdk.can_touch_sdk import CanTouchSdk
+from touch_detect_sdk.device_cache import DeviceCache
+from touch_detect_sdk.touch_detect_device import TouchDetectType
+from touch_detect_sdk.wsg_device import WsgDevice
+
+TEST_CAN_PORT = 'ttyUSB0'
+TEST_CAN_NEW_PORT = 'ttyUSB1'
+TEST_SERIAL_NUMBER = 'FT1234'
+TEST_BAUDRATE = 115200
+TEST_BLE_MAC = 'DC:EE:FF:C8:6A:10'
+TEST_BLE_ID = 'PWRON1'
+TEST_WSG_ADDRESS = '192.168.1.20'
+TEST_WSG_PORT = 1031
+TEST_TIMEOUT = 2.0
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    """Path of a cache file that does not exist yet.
+    """
+    yield str(tmp_path / 'cache' / 'devices.json')
+
+
+class TestDeviceCache:
+    """Test DeviceCache
+    """
+
+# pylint: disable=redefined-outer-name
+    def test_save_and_load(self, cache_path):
+        """Devices are created again with the cached settings.
+        """
+        # Arrange
+        uut = DeviceCache(cache_path)
+        uut.update(CanDevice(TEST_CAN_PORT, 'LEFT', (4, 4), TEST_BAUDRATE),
+                   TEST_SERIAL_NUMBER)
+        uut.update(BleDevice(TEST_BLE_MAC, TEST_BLE_ID))
+        uut.update(WsgDevice(TEST_WSG_ADDRESS, TEST_WSG_PORT))
+
+        # Act
+        uut.save()
+        loaded = DeviceCache(cache_path)
+        can_devices = loaded.create_devices(TouchDetectType.CAN)
+        ble_devices = loaded.create_devices(TouchDetectType.BLE)
+        wsg_devices = loaded.create_devices(TouchDetectType.TCP)
+
+        # Assert
+        assert len(loaded.entries()) == 3
+        assert can_devices[0].address == TEST_CAN_PORT
+        assert can_devices[0].name == 'LEFT'
+        assert can_devices[0].taxels_array_size == (4, 4)
+        assert can_devices[0].port_handler.baudrate == TEST_BAUDRATE
+        assert ble_devices[0].device_id == TEST_BLE_ID
+        assert wsg_devices[0].tcp_port == TEST_WSG_PORT
+
+    def test_invalid_file(self, cache_path):
+        """An invalid file results in an empty cache.
+        """
+        # Arrange
+        DeviceCache(cache_path).save()
+        with open(cache_path, 'w', encoding='utf-8') as cache_file:
+            cache_file.write('{"version": 1, "devices": [{"type": "X"')
+
+        # Act
+        uut = DeviceCache(cache_path)
+
+        # Assert
+        assert not uut.entries()
+
+    def test_reconcile(self, cache_path):
+        """Devices are identified by serial number when the port changes.
+        """
+        # Arrange
+        uut = DeviceCache(cache_path)
+        uut.update(CanDevice(TEST_CAN_PORT), TEST_SERIAL_NUMBER)
+        moved_device = CanDevice(TEST_CAN_NEW_PORT)
+        other_device = CanDevice(TEST_CAN_PORT)
+
+        # Act
+        new_devices = uut.reconcile(
+            [moved_device, other_device],
+            {TEST_CAN_NEW_PORT: TEST_SERIAL_NUMBER})
+
+        # Assert
+        assert new_devices == [other_device]
+        addresses = {entry.address for entry in
+                     DeviceCache(cache_path).entries(TouchDetectType.CAN)}
+        assert addresses == {TEST_CAN_NEW_PORT, TEST_CAN_PORT}
+
+    def test_find_cached_devices(self, cache_path, mocker: MockerFixture):
+        """Cached devices are returned at once and the search updates the
+        cache in the background.
+        """
+        # Arrange
+        uut = DeviceCache(cache_path)
+        uut.update(CanDevice(TEST_CAN_PORT))
+        mocker.patch('touch_detect_sdk.can_touch_sdk.comports',
+                     return_value=[SimpleNamespace(
+                         name=TEST_CAN_NEW_PORT, manufacturer='FTDI',
+                         serial_number=TEST_SERIAL_NUMBER)])
+        search_finished = Event()
+        new_devices = []
+
+        def on_search_finished(devices):
+            new_devices.extend(devices)
+            search_finished.set()
+
+        # Act
+        devices = CanTouchSdk.find_cached_devices(uut, on_search_finished)
+        search_finished.wait(TEST_TIMEOUT)
+
+        # Assert
+        assert [device.address for device in devices] == [TEST_CAN_PORT]
+        assert [device.address for device in new_devices] == \
+            [TEST_CAN_NEW_PORT]
+        assert len(DeviceCache(cache_path).entries()) == 2
+
+# pylint: enable=redefined-outer-name
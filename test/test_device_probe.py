@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+""" Tests for device_probe.py class. """
+
+from contextlib import ExitStack
+import os
+import select
+import sys
+from threading import Event, Thread
+import time
+from types import SimpleNamespace
+
+import pytest
+from pytest_mock import MockerFixture
+# pylint: disable=no-name-in-module
+from yahdlc import FRAME_ACK, FRAME_DATA, frame_data
+# pylint: enable=no-name-in-module
+
+from touch_detect_sdk.can_device import CanDevice
+from touch_detect_sdk.device_probe import DeviceProbe
+from touch_detect_sdk.serial_device import ACK_REPLY_FRAME, \
+    GET_DATA_REQUEST_FRAME, SerialDevice
+from touch_detect_sdk.touch_detect_device import TouchDetectType
+from .test_can_frame_decoder import TEST_VALID_PACKAGE
+from .test_can_touch_sdk import open_fake_port
+from .test_data.sensor_data import TEST_RAW_SENSOR_DATA
+
+TEST_PROBE_TIMEOUT = 0.4
+# Time between the packages streamed by the CAN emulator.
+CAN_PACKAGE_PERIOD_SEC = 0.01
+# Extra time allowed for starting the threads of the probe.
+MAX_OVERHEAD_SEC = 0.2
+TEST_PORT_PAIRS = 2
+
+
+class PortEmulator():
+    """Emulates a device behind a pseudo terminal.
+    """
+
+    def __init__(self, master_fd: int, target):
+        self._master_fd = master_fd
+        self._stop = Event()
+        self._thread = Thread(target=target, args=(self,), daemon=True)
+        # Data written by the probe.
+        self.received = b''
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def stopped(self) -> bool:
+        """Checks if the emulator must finish."""
+        return self._stop.is_set()
+
+    def can_task(self):
+        """Streams CAN packages continuously."""
+        while not self.stopped:
+            os.write(self._master_fd, b''.join(TEST_VALID_PACKAGE))
+            time.sleep(CAN_PACKAGE_PERIOD_SEC)
+
+    def serial_task(self):
+        """Replies to GET_DATA requests with sensor data."""
+        while not self.stopped:
+            readable, _, _ = select.select([self._master_fd], [], [], 0.01)
+            if readable:
+                request = os.read(self._master_fd, 1024)
+                self.received += request
+                if GET_DATA_REQUEST_FRAME not in request:
+                    continue
+                os.write(self._master_fd,
+                         frame_data(bytes(TEST_RAW_SENSOR_DATA),
+                                    FRAME_DATA, 0) +
+                         frame_data('', FRAME_ACK, 2))
+
+    def quiet_task(self):
+        """Consumes the requests without answering."""
+        while not self.stopped:
+            readable, _, _ = select.select([self._master_fd], [], [], 0.01)
+            if readable:
+                os.read(self._master_fd, 1024)
+
+
+class TestDeviceProbe:
+    """Test DeviceProbe
+    """
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="requires linux")
+    def test_probe_ports(self):
+        """Ports are probed in parallel and classified by transport.
+        """
+        # Arrange
+        ports = {}
+        emulators = []
+        for task in [PortEmulator.can_task, PortEmulator.serial_task,
+                     PortEmulator.quiet_task]:
+            for _ in range(TEST_PORT_PAIRS):
+                master_fd, port = open_fake_port()
+                ports.setdefault(task.__name__, []).append(port)
+                emulators.append(PortEmulator(master_fd, task))
+        all_ports = [port for names in ports.values() for port in names]
+        all_ports.append('/dev/does_not_exist')
+
+        # Act
+        with ExitStack() as stack:
+            for emulator in emulators:
+                stack.enter_context(emulator)
+            start_time = time.perf_counter()
+            result = DeviceProbe.probe_ports(all_ports, TEST_PROBE_TIMEOUT)
+            elapsed_time = time.perf_counter() - start_time
+
+        # Assert
+        assert result[TouchDetectType.CAN] == ports['can_task']
+        assert result[TouchDetectType.SERIAL] == ports['serial_task']
+        assert elapsed_time < TEST_PROBE_TIMEOUT + MAX_OVERHEAD_SEC
+        # Serial devices got the ACK that ends the transaction.
+        for emulator in emulators[TEST_PORT_PAIRS:2 * TEST_PORT_PAIRS]:
+            assert emulator.received.endswith(ACK_REPLY_FRAME)
+
+    def test_probe_candidate_ports(self, mocker: MockerFixture):
+        """Only ports of supported manufacturers are probed by default.
+        """
+        # Arrange
+        mocker.patch('touch_detect_sdk.device_probe.comports',
+                     return_value=[
+                         SimpleNamespace(device='/dev/ttyUSB0',
+                                         manufacturer='FTDI'),
+                         SimpleNamespace(device='/dev/ttyACM0',
+                                         manufacturer='Arduino')])
+        probe_mock = mocker.patch(
+            'touch_detect_sdk.device_probe.DeviceProbe._probe_port',
+            return_value=None)
+
+        # Act
+        DeviceProbe.probe_ports()
+        candidate_ports = [call.args[0] for call in probe_mock.call_args_list]
+        probe_mock.reset_mock()
+        DeviceProbe.probe_ports(probe_unknown_ports=True)
+        all_ports = [call.args[0] for call in probe_mock.call_args_list]
+
+        # Assert
+        assert candidate_ports == ['/dev/ttyUSB0']
+        assert sorted(all_ports) == ['/dev/ttyACM0', '/dev/ttyUSB0']
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="requires linux")
+    def test_find_devices(self):
+        """A device of the right class is created for each port.
+        """
+        # Arrange
+        can_fd, can_port = open_fake_port()
+        serial_fd, serial_port = open_fake_port()
+
+        # Act
+        with PortEmulator(can_fd, PortEmulator.can_task), \
+                PortEmulator(serial_fd, PortEmulator.serial_task):
+            devices = DeviceProbe.find_devices([serial_port, can_port],
+                                               TEST_PROBE_TIMEOUT)
+
+        # Assert
+        assert [type(device) for device in devices] == \
+            [CanDevice, SerialDevice]
+        assert [device.address for device in devices] == \
+            [can_port, serial_port]
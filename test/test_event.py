@@ -2,12 +2,26 @@
 
 """ Tests for event.py class. """
 
-from threading import Thread
+from threading import Event as ThreadEvent, Thread, current_thread
+import time
 
-from touch_detect_sdk.event import Event, EventSuscriberInterface
+import pytest
+
+from touch_detect_sdk.event import Event, EventChannel, \
+    EventOverflowPolicy, EventSuscriberInterface
 
 DEFAULT_DESCRIPTION = 'Testing Event'
 TEST_MESSAGE = 'test'
+TEST_DATA_TYPE = 'data'
+TEST_STATUS_TYPE = 'status'
+
+
+class TypedEventData():
+    """Helper class for event data with a type.
+    """
+
+    def __init__(self, event_type: str):
+        self.type = event_type
 
 
 class Publisher():
@@ -26,6 +40,22 @@ class Publisher():
         self.event(earg)
 
 
+class Device():
+    """Helper class for testing event channels
+    """
+
+    # Set event channel in class declaration.
+    events = EventChannel(DEFAULT_DESCRIPTION)
+
+    def fire_event(self, earg: object = None):
+        """Fires the event of the device.
+
+        :param earg: parameters to send through the event, defaults to None
+        :type earg: object, optional
+        """
+        self.events(earg)
+
+
 class Suscriber1(EventSuscriberInterface):
     """Suscriber for events.
     """
@@ -34,12 +64,14 @@ class Suscriber1(EventSuscriberInterface):
         super().__init__()
         self.handler_data = 0
         self.earg = None
+        self.sender = None
 
     def touch_detect_event(self, sender: object, earg: object):
         """Implement function function called on event
         """
         self.handler_data += 1
         self.earg = earg
+        self.sender = sender
 
 
 class Suscriber2(EventSuscriberInterface):
@@ -50,12 +82,52 @@ class Suscriber2(EventSuscriberInterface):
         super().__init__()
         self.handler_data = 0
         self.earg = None
+        self.sender = None
 
     def touch_detect_event(self, sender: object, earg: object):
         """Implement function function called on event
         """
         self.handler_data += 1
         self.earg = earg
+        self.sender = sender
+
+
+class SelfRemovingSuscriber(EventSuscriberInterface):
+    """Suscriber that modifies the event while it is being fired.
+    """
+
+    def __init__(self, event: Event, new_suscriber: EventSuscriberInterface):
+        super().__init__()
+        self.handler_data = 0
+        self._event = event
+        self._new_suscriber = new_suscriber
+
+    def touch_detect_event(self, sender: object, earg: object):
+        """Implement function function called on event
+        """
+        self.handler_data += 1
+        self._event -= self
+        self._event += self._new_suscriber
+
+
+class BlockingSuscriber(EventSuscriberInterface):
+    """Suscriber that waits until it is released.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.release = ThreadEvent()
+        self.started = ThreadEvent()
+        self.eargs = []
+        self.threads = set()
+
+    def touch_detect_event(self, sender: object, earg: object):
+        """Implement function function called on event
+        """
+        self.started.set()
+        self.release.wait()
+        self.eargs.append(earg)
+        self.threads.add(current_thread())
 
 
 class TestEvent:
@@ -193,4 +265,302 @@ class TestEvent:
         assert suscriber_1.handler_data == 2
         assert suscriber_1.earg == TEST_MESSAGE
 
+    def test_modify_while_firing(self):
+        """Add and remove suscribers from inside the event.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        suscriber_1 = Suscriber1()
+        suscriber_2 = Suscriber2()
+        removing_suscriber = SelfRemovingSuscriber(uut, suscriber_2)
+        uut += removing_suscriber
+        uut += suscriber_1
+
+        # Act
+        uut()
+        uut()
+
+        # Assert. Changes are only visible on the next call.
+        assert removing_suscriber.handler_data == 1
+        assert suscriber_1.handler_data == 2
+        assert suscriber_2.handler_data == 1
+
+    def test_async_delivery(self):
+        """Deliver events from the dispatcher thread.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        suscriber = BlockingSuscriber()
+        suscriber.release.set()
+        uut += suscriber
+        uut.enable_async_delivery()
+
+        # Act
+        for index in range(10):
+            uut(index)
+        uut.disable_async_delivery()
+
+        # Assert
+        assert suscriber.eargs == list(range(10))
+        assert current_thread() not in suscriber.threads
+        assert uut.dispatcher is None
+
+    def test_async_drop_oldest(self):
+        """Drop the oldest events when the queue is full.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        suscriber = BlockingSuscriber()
+        uut += suscriber
+        dispatcher = uut.enable_async_delivery(
+            max_size=2, overflow_policy=EventOverflowPolicy.DROP_OLDEST)
+
+        # Act. First event blocks the dispatcher, the rest are queued.
+        uut(0)
+        suscriber.started.wait()
+        for index in range(1, 5):
+            uut(index)
+        dropped_events = dispatcher.dropped_events
+        suscriber.release.set()
+        uut.disable_async_delivery()
+
+        # Assert
+        assert dropped_events == 2
+        assert suscriber.eargs == [0, 3, 4]
+
+    def test_async_drop_newest(self):
+        """Drop the newest events when the queue is full.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        suscriber = BlockingSuscriber()
+        uut += suscriber
+        dispatcher = uut.enable_async_delivery(
+            max_size=2, overflow_policy=EventOverflowPolicy.DROP_NEWEST)
+
+        # Act. First event blocks the dispatcher, the rest are queued.
+        uut(0)
+        suscriber.started.wait()
+        for index in range(1, 5):
+            uut(index)
+        dropped_events = dispatcher.dropped_events
+        suscriber.release.set()
+        uut.disable_async_delivery()
+
+        # Assert
+        assert dropped_events == 2
+        assert suscriber.eargs == [0, 1, 2]
+
+    def test_async_block(self):
+        """Block the caller when the queue is full.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        suscriber = BlockingSuscriber()
+        uut += suscriber
+        dispatcher = uut.enable_async_delivery(
+            max_size=1, overflow_policy=EventOverflowPolicy.BLOCK)
+        uut(0)
+        suscriber.started.wait()
+        uut(1)
+
+        # Act. This call waits until the suscriber is released.
+        caller = Thread(target=uut, args=(2,))
+        caller.start()
+        caller.join(0.1)
+        blocked = caller.is_alive()
+        suscriber.release.set()
+        caller.join()
+        uut.disable_async_delivery()
+
+        # Assert
+        assert blocked
+        assert dispatcher.dropped_events == 0
+        assert suscriber.eargs == [0, 1, 2]
+
+    def test_async_block_stop(self):
+        """A caller blocked when the dispatcher stops delivers its event.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        suscriber = BlockingSuscriber()
+        uut += suscriber
+        dispatcher = uut.enable_async_delivery(
+            max_size=1, overflow_policy=EventOverflowPolicy.BLOCK)
+        uut(0)
+        suscriber.started.wait()
+        uut(1)
+        caller = Thread(target=uut, args=(2,))
+        caller.start()
+
+        # Act. Stop while the caller is waiting for space in the queue.
+        stopper = Thread(target=dispatcher.stop)
+        stopper.start()
+        time.sleep(0.1)
+        suscriber.release.set()
+        caller.join()
+        stopper.join()
+
+        # Assert
+        assert sorted(suscriber.eargs) == [0, 1, 2]
+        assert caller in suscriber.threads
+
+    def test_channel_per_instance(self):
+        """Suscribers of a device only receive events of that device.
+        """
+
+        # Arrange
+        device_1 = Device()
+        device_2 = Device()
+        suscriber_1 = Suscriber1()
+        suscriber_2 = Suscriber2()
+        device_1.events += suscriber_1
+        device_2.events += suscriber_2
+
+        # Act
+        device_1.fire_event(TEST_MESSAGE)
+        device_1.fire_event(TEST_MESSAGE)
+        device_2.fire_event()
+
+        # Assert
+        assert suscriber_1.handler_data == 2
+        assert suscriber_1.sender is device_1
+        assert suscriber_2.handler_data == 1
+        assert suscriber_2.sender is device_2
+        assert device_1.events is not device_2.events
+
+    def test_channel_class_wide(self):
+        """Suscribers of the class receive events of all the devices.
+        """
+
+        # Arrange
+        device_1 = Device()
+        device_2 = Device()
+        suscriber_1 = Suscriber1()
+        Device.events += suscriber_1
+
+        # Act
+        device_1.fire_event()
+        device_2.fire_event(TEST_MESSAGE)
+        Device.events -= suscriber_1
+        device_1.fire_event()
+
+        # Assert
+        assert isinstance(Device.__dict__['events'], EventChannel)
+        assert suscriber_1.handler_data == 2
+        assert suscriber_1.sender is device_2
+        assert suscriber_1.earg == TEST_MESSAGE
+
+    def test_subscribe_types(self):
+        """Suscribers only receive the types of event they asked for.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        data_suscriber = Suscriber1()
+        all_suscriber = Suscriber2()
+        uut.subscribe(data_suscriber, types={TEST_DATA_TYPE})
+        uut.subscribe(all_suscriber)
+
+        # Act
+        uut(TypedEventData(TEST_DATA_TYPE))
+        uut(TypedEventData(TEST_STATUS_TYPE))
+        uut(TEST_MESSAGE)
+
+        # Assert
+        assert data_suscriber.handler_data == 1
+        assert data_suscriber.earg.type == TEST_DATA_TYPE
+        assert all_suscriber.handler_data == 3
+
+    def test_subscribe_callable(self):
+        """Plain callables can suscribe and unsuscribe.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        received = []
+
+        def handler(sender: object, earg: object):
+            received.append((sender, earg))
+
+        def status_handler(sender: object, earg: object):
+            received.append((sender, earg.type))
+        uut += handler
+        uut.subscribe(status_handler, types={TEST_STATUS_TYPE})
+
+        # Act
+        uut(TEST_MESSAGE)
+        uut -= handler
+        uut(TEST_MESSAGE)
+
+        # Assert
+        assert received == [(uut, TEST_MESSAGE)]
+
+    def test_subscribe_invalid(self):
+        """Objects that can not be called are rejected.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+
+        # Act and Assert
+        with pytest.raises(TypeError):
+            uut.subscribe(TEST_MESSAGE)
+
+    def test_conflated_latest_data(self):
+        """Conflated suscribers only receive the most recent data.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        received = []
+
+        def handler(sender: object, earg: object):
+            received.append((sender, earg))
+        data_events = [TypedEventData(TEST_DATA_TYPE) for _ in range(100)]
+        suscriber = uut.subscribe_conflated(handler, 10.0, {TEST_DATA_TYPE})
+
+        # Act
+        for earg in data_events:
+            uut(earg)
+        time.sleep(0.3)
+        uut.unsubscribe(suscriber)
+
+        # Assert
+        assert 0 < len(received) < len(data_events)
+        assert received[-1] == (uut, data_events[-1])
+        assert suscriber.conflated_events > 0
+
+    def test_conflated_control_events(self):
+        """Control events are delivered immediately after pending data.
+        """
+
+        # Arrange
+        uut = Event(DEFAULT_DESCRIPTION)
+        received = []
+
+        def handler(_sender: object, earg: object):
+            received.append(earg)
+        data_event = TypedEventData(TEST_DATA_TYPE)
+        status_events = [TypedEventData(TEST_STATUS_TYPE) for _ in range(3)]
+        suscriber = uut.subscribe_conflated(handler, 1.0, {TEST_DATA_TYPE})
+        # Let the first tick of the timer pass.
+        time.sleep(0.1)
+
+        # Act
+        uut(TypedEventData(TEST_DATA_TYPE))
+        uut(data_event)
+        for earg in status_events:
+            uut(earg)
+        uut.unsubscribe(suscriber)
+
+        # Assert
+        assert received == [data_event] + status_events
+
 # pylint: enable=redefined-outer-name
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+""" Tests for frame_history.py class. """
+
+import numpy as np
+import pytest
+
+from touch_detect_sdk.frame_history import FrameHistory
+from touch_detect_sdk.touch_detect_device import TouchDetectDevice
+
+TEST_CAPACITY = 4
+TEST_ROWS = 2
+TEST_COLS = 3
+TEST_FRAMES = 10
+
+
+@pytest.fixture
+def full_history():
+    """History that received more frames than its capacity. Frame i is
+    filled with i and arrived at time i.
+    """
+    history = FrameHistory(TEST_CAPACITY, TEST_ROWS, TEST_COLS)
+    for index in range(TEST_FRAMES):
+        history.append(np.full((TEST_ROWS, TEST_COLS), index), index)
+    yield history
+    del history
+
+
+class TestFrameHistory:
+    """Test FrameHistory
+    """
+
+# pylint: disable=redefined-outer-name
+    def test_latest(self, full_history):
+        """The newest frames are returned in order after wrapping around.
+        """
+        # Act
+        window = full_history.latest(3)
+        all_frames = full_history.latest(TEST_FRAMES)
+
+        # Assert
+        assert list(window.sequence_numbers) == [7, 8, 9]
+        assert list(window.frames[:, 0, 0]) == [7, 8, 9]
+        assert list(all_frames.timestamps) == [6, 7, 8, 9]
+        assert len(full_history) == TEST_CAPACITY
+        assert full_history.frame_count == TEST_FRAMES
+
+    def test_since(self, full_history):
+        """Frames are selected by their timestamp.
+        """
+        # Act
+        window = full_history.since(7.5)
+        old_window = full_history.since(0)
+        empty_window = full_history.since(100)
+
+        # Assert
+        assert list(window.sequence_numbers) == [8, 9]
+        assert list(old_window.sequence_numbers) == [6, 7, 8, 9]
+        assert len(empty_window) == 0
+
+    def test_window_is_readonly_view(self, full_history):
+        """Windows share the memory of the history and can not be written.
+        """
+        # Act
+        window = full_history.latest(TEST_CAPACITY)
+        copied_window = window.copy()
+        full_history.append(np.zeros((TEST_ROWS, TEST_COLS)))
+
+        # Assert
+        assert not window.frames.flags.writeable
+        with pytest.raises(ValueError):
+            window.frames[0, 0, 0] = 1
+        assert window.frames.base is not None
+        assert list(copied_window.sequence_numbers) == [6, 7, 8, 9]
+
+    def test_window_overwritten(self, full_history):
+        """A window of the whole capacity is overwritten by the next append
+        and copies taken before remain valid.
+        """
+        # Arrange
+        window = full_history.latest(TEST_CAPACITY)
+        copied_window = window.copy()
+        intact_before = full_history.is_intact(copied_window)
+
+        # Act
+        full_history.append(np.full((TEST_ROWS, TEST_COLS), 99))
+
+        # Assert
+        assert intact_before
+        assert not full_history.is_intact(window)
+        assert not full_history.is_intact(copied_window)
+        assert list(window.sequence_numbers) == [10, 7, 8, 9]
+        assert list(copied_window.frames[:, 0, 0]) == [6, 7, 8, 9]
+
+    def test_window_partly_lost(self, full_history):
+        """A window of n frames survives capacity - n appends.
+        """
+        # Arrange
+        window = full_history.latest(2)
+
+        # Act
+        for _ in range(TEST_CAPACITY - 2):
+            full_history.append(np.zeros((TEST_ROWS, TEST_COLS)))
+        intact = full_history.is_intact(window)
+        sequence_numbers = list(window.sequence_numbers)
+        full_history.append(np.zeros((TEST_ROWS, TEST_COLS)))
+
+        # Assert
+        assert intact
+        assert sequence_numbers == [8, 9]
+        assert not full_history.is_intact(window)
+        assert list(window.sequence_numbers) == [12, 9]
+
+    def test_monotonic_timestamps(self):
+        """Timestamps never decrease, so binary search is valid.
+        """
+        # Arrange
+        uut = FrameHistory(TEST_CAPACITY, TEST_ROWS, TEST_COLS)
+
+        # Act
+        uut.append(np.zeros((TEST_ROWS, TEST_COLS)), 5.0)
+        uut.append(np.zeros((TEST_ROWS, TEST_COLS)), 4.0)
+
+        # Assert
+        assert list(uut.latest(2).timestamps) == [5.0, 5.0]
+
+    def test_invalid_capacity(self):
+        """The history must store at least one frame.
+        """
+        # Act and Assert
+        with pytest.raises(ValueError):
+            FrameHistory(0, TEST_ROWS, TEST_COLS)
+
+    def test_device_history(self):
+        """Taxel arrays written to the device are stored in its history.
+        """
+        # Arrange
+        uut = TouchDetectDevice(taxels_array_size=(TEST_ROWS, TEST_COLS))
+        history = uut.enable_history(TEST_CAPACITY)
+
+        # Act
+        for index in range(3):
+            uut.taxels_array = np.full((TEST_ROWS, TEST_COLS), index)
+        uut.disable_history()
+        uut.taxels_array = np.zeros((TEST_ROWS, TEST_COLS))
+
+        # Assert
+        assert uut.history is None
+        assert history.latest(3).frames.dtype == np.uint16
+        assert list(history.latest(3).frames[:, 0, 0]) == [0, 1, 2]
+        assert history.frame_count == 3
+
+# pylint: enable=redefined-outer-name
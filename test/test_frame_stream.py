@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+""" Tests for frame_stream.py class. """
+
+import asyncio
+from threading import Thread
+
+import pytest
+
+from touch_detect_sdk.can_device import CanDevice, CanEventType
+from touch_detect_sdk.touch_detect_device import TouchDetectDevice
+
+TEST_CAN_NAME = 'TOUCH_DETECT_LEFT'
+TEST_CAN_PORT = 'COM1'
+TEST_FRAMES = 10
+
+
+@pytest.fixture
+def default_can_device():
+    """Setup unit under test.
+    """
+    can_device = CanDevice(TEST_CAN_PORT, TEST_CAN_NAME)
+    yield can_device
+    del can_device
+
+
+def fire_frames(device: CanDevice, amount: int):
+    """Fire data events followed by a disconnection from a thread.
+
+    :param device: device that fires the events.
+    :type device: CanDevice
+    :param amount: amount of data events.
+    :type amount: int
+    """
+    for index in range(amount):
+        device.fire_event(CanEventType.NEW_DATA, index)
+    device.fire_event(CanEventType.DISCONNECTED)
+
+
+class TestFrameStream:
+    """Test FrameStream
+    """
+
+# pylint: disable=redefined-outer-name
+    def test_frames_from_thread(self, default_can_device):
+        """Frames fired from another thread reach the loop in order.
+        """
+
+        # Arrange
+        async def consume():
+            frames = default_can_device.frames()
+            thread = Thread(target=fire_frames,
+                            args=(default_can_device, TEST_FRAMES))
+            thread.start()
+            result = [frame async for frame in frames]
+            thread.join()
+            return result
+
+        # Act
+        result = asyncio.run(consume())
+
+        # Assert
+        assert [frame.data for frame in result] == list(range(TEST_FRAMES))
+        assert all(frame.timestamp > 0 for frame in result)
+
+    def test_frames_drop_oldest(self, default_can_device):
+        """The oldest frames are dropped when the queue is full.
+        """
+
+        # Arrange
+        async def consume():
+            frames = default_can_device.frames(max_size=3)
+            # Frames are fired before the loop gets the chance to run.
+            fire_frames(default_can_device, TEST_FRAMES)
+            result = [frame.data async for frame in frames]
+            return result, frames.dropped_frames
+
+        # Act
+        result, dropped_frames = asyncio.run(consume())
+
+        # Assert
+        assert result == [TEST_FRAMES - 2, TEST_FRAMES - 1]
+        assert dropped_frames == TEST_FRAMES - 2
+
+    def test_frames_close(self, default_can_device):
+        """Closing the stream finishes the iteration and unsuscribes.
+        """
+
+        # Arrange
+        async def consume():
+            async with default_can_device.frames() as frames:
+                default_can_device.fire_event(CanEventType.NEW_DATA, 1)
+                # anext() is not available in Python 3.9.
+                # pylint: disable=unnecessary-dunder-call
+                first_frame = await frames.__anext__()
+                # pylint: enable=unnecessary-dunder-call
+            default_can_device.fire_event(CanEventType.NEW_DATA, 2)
+            remaining = [frame async for frame in frames]
+            return first_frame, remaining
+
+        # Act
+        first_frame, remaining = asyncio.run(consume())
+
+        # Assert
+        assert first_frame.data == 1
+        assert not remaining
+
+    def test_frames_disconnect_pending(self, default_can_device):
+        """A disconnection while frames wait for the loop unsuscribes.
+        """
+
+        # Arrange
+        async def consume():
+            frames = default_can_device.frames()
+            # Both events are fired before the loop gets the chance to run.
+            fire_frames(default_can_device, 1)
+            # pylint: disable=protected-access
+            suscribers = default_can_device.events._getfunctionlist()
+            # pylint: enable=protected-access
+            subscribed = frames in suscribers
+            result = [frame.data async for frame in frames]
+            return subscribed, result
+
+        # Act
+        subscribed, result = asyncio.run(consume())
+
+        # Assert
+        assert not subscribed
+        assert result == [0]
+
+    def test_frames_not_implemented(self):
+        """Devices without data events can not be streamed.
+        """
+
+        # Arrange
+        uut = TouchDetectDevice()
+
+        # Act and Assert
+        with pytest.raises(NotImplementedError):
+            uut.frames()
+
+# pylint: enable=redefined-outer-name
@@ -3,16 +3,19 @@
 """ Tests for Serial touch detect SDK """
 
 import math
+import statistics
 import time
 
 import pytest
 
 from touch_detect_sdk.periodic_timer import PeriodicTimer, \
-    PeriodicTimerSuscriber
+    PeriodicTimerSuscriber, TimerScheduler
 
 TEST_PERIOD = 0.020
 TEST_TIMER_RUNNING_TIME = 3.0
 MAX_ERROR_PERCENTAGE = 2.0
+TEST_LONG_PERIOD = 10.0
+TEST_SLOW_CALLBACK_TIME = 0.050
 
 
 class MockPeriodicTimerSuscriber(PeriodicTimerSuscriber):
@@ -21,11 +24,24 @@ class MockPeriodicTimerSuscriber(PeriodicTimerSuscriber):
     def __init__(self) -> None:
         super().__init__()
         self.callback_count = 0
+        self.call_times = []
 
     def on_timer_event(self):
         """Mock function for on_timer_event.
         """
         self.callback_count += 1
+        self.call_times.append(time.perf_counter())
+
+
+class SlowPeriodicTimerSuscriber(MockPeriodicTimerSuscriber):
+    """Suscriber that takes longer than the period of the timer.
+    """
+
+    def on_timer_event(self):
+        """Count the call and block the timer.
+        """
+        super().on_timer_event()
+        time.sleep(TEST_SLOW_CALLBACK_TIME)
 
 
 @pytest.fixture
@@ -70,4 +86,133 @@ class TestPeriodicTimer:
         error = math.floor(error)
         assert error <= MAX_ERROR_PERCENTAGE
 
-# # pylint: enable=redefined-outer-name
+    def test_timer_does_not_spin(self, default_periodic_timer):
+        """The timer sleeps between ticks instead of using the CPU.
+        """
+        # Arrange
+        suscriber_mock = MockPeriodicTimerSuscriber()
+        start_time = time.process_time()
+
+        # Act
+        default_periodic_timer.start(suscriber_mock, TEST_PERIOD)
+        time.sleep(1.0)
+        default_periodic_timer.stop()
+
+        # Assert
+        assert time.process_time() - start_time < 0.5
+
+    def test_stop_wakes_up_timer(self, default_periodic_timer):
+        """Stopping does not wait for the end of the period.
+        """
+        # Arrange
+        suscriber_mock = MockPeriodicTimerSuscriber()
+        default_periodic_timer.start(suscriber_mock, TEST_LONG_PERIOD)
+
+        # Act
+        start_time = time.perf_counter()
+        default_periodic_timer.stop()
+
+        # Assert
+        assert time.perf_counter() - start_time < 1.0
+        assert suscriber_mock.callback_count == 1
+
+    def test_overruns(self, default_periodic_timer):
+        """Slow callbacks are counted and late ticks are skipped.
+        """
+        # Arrange
+        suscriber_mock = SlowPeriodicTimerSuscriber()
+
+        # Act
+        default_periodic_timer.start(suscriber_mock, TEST_PERIOD)
+        time.sleep(0.5)
+        default_periodic_timer.stop()
+
+        # Assert
+        assert default_periodic_timer.overruns > 0
+        assert default_periodic_timer.missed_deadlines > 0
+        assert suscriber_mock.callback_count <= \
+            0.5 / TEST_SLOW_CALLBACK_TIME + 1
+
+    def test_scheduler_periods(self):
+        """Suscribers with different periods share one scheduler.
+        """
+        # Arrange
+        uut = TimerScheduler()
+        fast_suscriber = MockPeriodicTimerSuscriber()
+        slow_suscriber = MockPeriodicTimerSuscriber()
+
+        # Act
+        uut.add(fast_suscriber, TEST_PERIOD)
+        uut.add(slow_suscriber, 2 * TEST_PERIOD)
+        time.sleep(TEST_TIMER_RUNNING_TIME)
+        uut.remove(fast_suscriber)
+        uut.remove(slow_suscriber)
+
+        # Assert
+        expected_count = TEST_TIMER_RUNNING_TIME / TEST_PERIOD
+        for suscriber, count in ((fast_suscriber, expected_count),
+                                 (slow_suscriber, expected_count / 2)):
+            error = abs((suscriber.callback_count / count - 1.0) * 100.0)
+            assert math.floor(error) <= MAX_ERROR_PERCENTAGE
+
+    def test_scheduler_staggering(self):
+        """Suscribers with the same period are not called at once.
+        """
+        # Arrange
+        uut = TimerScheduler()
+        suscribers = [MockPeriodicTimerSuscriber() for _ in range(4)]
+
+        # Act
+        for suscriber in suscribers:
+            uut.add(suscriber, TEST_PERIOD)
+        time.sleep(0.5)
+        for suscriber in suscribers:
+            uut.remove(suscriber)
+
+        # Assert
+        phases = sorted((suscriber.call_times[-1] - suscribers[0].call_times[
+            -1]) % TEST_PERIOD for suscriber in suscribers)
+        gaps = [second - first for first, second in zip(phases, phases[1:])]
+        assert min(gaps) > TEST_PERIOD / 10
+
+    def test_scheduler_epoch(self):
+        """Phases are kept for suscribers added at different times.
+        """
+        # Arrange
+        uut = TimerScheduler()
+        first_suscriber = MockPeriodicTimerSuscriber()
+        second_suscriber = MockPeriodicTimerSuscriber()
+
+        # Act
+        uut.add(first_suscriber, TEST_PERIOD, phase=0.0)
+        time.sleep(6.5 * TEST_PERIOD)
+        uut.add(second_suscriber, TEST_PERIOD, phase=TEST_PERIOD / 2)
+        time.sleep(0.3)
+        uut.remove(first_suscriber)
+        uut.remove(second_suscriber)
+
+        # Assert
+        offset = statistics.median(
+            (call_time - first_suscriber.call_times[0]) % TEST_PERIOD
+            for call_time in second_suscriber.call_times)
+        assert abs(offset - TEST_PERIOD / 2) < TEST_PERIOD / 5
+
+    def test_scheduler_remove(self):
+        """Removed suscribers are not called again.
+        """
+        # Arrange
+        uut = TimerScheduler()
+        suscriber_mock = MockPeriodicTimerSuscriber()
+        uut.add(suscriber_mock, TEST_PERIOD, phase=0.0)
+        time.sleep(0.2)
+
+        # Act
+        uut.remove(suscriber_mock)
+        callback_count = suscriber_mock.callback_count
+        time.sleep(0.2)
+
+        # Assert
+        assert callback_count > 0
+        assert suscriber_mock.callback_count == callback_count
+
+# pylint: enable=redefined-outer-name
@@ -19,7 +19,9 @@ from yahdlc import (
 # pylint: enable=no-name-in-module
 
 from touch_detect_sdk.event import EventSuscriberInterface
-from touch_detect_sdk.serial_device import SerialDevice, SerialEventType
+from touch_detect_sdk.periodic_timer import TimerScheduler
+from touch_detect_sdk.serial_device import HdlcDeframer, \
+    HdlcRequestWindow, SerialDevice, SerialEventType
 from .test_data.sensor_data import TEST_RAW_SENSOR_DATA, \
     TEST_CONVERTED_TAXEL_DATA
 
@@ -104,6 +106,33 @@ class SerialDeviceEmulator():
             time.sleep(DEFAULT_TIMEOUT_SEC)
 
 
+class WindowedDeviceEmulator(SerialDeviceEmulator):
+    """Emulates a device that replies to every request with its sequence
+    number and never replies to one of them.
+    """
+
+    def __init__(self, port, lost_sequence_number: int):
+        super().__init__(port)
+        self._lost_sequence_number = lost_sequence_number
+        self._deframer = HdlcDeframer()
+
+    def data_task(self):
+        """Task for handling packages from the SDK.
+        """
+        self._communication_started = True
+        while not self._stop_wsg_data_loop.is_set():
+            for frame in self._deframer.feed(self._serial_port.read_all()):
+                data, frame_type, sequence_number = get_data(bytes(frame))
+                if frame_type != FRAME_DATA or \
+                        data != SERIAL_COMMAND_GET_DATA or \
+                        sequence_number == self._lost_sequence_number:
+                    continue
+                self._serial_port.write(frame_data(
+                    bytes(TEST_RAW_SENSOR_DATA), FRAME_DATA,
+                    sequence_number) + frame_data('', FRAME_ACK, 2))
+            time.sleep(0.005)
+
+
 class Suscriber(EventSuscriberInterface):
     """Suscriber for events.
     """
@@ -114,6 +143,7 @@ class Suscriber(EventSuscriberInterface):
         self.connect_and_then_data = False
         self.disconnected = False
         self.new_data_event = False
+        self.new_data_count = 0
         self.error_opening_port = False
         self.data = None
 
@@ -126,6 +156,7 @@ class Suscriber(EventSuscriberInterface):
                 self.connect_and_then_data = True
         elif earg.type == SerialEventType.NEW_DATA:
             self.new_data_event = True
+            self.new_data_count += 1
             self.data = earg.data
         elif earg.type == SerialEventType.DISCONNECTED:
             self.disconnected = True
@@ -251,13 +282,188 @@ class TestSerialDevice:
         emulator.start()
         uut.connect()
         time.sleep(1.0)
-        uut.disconnect()
+        uut.disconnect().join()
+        emulator.stop()
+
+        # Assert
+        assert fake_suscriber.connected
+        assert fake_suscriber.new_data_event
+        assert fake_suscriber.disconnected
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="requires linux")
+    def test_max_rate(self):
+        """Requests sent by the reader thread are limited in rate.
+        """
+        # Arrange
+        fake_suscriber = Suscriber()
+        uut = SerialDevice(TEST_PORT_1, max_rate=4.0)
+        uut.events += fake_suscriber
+        emulator = SerialDeviceEmulator(TEST_PORT_2)
+
+        # Act
+        emulator.start()
+        uut.connect().join()
+        time.sleep(1.0)
+        uut.disconnect().join()
+        emulator.stop()
+
+        # Assert
+        assert uut.update_rate_ms == 250
+        assert 1 <= fake_suscriber.new_data_count <= 5
+        assert (fake_suscriber.data == TEST_CONVERTED_TAXEL_DATA).all()
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="requires linux")
+    def test_request_window(self):
+        """Keep several requests in flight and count the lost replies.
+        """
+        # Arrange
+        fake_suscriber = Suscriber()
+        uut = SerialDevice(TEST_PORT_1, window_size=3)
+        uut.events += fake_suscriber
+        emulator = WindowedDeviceEmulator(TEST_PORT_2, 3)
+
+        # Act
+        emulator.start()
+        uut.connect().join()
+        time.sleep(1.0)
+        uut.disconnect().join()
+        emulator.stop()
+
+        # Assert
+        assert fake_suscriber.new_data_count > 10
+        assert (fake_suscriber.data == TEST_CONVERTED_TAXEL_DATA).all()
+        assert uut.lost_replies > 0
+        assert uut.duplicated_replies == 0
+
+    def test_window_sequence_numbers(self):
+        """Requests get consecutive sequence numbers up to the window size.
+        """
+        # Arrange
+        uut = HdlcRequestWindow(3)
+
+        # Act
+        sequence_numbers = [uut.send(0.0) for _ in range(3)]
+
+        # Assert
+        assert sequence_numbers == [0, 1, 2]
+        assert not uut.can_send
+        assert uut.on_reply(0)
+        assert uut.can_send
+        assert uut.outstanding_requests == 2
+
+    def test_window_lost_replies(self):
+        """Skipped and expired replies are counted as lost.
+        """
+        # Arrange
+        uut = HdlcRequestWindow(4)
+        for send_time in range(4):
+            uut.send(float(send_time))
+
+        # Act
+        skipped_reply = uut.on_reply(1)
+        uut.expire(3.0)
+
+        # Assert
+        assert skipped_reply
+        assert uut.lost_replies == 2
+        assert uut.outstanding_requests == 1
+
+    def test_window_duplicated_replies(self):
+        """Replies that do not match a request are rejected.
+        """
+        # Arrange
+        uut = HdlcRequestWindow(2)
+        uut.send(0.0)
+
+        # Act
+        first_reply = uut.on_reply(0)
+        second_reply = uut.on_reply(0)
+
+        # Assert
+        assert first_reply
+        assert not second_reply
+        assert uut.duplicated_replies == 1
+
+    def test_window_wraps_around(self):
+        """Sequence numbers wrap around after 7.
+        """
+        # Arrange
+        uut = HdlcRequestWindow(1)
+
+        # Act
+        sequence_numbers = []
+        for _ in range(9):
+            sequence_numbers.append(uut.send(0.0))
+            uut.on_reply(sequence_numbers[-1])
+
+        # Assert
+        assert sequence_numbers == [0, 1, 2, 3, 4, 5, 6, 7, 0]
+        with pytest.raises(ValueError):
+            HdlcRequestWindow(8)
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="requires linux")
+    def test_shared_scheduler(self):
+        """Get data from a device polled by a shared scheduler.
+        """
+        # Arrange
+        fake_suscriber = Suscriber()
+        scheduler = TimerScheduler()
+        uut = SerialDevice(TEST_PORT_1, scheduler=scheduler, period=0.05)
+        uut.events += fake_suscriber
+        emulator = SerialDeviceEmulator(TEST_PORT_2)
+
+        # Act
+        emulator.start()
+        uut.connect().join()
+        time.sleep(1.0)
+        uut.disconnect().join()
         emulator.stop()
 
         # Assert
+        assert uut.update_rate_ms == 50
         assert fake_suscriber.connected
         assert fake_suscriber.new_data_event
         assert fake_suscriber.disconnected
 
 
+    def test_deframer_complete_frames(self):
+        """Split data with a data frame and an ACK frame.
+        """
+        # Arrange
+        uut = HdlcDeframer()
+        hdlc_data_frame = frame_data(
+            bytes(TEST_RAW_SENSOR_DATA), FRAME_DATA, 0)
+        hdlc_ack_frame = frame_data('', FRAME_ACK, 2)
+
+        # Act
+        frames = uut.feed(hdlc_data_frame + hdlc_ack_frame)
+
+        # Assert
+        assert [bytes(frame) for frame in frames] == \
+            [hdlc_data_frame, hdlc_ack_frame]
+        assert not uut.has_pending_data
+
+    def test_deframer_split_frame(self):
+        """Keep frames that arrive split in two reads.
+        """
+        # Arrange
+        uut = HdlcDeframer()
+        hdlc_data_frame = frame_data(
+            bytes(TEST_RAW_SENSOR_DATA), FRAME_DATA, 0)
+        hdlc_ack_frame = frame_data('', FRAME_ACK, 2)
+        serial_data = hdlc_data_frame + hdlc_ack_frame
+
+        # Act
+        first_frames = uut.feed(serial_data[:len(hdlc_data_frame) + 2])
+        pending = uut.has_pending_data
+        second_frames = uut.feed(serial_data[len(hdlc_data_frame) + 2:])
+
+        # Assert
+        assert [bytes(frame) for frame in first_frames] == [hdlc_data_frame]
+        assert pending
+        assert [bytes(frame) for frame in second_frames] == [hdlc_ack_frame]
+        data, frame_type, _ = get_data(bytes(first_frames[0]))
+        assert frame_type == FRAME_DATA
+        assert data == bytes(TEST_RAW_SENSOR_DATA)
+
 # pylint: enable=redefined-outer-name
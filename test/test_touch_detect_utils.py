@@ -2,7 +2,10 @@
 
 """ Tests for Serial touch detect SDK """
 
-from touch_detect_sdk.touch_detect_utils import TouchDetectUtils
+import numpy as np
+
+from touch_detect_sdk.touch_detect_utils import CRC_TABLE_CCITT16, \
+    TouchDetectUtils
 from .test_data.sensor_data import (
     TEST_RAW_SENSOR_DATA,
     TEST_CONVERTED_TAXEL_DATA
@@ -59,6 +62,104 @@ class TestTouchDetectUtils:
         # Assert
         assert not frame
 
+    def test_to_taxel_array_out_buffer(self):
+        """Convert array into a buffer provided by the caller.
+        """
+        # Arrange
+        uut = TouchDetectUtils()
+        buffer = np.zeros(shape=(6, 6), dtype=np.uint16)
+
+        # Act
+        frame = uut.to_taxel_array((6, 6), TEST_RAW_SENSOR_DATA, out=buffer)
+
+        # Assert
+        assert frame is buffer
+        assert (buffer == TEST_CONVERTED_TAXEL_DATA).all()
+
+    def test_to_taxel_array_list(self):
+        """Convert data given as a list of ints.
+        """
+        # Arrange
+        uut = TouchDetectUtils()
+
+        # Act
+        frame = uut.to_taxel_array((6, 6), list(TEST_RAW_SENSOR_DATA))
+        crc = uut.checksum_update_crc16(list(TEST_PAYLOAD_2))
+
+        # Assert
+        assert (frame == TEST_CONVERTED_TAXEL_DATA).all()
+        assert crc == uut.checksum_update_crc16(TEST_PAYLOAD_2)
+
+    def test_to_taxel_array_reference(self):
+        """Compare the conversion against a byte by byte decoding.
+        """
+        # Arrange
+        uut = TouchDetectUtils()
+        rng = np.random.default_rng(0)
+        data = bytes(rng.integers(0, 256, size=4 * 8 * 2, dtype=np.uint8))
+        expected = np.zeros(shape=(4, 8), dtype=int)
+        for row in range(4):
+            for column in range(8):
+                index = (2 * row * 8) + (2 * column)
+                expected[row, column] = data[index + 1] * 256 + data[index]
+
+        # Act
+        frame = uut.to_taxel_array((4, 8), data)
+
+        # Assert
+        assert frame.dtype == expected.dtype
+        assert (frame == expected).all()
+
+    def test_taxel_array_batch_buffer(self):
+        """Convert a contiguous buffer with several payloads.
+        """
+        # Arrange
+        uut = TouchDetectUtils()
+        data = bytes(TEST_RAW_SENSOR_DATA) * 3
+
+        # Act
+        frames, valid = uut.to_taxel_array_batch((6, 6), data)
+
+        # Assert
+        assert frames.shape == (3, 6, 6)
+        assert frames.dtype == np.uint16
+        assert valid.all()
+        assert (frames == TEST_CONVERTED_TAXEL_DATA).all()
+
+    def test_taxel_array_batch_list(self):
+        """Convert a list of payloads with invalid entries.
+        """
+        # Arrange
+        uut = TouchDetectUtils()
+        data = [TEST_RAW_SENSOR_DATA, TEST_RAW_SENSOR_DATA_2,
+                memoryview(TEST_RAW_SENSOR_DATA)]
+
+        # Act
+        frames, valid = uut.to_taxel_array_batch((6, 6), data)
+
+        # Assert
+        assert frames.shape == (3, 6, 6)
+        assert list(valid) == [True, False, True]
+        assert (frames[0] == TEST_CONVERTED_TAXEL_DATA).all()
+        assert not frames[1].any()
+        assert (frames[2] == TEST_CONVERTED_TAXEL_DATA).all()
+
+    def test_taxel_array_batch_partial(self):
+        """Convert a contiguous buffer that ends with an incomplete payload.
+        """
+        # Arrange
+        uut = TouchDetectUtils()
+        data = bytes(TEST_RAW_SENSOR_DATA) * 2 + bytes(TEST_RAW_SENSOR_DATA_2)
+
+        # Act
+        frames, valid = uut.to_taxel_array_batch((6, 6), data)
+
+        # Assert
+        assert frames.shape == (3, 6, 6)
+        assert list(valid) == [True, True, False]
+        assert (frames[:2] == TEST_CONVERTED_TAXEL_DATA).all()
+        assert not frames[2].any()
+
     def test_valid_frame(self):
         """Tests check_frame_format with 1 byte of payload.
         """
@@ -125,4 +226,40 @@ class TestTouchDetectUtils:
         assert crc == 0x746a
 
 
+    def test_crc_odd_size(self):
+        """Calculate CRC of data with odd and even sizes.
+        """
+        # Arrange
+        uut = TouchDetectUtils()
+        data = TEST_RAW_SENSOR_DATA + TEST_PAYLOAD
+
+        # Act and Assert. Compare against byte by byte calculation.
+        for size in range(len(data)):
+            crc = uut.checksum_update_crc16(data[:size])
+            expected = 0xFFFF
+            for value in data[:size]:
+                index = (expected ^ value) & 0x00FF
+                expected = CRC_TABLE_CCITT16[index] ^ (expected >> 8)
+            assert crc == expected
+
+    def test_crc_batch(self):
+        """Calculate CRC of several frames at once.
+        """
+        # Arrange
+        uut = TouchDetectUtils()
+        frames = np.frombuffer(TEST_PAYLOAD_2, dtype=np.uint8).reshape(
+            (2, 4))
+
+        # Act
+        crc_even = uut.checksum_crc16_batch(frames)
+        crc_odd = uut.checksum_crc16_batch(frames[:, :3], 0x1234)
+
+        # Assert
+        assert list(crc_even) == [
+            uut.checksum_update_crc16(TEST_PAYLOAD_2[:4]),
+            uut.checksum_update_crc16(TEST_PAYLOAD_2[4:])]
+        assert list(crc_odd) == [
+            uut.checksum_update_crc16(TEST_PAYLOAD_2[:3], 0x1234),
+            uut.checksum_update_crc16(TEST_PAYLOAD_2[4:7], 0x1234)]
+
 # pylint: enable=redefined-outer-name
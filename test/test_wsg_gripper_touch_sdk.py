@@ -2,6 +2,7 @@
 
 """ Tests for WsgGripperTouchSdk class. """
 
+import asyncio
 import socket
 import time
 
@@ -12,9 +13,11 @@ import pytest
 from pytest_mock import MockerFixture
 
 from touch_detect_sdk.event import EventSuscriberInterface
-from touch_detect_sdk.wsg_gripper_touch_sdk import WsgGripperTouchSdk
+from touch_detect_sdk.wsg_gripper_touch_sdk import WsgGripperTouchSdk, \
+    WsgReadPlan, WsgStreamReader
 from touch_detect_sdk.wsg_device import WsgDevice, WsgEventData, WsgEventType
-from .test_data.sensor_data import TEST_RAW_SENSOR_DATA
+from .test_data.sensor_data import TEST_RAW_SENSOR_DATA, \
+    TEST_CONVERTED_TAXEL_DATA
 
 # Too short WSG frame
 TEST_SHORT_FRAME = bytes(b'\xaa\xaa')
@@ -82,10 +85,12 @@ class WsgEmulator():
     def data_task(self):
         """Task for handling packages from WSG gripper.
         """
+        # Requests sent together arrive in the same read.
+        stream_reader = WsgStreamReader()
         while not self._stop_wsg_data_loop.is_set():
             try:
                 # Receive data and reply.
-                data = self._conn.recv(1024)
+                data = stream_reader.read_frame(self._conn)
                 if data:
                     payload = WsgGripperTouchSdk.decode_frame(data)
                     if payload[0] == READ_LEFT_SENSOR_COMMAND[0]:
@@ -96,10 +101,47 @@ class WsgEmulator():
                         frame = WsgGripperTouchSdk.make_frame(
                             TEST_RAW_SENSOR_DATA)
                         self._conn.send(frame)
-            except (ConnectionResetError, ConnectionAbortedError):
+                else:
+                    break
+            except (ConnectionResetError, ConnectionAbortedError,
+                    BrokenPipeError):
                 break
 
 
+class DelayedWsgEmulator():
+    """Emulates a WSG gripper on a free TCP port that takes some time to
+    answer each pair of requests.
+    """
+
+    def __init__(self, delay: float):
+        self._delay = delay
+        self.tcp_socket = socket.create_server(('127.0.0.1', 0))
+        self.tcp_port = self.tcp_socket.getsockname()[1]
+        self._socket_thread = Thread(target=self.data_task)
+        self._socket_thread.start()
+
+    def data_task(self):
+        """Task for handling packages from WSG gripper.
+        """
+        conn, _ = self.tcp_socket.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream_reader = WsgStreamReader()
+        frame = WsgGripperTouchSdk.make_frame(TEST_RAW_SENSOR_DATA)
+        with conn:
+            while True:
+                try:
+                    data = stream_reader.read_frame(conn)
+                    if not data:
+                        break
+                    payload = WsgGripperTouchSdk.decode_frame(data)
+                    if payload[0] == READ_LEFT_SENSOR_COMMAND[0]:
+                        time.sleep(self._delay)
+                    conn.send(frame)
+                except OSError:
+                    break
+        self.tcp_socket.close()
+
+
 class EventTester(EventSuscriberInterface):
     """Handles events from WsgGripperTouchSdk.
     """
@@ -107,6 +149,7 @@ class EventTester(EventSuscriberInterface):
     def __init__(self):
         self.type = WsgEventType.DISCONNECTED
         self.call_count = 0
+        self.new_data_count = 0
 
     def touch_detect_event(self, sender: object, earg: object):
         """This function can be suscribed to any WsgGripperTouchSdk event
@@ -136,6 +179,7 @@ class EventTester(EventSuscriberInterface):
         elif earg.type == WsgEventType.NEW_DATA:
             self.type = WsgEventType.NEW_DATA
             self.call_count += 1
+            self.new_data_count += 1
 
 
 @pytest.fixture
@@ -205,6 +249,110 @@ class TestWsgGripperTouchSdk:
         # Assert
         assert payload == TEST_PAYLOAD_1
 
+        # Frame with wrong CRC
+        payload = uut.decode_frame(TEST_ENCODED_FRAME_1[:-1] + b'\x00')
+        # Assert
+        assert not payload
+
+        # Truncated frame
+        payload = uut.decode_frame(TEST_ENCODED_FRAME_1[:-1])
+        # Assert
+        assert not payload
+
+    def test_decode_frame_batch(self):
+        """Test for decoding several sensor responses at once.
+        """
+        # Arrange
+        uut = WsgGripperTouchSdk()
+        frame = uut.make_frame(TEST_RAW_SENSOR_DATA)
+        wrong_frame = bytearray(frame)
+        wrong_frame[0] = 0x00
+        wrong_crc_frame = bytearray(frame)
+        wrong_crc_frame[-1] ^= 0xFF
+
+        # Act
+        taxel_arrays, valid = uut.decode_frame_batch(
+            [frame, wrong_frame, TEST_SHORT_FRAME, frame, wrong_crc_frame],
+            (6, 6))
+
+        # Assert
+        assert taxel_arrays.shape == (5, 6, 6)
+        assert list(valid) == [True, False, False, True, False]
+        assert (taxel_arrays[valid] == TEST_CONVERTED_TAXEL_DATA).all()
+        assert not taxel_arrays[~valid].any()
+
+        # Act
+        taxel_arrays, valid = uut.decode_frame_batch(bytes(frame * 2),
+                                                     (6, 6))
+
+        # Assert
+        assert valid.all()
+        assert (taxel_arrays == TEST_CONVERTED_TAXEL_DATA).all()
+
+    def test_read_plan(self):
+        """Test for the requests prepared for polling a device.
+        """
+        # Act
+        uut = WsgReadPlan()
+
+        # Assert
+        assert uut.left_request == WsgGripperTouchSdk.make_frame(
+            READ_LEFT_SENSOR_COMMAND)
+        assert uut.right_request == WsgGripperTouchSdk.make_frame(
+            READ_RIGHT_SENSOR_COMMAND)
+
+    def test_stream_reader(self):
+        """Test for reassembling frames split or joined by TCP.
+        """
+        # Arrange
+        uut = WsgStreamReader(buffer_size=16)
+        frame = bytes(WsgGripperTouchSdk.make_frame(TEST_RAW_SENSOR_DATA))
+        client, server = socket.socketpair()
+
+        # Act. Send garbage, two frames together and one split in two.
+        server.send(b'\x00\x01' + frame + frame + frame[:10])
+        first_frame = bytes(uut.read_frame(client))
+        second_frame = bytes(uut.read_frame(client))
+        server.send(frame[10:])
+        third_frame = uut.read_frame(client)
+        payload = WsgGripperTouchSdk.decode_frame(third_frame)
+        server.close()
+        closed = uut.read_frame(client)
+        client.close()
+
+        # Assert
+        assert first_frame == frame
+        assert second_frame == frame
+        assert isinstance(payload, memoryview)
+        assert payload == TEST_RAW_SENSOR_DATA
+        assert closed is None
+
+    def test_stream_reader_async(self):
+        """Test for resynchronizing frames read from an asyncio loop.
+        """
+        # Arrange
+        uut = WsgStreamReader(buffer_size=16)
+        frame = bytes(WsgGripperTouchSdk.make_frame(TEST_RAW_SENSOR_DATA))
+        client, server = socket.socketpair()
+        client.setblocking(False)
+
+        async def read_frames():
+            loop = asyncio.get_running_loop()
+            frames = [bytes(await uut.read_frame_async(loop, client))
+                      for _ in range(2)]
+            server.close()
+            return frames, await uut.read_frame_async(loop, client)
+
+        # Act. The header of the first frame starts inside the first six
+        # bytes received.
+        server.send(b'\x00\x01' + frame + frame)
+        frames, closed = asyncio.run(read_frames())
+        client.close()
+
+        # Assert
+        assert frames == [frame, frame]
+        assert closed is None
+
     def test_connect(self, mocker: MockerFixture):
         """Test for starting the internal thread.
         """
@@ -263,10 +411,15 @@ class TestWsgGripperTouchSdk:
         wsg_emulator.start()
         thread = uut.connect(test_device)
         wsg_emulator.accept()
+        thread.join()
 
         # Assert
-        assert event_tester_setup.call_count == 1
-        assert event_tester_setup.type == WsgEventType.CONNECTED
+        # Polling starts right after the connection, so data may already
+        # have arrived.
+        assert event_tester_setup.call_count - \
+            event_tester_setup.new_data_count == 1
+        assert event_tester_setup.type in (WsgEventType.CONNECTED,
+                                           WsgEventType.NEW_DATA)
 
         # Disconnect and check disconnection
         thread = uut.disconnect(test_device)
@@ -287,9 +440,14 @@ class TestWsgGripperTouchSdk:
         wsg_emulator.start()
         thread = uut.connect(test_device)
         wsg_emulator.accept()
+        thread.join()
         # Assert
-        assert event_tester_setup.call_count == 1
-        assert event_tester_setup.type == WsgEventType.CONNECTED
+        # Polling starts right after the connection, so data may already
+        # have arrived.
+        assert event_tester_setup.call_count - \
+            event_tester_setup.new_data_count == 1
+        assert event_tester_setup.type in (WsgEventType.CONNECTED,
+                                           WsgEventType.NEW_DATA)
 
         # Assert new data event.
         time.sleep(0.1)
@@ -302,4 +460,53 @@ class TestWsgGripperTouchSdk:
         # Assert
         assert event_tester_setup.type == WsgEventType.DISCONNECTED
 
+    def test_concurrent_grippers(self):
+        """Grippers are polled concurrently, so the rate of each one does not
+        depend on the amount of grippers.
+        """
+        # Arrange
+        uut = WsgGripperTouchSdk()
+        emulators = [DelayedWsgEmulator(0.05) for _ in range(3)]
+        devices = [WsgDevice('127.0.0.1', emulator.tcp_port)
+                   for emulator in emulators]
+        testers = [EventTester() for _ in devices]
+        for device, tester in zip(devices, testers):
+            device.events += tester
+
+        # Act
+        for device in devices:
+            uut.connect(device).join()
+        time.sleep(1.0)
+        for device in devices:
+            uut.disconnect(device).join()
+
+        # Assert
+        # Polling one after the other would give less than 7 per gripper.
+        for tester in testers:
+            assert tester.new_data_count > 12
+            assert tester.type == WsgEventType.DISCONNECTED
+
+    def test_disconnect_pending_read(self, event_tester_setup):
+        """Disconnecting while a response is awaited stops polling at once.
+        """
+        # Arrange
+        uut = WsgGripperTouchSdk()
+        emulator = DelayedWsgEmulator(0.5)
+        test_device = WsgDevice('127.0.0.1', emulator.tcp_port)
+        test_device.events += event_tester_setup
+        uut.connect(test_device).join()
+        time.sleep(0.1)
+
+        # Act
+        start_time = time.perf_counter()
+        uut.disconnect(test_device).join()
+        duration = time.perf_counter() - start_time
+        new_data_count = event_tester_setup.new_data_count
+        time.sleep(0.6)
+
+        # Assert
+        assert duration < 0.4
+        assert event_tester_setup.type == WsgEventType.DISCONNECTED
+        assert event_tester_setup.new_data_count == new_data_count
+
 # pylint: enable=redefined-outer-name
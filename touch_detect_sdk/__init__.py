@@ -6,16 +6,23 @@ from .ble_touch_sdk import BleTouchSdk
 from .can_device import CanDevice
 from .can_device import CanEventData, CanEventType
 from .can_touch_sdk import CanTouchSdk
-from .event import EventSuscriberInterface
-from .periodic_timer import PeriodicTimer, PeriodicTimerSuscriber
+from .device_cache import CachedDevice, DeviceCache
+from .device_probe import DeviceProbe
+from .event import EventOverflowPolicy, EventSuscriberInterface
+from .frame_history import FrameHistory, HistoryWindow
+from .frame_stream import DeviceFrame, FrameStream
+from .periodic_timer import PeriodicTimer, PeriodicTimerSuscriber, \
+    TimerScheduler
 from .serial_device import SerialDevice, SerialEventData, SerialEventType
 from .touch_detect_device import TouchDetectDevice
 from .touch_detect_device import TouchDetectType
 from .wsg_device import WsgDevice, WsgEventType
 
-__all__ = ["BleDevice", "BleEventType", "BleTouchSdk",
+__all__ = ["BleDevice", "BleEventType", "BleTouchSdk", "CachedDevice",
            "CanDevice", "CanEventData", "CanEventType", "CanTouchSdk",
-           "EventSuscriberInterface",  "PeriodicTimer",
+           "DeviceCache", "DeviceFrame", "DeviceProbe", "EventOverflowPolicy",
+           "EventSuscriberInterface", "FrameHistory", "FrameStream",
+           "HistoryWindow", "PeriodicTimer",
            "PeriodicTimerSuscriber", "SerialDevice", "SerialEventData",
-           "SerialEventType", "TouchDetectDevice",
+           "SerialEventType", "TimerScheduler", "TouchDetectDevice",
            "TouchDetectType", "WsgDevice", "WsgEventType"]
@@ -4,16 +4,14 @@
 
 import asyncio
 import logging
-import threading
-import time
 
 from enum import Enum, unique
 
 from bleak import BleakClient
 from bleak.backends.characteristic import BleakGATTCharacteristic
-from bleak.exc import BleakDeviceNotFoundError
+from bleak.exc import BleakError
 
-from .event import Event
+from .event import EventChannel
 from .touch_detect_device import ConnectionStatus
 from .touch_detect_device import TouchDetectDevice, TouchDetectType
 from .touch_detect_utils import TouchDetectUtils
@@ -25,9 +23,6 @@ BLE_FRAME_SIZE = 72
 # UUID characteristic where TouchDetect sends the data.
 BLE_NOTIFY_UUID = "0000fe42-8e22-4541-9d4c-21edae82ed19"
 
-# Amount of time to to wait for data changes in data loop.
-BLE_UPDATE_LOOP_TIME = 0.010
-
 
 @unique
 class BleEventType(Enum):
@@ -59,8 +54,11 @@ class BleEventInfo():
 class BleDevice(TouchDetectDevice):
     """Encapsulates event data for BLE events.
     """
-    # Event object
-    events = Event('')
+    # Events of each device. Suscribing through the class receives the
+    # events of all the devices.
+    events = EventChannel('')
+    _new_data_event_type = BleEventType.NEW_DATA
+    _disconnected_event_type = BleEventType.DISCONNECTED
 
     def __init__(self, address: str, device_id: str,
                  name: str = '', taxels_array_size: tuple = (6, 6)):
@@ -81,9 +79,6 @@ class BleDevice(TouchDetectDevice):
         self._device_id = device_id
         self._logger = logging.getLogger(__name__)
 
-        # Event for stopping incomming_data_thread.
-        self.stop_notify_loop_event = threading.Event()
-
     @property
     def device_id(self) -> str:
         """device_id getter.
@@ -110,43 +105,59 @@ class BleDevice(TouchDetectDevice):
             self.taxels_array_size, data)
         # Fire event only if conversion was successful.
         if len(array_data) != 0:
+            self.taxels_array = array_data
             self.fire_event(BleEventType.NEW_DATA, [array_data])
 
-    def connection_thread(self):
-        """Thread that handles connection of devices.
-        """
-        # Set new event loop for this thread.
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    async def open(self, connection_limit: asyncio.Semaphore) -> bool:
+        """Connects to the device and enables notifications.
 
+        :param connection_limit: limits the amount of devices connecting at
+            the same time.
+        :type connection_limit: asyncio.Semaphore
+        :return: True if connected, False otherwise
+        :rtype: bool
+        """
         try:
             # Open the port.
-            loop.run_until_complete(self._port_handler.connect())
+            async with connection_limit:
+                await self._port_handler.connect()
+        except (BleakError, asyncio.TimeoutError, OSError) as error:
+            self._logger.error('Could could not connect to BLE device %s: %s',
+                               self.name, error)
+            self.connection_status = ConnectionStatus.DISCONNECTED
+            self.fire_event(BleEventType.ERROR_OPENING_PORT, [error])
+            return False
 
-            # Fire event for connection.
-            self.connection_status = ConnectionStatus.CONNECTED
-            self.fire_event(BleEventType.CONNECTED)
+        # Fire event for connection.
+        self.connection_status = ConnectionStatus.CONNECTED
+        self.fire_event(BleEventType.CONNECTED)
 
+        try:
             # Enable notifications.
-            loop.run_until_complete(self._port_handler.start_notify(
-                BLE_NOTIFY_UUID, self.notification_handler))
-        except BleakDeviceNotFoundError as error:
-            self._logger.error('Could could not connect to BLE device %s: %s',
+            await self._port_handler.start_notify(
+                BLE_NOTIFY_UUID, self.notification_handler)
+        except (BleakError, asyncio.TimeoutError, OSError) as error:
+            self._logger.error('Could not enable notifications of %s: %s',
                                self.name, error)
+            # Do not leave the device connected without notifications.
+            try:
+                await self._port_handler.disconnect()
+            except (BleakError, asyncio.TimeoutError, OSError):
+                pass
+            self.connection_status = ConnectionStatus.DISCONNECTED
             self.fire_event(BleEventType.ERROR_OPENING_PORT, [error])
-            return
-
-        # loop for gathering new data.
-        while not self.stop_notify_loop_event.is_set():
-            # sleep for short period of time.
-            time.sleep(BLE_UPDATE_LOOP_TIME)
+            return False
+        return True
 
+    async def close(self):
+        """Disables notifications and disconnects from the device.
+        """
         try:
             # Stop BLE notifications and disconnect from device.
-            loop.run_until_complete(
-                self._port_handler.stop_notify(BLE_NOTIFY_UUID))
-            loop.run_until_complete(self._port_handler.disconnect())
-        except RuntimeError as error:
+            await self._port_handler.stop_notify(BLE_NOTIFY_UUID)
+            await self._port_handler.disconnect()
+        except (BleakError, RuntimeError, asyncio.TimeoutError,
+                OSError) as error:
             self._logger.error('Could not close serial port %s: %s',
                                self.name, error)
             self.fire_event(BleEventType.ERROR_CLOSING_PORT, [error])
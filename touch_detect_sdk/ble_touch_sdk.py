@@ -3,31 +3,60 @@
 """SDK for gathering data from BLE TouchDetect.
 """
 import asyncio
+import concurrent.futures
+import logging
+import re
 
-from threading import Thread
+from threading import Lock, Thread
 from typing import Callable
 
 from bleak import BleakScanner
 
 from .ble_device import BleDevice
+from .device_cache import DeviceCache
 from .event import Event
-from .touch_detect_device import ConnectionStatus
+from .touch_detect_device import ConnectionStatus, TouchDetectType
 
 # Search time in Seconds
 BLE_DISCOVERY_TIME = 2.0
+# Default amount of devices that can be connecting at the same time.
+DEFAULT_MAX_PARALLEL_CONNECTIONS = 4
 
 
 class BleTouchSdk:
     """This Class manages the communication with BLE devices.
+
+    All the connected devices share one asyncio loop running in its own
+    thread. The loop is started with the first connection and stopped when
+    the last device is disconnected.
     """
 
     # Event for searching devices.
     search_devices_event = Event('')
 
+    # Loop that owns the connections and thread running it.
+    _loop = None
+    _loop_thread = None
+    # Limits the amount of devices connecting at the same time.
+    _connection_limit = None
+    # Set to request the disconnection of each device.
+    _disconnect_events = {}
+    _lock = Lock()
+
     @classmethod
-    def __init__(cls):
+    def __init__(cls,
+                 max_parallel_connections: int =
+                 DEFAULT_MAX_PARALLEL_CONNECTIONS):
+        """Initialize the SDK.
+
+        :param max_parallel_connections: amount of devices that can be
+            connecting at the same time, defaults to
+            DEFAULT_MAX_PARALLEL_CONNECTIONS
+        :type max_parallel_connections: int, optional
+        """
         # List of threads currently running.
         cls._thread_list = []
+        cls._max_parallel_connections = max_parallel_connections
 
     @classmethod
     def __del__(cls):
@@ -39,34 +68,96 @@ class BleTouchSdk:
                 thread.join()
 
     @classmethod
-    def search_devices(cls, callback: Callable[[list], None]) -> Thread:
-        """Runs the thread for looking for new devices.
+    def search_devices(cls, callback: Callable[[list], None],
+                       on_device_found: Callable[[BleDevice], None] = None,
+                       *, name_pattern: str = None, service_uuids: list = None,
+                       expected_addresses: list = None,
+                       discovery_time: float = BLE_DISCOVERY_TIME) -> Thread:
+        """Runs the thread for looking for new devices. Devices are reported
+        as soon as their first advertisement is received.
 
+        :param callback: called with the list of devices found when the
+            search finishes.
+        :type callback: Callable[[list], None]
+        :param on_device_found: called with each device the first time it
+            is seen, defaults to None
+        :type on_device_found: Callable[[BleDevice], None], optional
+        :param name_pattern: regular expression that the name of the device
+            must match, defaults to None for any named device.
+        :type name_pattern: str, optional
+        :param service_uuids: the device must advertise one of these
+            services, defaults to None
+        :type service_uuids: list, optional
+        :param expected_addresses: the search stops once all these devices
+            were found, defaults to None
+        :type expected_addresses: list, optional
+        :param discovery_time: maximum duration of the search in seconds,
+            defaults to BLE_DISCOVERY_TIME
+        :type discovery_time: float, optional
         :return: Reference to the thread running.
         :rtype: Thread
         """
-        thread = Thread(target=cls._discover, args=(callback,))
+        search_filter = _DiscoveryFilter(name_pattern, service_uuids)
+        thread = Thread(target=cls._discover,
+                        args=(callback, on_device_found, search_filter,
+                              expected_addresses, discovery_time))
         thread.start()
         cls._thread_list.append(thread)
         return thread
 
     @classmethod
-    def connect(cls, ble_device: BleDevice) -> Thread:
+    def search_cached_devices(cls, cache: DeviceCache,
+                              callback: Callable[[list], None] = None,
+                              **search_arguments) -> list[BleDevice]:
+        """Gets the devices seen in previous runs without searching. The
+        search runs in the background and updates the cache.
+
+        The SDK does not update the cache when a device is connected. Call
+        cache.update(device) and cache.save() after a successful connection
+        to store its settings as the last ones that worked.
+
+        :param cache: cache of devices.
+        :type cache: DeviceCache
+        :param callback: called with the devices found by the search that
+            were not in the cache, defaults to None
+        :type callback: Callable[[list], None], optional
+        :param search_arguments: arguments for search_devices.
+        :type search_arguments: dict
+        :return: devices of the cache.
+        :rtype: list[BleDevice]
+        """
+        def reconcile(ble_devices: list):
+            new_devices = cache.reconcile(ble_devices)
+            if callback is not None:
+                callback(new_devices)
+
+        ble_devices = cache.create_devices(TouchDetectType.BLE)
+        cls.search_devices(reconcile, **search_arguments)
+        return ble_devices
+
+    @classmethod
+    def connect(cls, ble_device: BleDevice) -> concurrent.futures.Future:
         """connects to specific BLE device.
 
         :param ble_device: device to connect
-        :type ble_device: CanDevice
-        :return: Reference to the thread running.
-        :rtype: Thread
+        :type ble_device: BleDevice
+        :return: future with True once the device is connected or False if
+            the connection failed.
+        :rtype: concurrent.futures.Future
         """
         # Check if device was already connected.
         if ble_device.connection_status == ConnectionStatus.CONNECTED:
             return None
 
-        thread = Thread(target=ble_device.connection_thread)
-        thread.start()
-        cls._thread_list.append(thread)
-        return thread
+        future = concurrent.futures.Future()
+        with cls._lock:
+            loop = cls._get_loop()
+            if ble_device in cls._disconnect_events:
+                return None
+            # Reserve the device until the loop creates its event.
+            cls._disconnect_events[ble_device] = None
+            loop.call_soon_threadsafe(cls._start_device, ble_device, future)
+        return future
 
     @classmethod
     def disconnect(cls, ble_device: BleDevice):
@@ -74,31 +165,224 @@ class BleTouchSdk:
 
         :param ble_device: device to disconnect
         :type ble_device: BLEDevice
-        :return: Reference to the thread running.
-        :rtype: Thread
         """
         # Check if device was already disconnected.
         if ble_device.connection_status == ConnectionStatus.DISCONNECTED:
             return
 
-        # Disconnect port.
-        ble_device.stop_notify_loop_event.set()
+        # Disconnect port. Callbacks run in order, so the device was
+        # already started by the loop when this one runs.
+        with cls._lock:
+            if ble_device not in cls._disconnect_events:
+                return
+            cls._loop.call_soon_threadsafe(cls._stop_device, ble_device)
 
     @classmethod
-    def _discover(cls, callback: Callable[[list], None]):
-        """Search BLE devices.
+    def _get_loop(cls) -> asyncio.AbstractEventLoop:
+        """Gets the loop that owns the connections, starting it if it was
+        not running. Must be called with the lock held.
+
+        :return: loop running in its own thread.
+        :rtype: asyncio.AbstractEventLoop
+        """
+        if cls._loop is None or not cls._loop_thread.is_alive():
+            cls._loop = asyncio.new_event_loop()
+            # Devices of a loop that is not running anymore are dropped.
+            cls._disconnect_events = {}
+            cls._connection_limit = None
+            cls._loop_thread = Thread(target=cls._ble_loop_task,
+                                      args=(cls._loop,))
+            cls._loop_thread.start()
+            cls._thread_list.append(cls._loop_thread)
+        return cls._loop
+
+    @classmethod
+    def _start_device(cls, ble_device: BleDevice,
+                      future: concurrent.futures.Future):
+        """Starts the task handling a device. Runs in the loop.
+
+        :param ble_device: device to connect.
+        :type ble_device: BleDevice
+        :param future: completed with the result of the connection.
+        :type future: concurrent.futures.Future
+        """
+        if cls._connection_limit is None:
+            cls._connection_limit = asyncio.Semaphore(
+                cls._max_parallel_connections)
+        disconnect_event = asyncio.Event()
+        with cls._lock:
+            cls._disconnect_events[ble_device] = disconnect_event
+        asyncio.ensure_future(
+            cls._device_task(ble_device, disconnect_event, future))
+
+    @classmethod
+    def _stop_device(cls, ble_device: BleDevice):
+        """Requests the disconnection of a device. Runs in the loop.
+
+        :param ble_device: device to disconnect.
+        :type ble_device: BleDevice
+        """
+        disconnect_event = cls._disconnect_events.get(ble_device)
+        if disconnect_event is not None:
+            disconnect_event.set()
+
+    @classmethod
+    async def _device_task(cls, ble_device: BleDevice,
+                           disconnect_event: asyncio.Event,
+                           future: concurrent.futures.Future):
+        """Connects a device and waits until its disconnection is requested.
+
+        :param ble_device: device to handle.
+        :type ble_device: BleDevice
+        :param disconnect_event: set when the device must be disconnected.
+        :type disconnect_event: asyncio.Event
+        :param future: completed with the result of the connection.
+        :type future: concurrent.futures.Future
+        """
+        try:
+            connected = await ble_device.open(cls._connection_limit)
+            future.set_result(connected)
+            if connected:
+                await disconnect_event.wait()
+                await ble_device.close()
+        finally:
+            if not future.done():
+                future.set_result(False)
+            cls._remove_device(ble_device)
+
+    @classmethod
+    def _remove_device(cls, ble_device: BleDevice):
+        """Removes a device and stops the loop if there are no devices left.
+        Runs in the loop.
+
+        :param ble_device: device to remove.
+        :type ble_device: BleDevice
         """
-        ble_devices = []
+        with cls._lock:
+            cls._disconnect_events.pop(ble_device, None)
+            if len(cls._disconnect_events) == 0 and cls._loop is not None:
+                cls._loop.stop()
+                cls._loop = None
+
+    @classmethod
+    def _ble_loop_task(cls, loop: asyncio.AbstractEventLoop):
+        """Thread that runs the loop handling the BLE devices.
 
+        :param loop: loop to run.
+        :type loop: asyncio.AbstractEventLoop
+        """
+        logging.debug('BLE loop task initialized')
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+        logging.debug('BLE loop task finished')
+
+    @classmethod
+    def _discover(cls, callback: Callable[[list], None],
+                  on_device_found: Callable[[BleDevice], None],
+                  search_filter: '_DiscoveryFilter',
+                  expected_addresses: list, discovery_time: float):
+        """Search BLE devices.
+        """
         # Set new event loop for this thread.
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
 
-        # Search devices and populate list.
-        devices_info = loop.run_until_complete(
-            BleakScanner.discover(BLE_DISCOVERY_TIME))
-        for device_info in devices_info:
-            if device_info.name:
-                ble_device = BleDevice(device_info.address, device_info.name)
-                ble_devices.append(ble_device)
+        try:
+            ble_devices = loop.run_until_complete(cls._scan(
+                on_device_found, search_filter, expected_addresses,
+                discovery_time))
+        finally:
+            loop.close()
         callback(ble_devices)
+
+    @classmethod
+    async def _scan(cls, on_device_found: Callable[[BleDevice], None],
+                    search_filter: '_DiscoveryFilter',
+                    expected_addresses: list,
+                    discovery_time: float) -> list:
+        """Scans until the discovery time elapsed or all the expected
+        devices were found.
+
+        :return: devices found.
+        :rtype: list
+        """
+        found_devices = {}
+        missing_addresses = {address.upper()
+                             for address in expected_addresses or []}
+        search_finished = asyncio.Event()
+
+        def detection_callback(device_info, advertisement_data):
+            address = device_info.address.upper()
+            if address in found_devices:
+                return
+            name = advertisement_data.local_name or device_info.name
+            if not search_filter.match(name,
+                                       advertisement_data.service_uuids):
+                return
+
+            ble_device = BleDevice(device_info.address, name)
+            found_devices[address] = ble_device
+            if on_device_found is not None:
+                on_device_found(ble_device)
+
+            # Stop as soon as all the expected devices were seen.
+            missing_addresses.discard(address)
+            if expected_addresses and not missing_addresses:
+                search_finished.set()
+
+        scanner = BleakScanner(detection_callback=detection_callback,
+                               service_uuids=search_filter.service_uuids)
+        await scanner.start()
+        try:
+            await asyncio.wait_for(search_finished.wait(), discovery_time)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await scanner.stop()
+        return list(found_devices.values())
+
+
+class _DiscoveryFilter:
+    """Selects the advertisements that belong to TouchDetect devices.
+    """
+
+    def __init__(self, name_pattern: str = None, service_uuids: list = None):
+        """Initialize the filter.
+
+        :param name_pattern: regular expression that the name must match,
+            defaults to None
+        :type name_pattern: str, optional
+        :param service_uuids: services of which one must be advertised,
+            defaults to None
+        :type service_uuids: list, optional
+        """
+        self._name_pattern = None
+        if name_pattern is not None:
+            self._name_pattern = re.compile(name_pattern)
+        self.service_uuids = None
+        if service_uuids:
+            self.service_uuids = [uuid.lower() for uuid in service_uuids]
+
+    def match(self, name: str, service_uuids: list) -> bool:
+        """Checks if an advertisement passes the filter. Unnamed devices
+        never pass.
+
+        :param name: name of the device.
+        :type name: str
+        :param service_uuids: services advertised.
+        :type service_uuids: list
+        :return: True if the device passes the filter.
+        :rtype: bool
+        """
+        if not name:
+            return False
+        if self._name_pattern is not None and \
+                self._name_pattern.match(name) is None:
+            return False
+        if self.service_uuids is not None:
+            advertised = {uuid.lower() for uuid in service_uuids or []}
+            return not advertised.isdisjoint(self.service_uuids)
+        return True
@@ -5,7 +5,7 @@
 from enum import Enum, unique
 import serial
 
-from .event import Event
+from .event import EventChannel
 from .touch_detect_device import TouchDetectDevice, TouchDetectType
 
 # Default values for serial port.
@@ -46,8 +46,11 @@ class CanEventData():
 class CanDevice(TouchDetectDevice):
     """Represents a CAN device.
     """
-    # Event object
-    events = Event('')
+    # Events of each device. Suscribing through the class receives the
+    # events of all the devices.
+    events = EventChannel('')
+    _new_data_event_type = CanEventType.NEW_DATA
+    _disconnected_event_type = CanEventType.DISCONNECTED
 
     def __init__(self, address: str, name: str = '',
                  taxels_array_size: tuple = (6, 6), baudrate: int = BAUDRATE,
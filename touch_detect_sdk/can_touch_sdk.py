@@ -8,6 +8,7 @@ import logging
 import threading
 
 from threading import Event, Thread
+from typing import Callable
 
 import numpy as np
 import serial  # pyserial
@@ -15,13 +16,15 @@ from serial.tools.list_ports import comports
 from serial import serialutil
 
 from .can_device import CanDevice, CanEventType  # noqa
-from .touch_detect_device import ConnectionStatus
+from .device_cache import DeviceCache
+from .touch_detect_device import ConnectionStatus, TouchDetectType
 
 
 SUPPORTED_MANUFACTURERS_LIST = ['FTDI']
 
 # Value that represents the start of the frame.
 START_OF_FRAME = 0xFF
+START_OF_FRAME_BYTE = bytes([START_OF_FRAME])
 # Value that represents the end of the frame.
 END_OF_FRAME = 0xFE
 # Amount of frames per package.
@@ -30,6 +33,10 @@ PACKAGE_SIZE = 12
 FRAME_SIZE = 22
 # CAN Device ID of package 0.
 DEVICE_ID = 0x300
+# Size of the sensor array of CAN devices.
+TAXELS_ARRAY_SIZE = (6, 6)
+# Time in sec between checks of the device list in the data task.
+DEVICE_LIST_UPDATE_SEC = 0.05
 
 
 class CanFrameDecoder:
@@ -47,29 +54,72 @@ class CanFrameDecoder:
         :rtype: tuple
         """
         try:
-            taxel_data = []
-            # Iterates through all the frames of package.
-            for frame in package:
-                byte_data = []
-                index = 0
-                # Decode the encoding applied by USB CAN stick.
-                for index in range(5, 15, 2):
-                    byte_data.append(CanFrameDecoder.make_byte(
-                        frame[index], frame[index+1]))
-                # Decode the encoding applied by CAN Device.
-                taxel_data.append(CanFrameDecoder.make_short(
-                    byte_data[3] & 0x0F, byte_data[0]))
-                taxel_data.append(CanFrameDecoder.make_short(
-                    (byte_data[3] & 0xF0) >> 4, byte_data[1]))
-                taxel_data.append(CanFrameDecoder.make_short(
-                    byte_data[4] & 0x0F, byte_data[2]))
-            # Convert the list into a byte array.
-            result = np.array(taxel_data, dtype=int)
-            # Reshape to the proper array shape.
-            return result.reshape((6, 6))
-        except serial.SerialException:
+            # Arrange the frames of the package in a matrix.
+            frame_matrix = np.frombuffer(
+                b''.join(package), dtype=np.uint8).reshape(
+                    (PACKAGE_SIZE, FRAME_SIZE))
+        except ValueError:
             logging.error('Error decoding package')
             return None
+        return CanFrameDecoder._decode_frame_matrix(frame_matrix).astype(int)
+
+    @staticmethod
+    def decode_package_batch(packages) -> tuple:
+        """Decodes several packages at once.
+
+        :param packages: (N, 12, 22) array or contiguous buffer with the
+            frames of N packages one after the other.
+        :type packages: np.ndarray or bytes
+        :return: (N, 6, 6) uint16 array and a boolean mask with the packages
+            that have a valid format. Invalid entries are filled with 0.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        if not isinstance(packages, np.ndarray):
+            packages = np.frombuffer(packages, dtype=np.uint8)
+        frame_matrix = packages.reshape((-1, PACKAGE_SIZE, FRAME_SIZE))
+
+        # Check the format of every frame and the order of the frame IDs.
+        valid = (frame_matrix[:, :, 0] == START_OF_FRAME).all(axis=1)
+        valid &= (frame_matrix[:, :, -1] == END_OF_FRAME).all(axis=1)
+        high_byte = CanFrameDecoder.make_byte(
+            frame_matrix[:, :, 1], frame_matrix[:, :, 2]) & 0x0F
+        low_byte = CanFrameDecoder.make_byte(
+            frame_matrix[:, :, 3], frame_matrix[:, :, 4])
+        frame_id = CanFrameDecoder.make_short(
+            high_byte.astype(np.uint16), low_byte)
+        valid &= (frame_id == DEVICE_ID + np.arange(PACKAGE_SIZE)).all(axis=1)
+
+        taxel_arrays = CanFrameDecoder._decode_frame_matrix(frame_matrix)
+        taxel_arrays[~valid] = 0
+        return taxel_arrays, valid
+
+    @staticmethod
+    def _decode_frame_matrix(frame_matrix: np.ndarray) -> np.ndarray:
+        """Decodes the taxels of one or more packages arranged as
+        (..., 12, 22) matrix.
+
+        :param frame_matrix: frames of the packages.
+        :type frame_matrix: np.ndarray
+        :return: (..., 6, 6) uint16 array.
+        :rtype: np.ndarray
+        """
+        # Decode the encoding applied by USB CAN stick.
+        byte_data = CanFrameDecoder.make_byte(
+            frame_matrix[..., 5:15:2], frame_matrix[..., 6:16:2]).astype(
+                np.uint16)
+
+        # Decode the encoding applied by CAN Device.
+        taxel_data = np.empty(
+            shape=frame_matrix.shape[:-1] + (3,), dtype=np.uint16)
+        taxel_data[..., 0] = CanFrameDecoder.make_short(
+            byte_data[..., 3] & 0x0F, byte_data[..., 0])
+        taxel_data[..., 1] = CanFrameDecoder.make_short(
+            (byte_data[..., 3] & 0xF0) >> 4, byte_data[..., 1])
+        taxel_data[..., 2] = CanFrameDecoder.make_short(
+            byte_data[..., 4] & 0x0F, byte_data[..., 2])
+
+        # Reshape to the proper array shape.
+        return taxel_data.reshape(frame_matrix.shape[:-2] + TAXELS_ARRAY_SIZE)
 
     @staticmethod
     def check_frame_format(frame: bytes) -> bool:
@@ -146,6 +196,64 @@ class CanFrameDecoder:
         return (high_byte << 8) | low_byte
 
 
+class CanStreamParser:
+    """Splits the stream of bytes coming from USB CAN stick into frames.
+    Incomplete frames are kept until the rest of the data arrives and the
+    stream is resynchronized when data does not match the frame format.
+    """
+
+    def __init__(self):
+        # Data received that was not processed yet.
+        self._buffer = bytearray()
+        # Amount of bytes ignored while searching for a valid frame.
+        self.discarded_bytes = 0
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """Adds new data to the stream and extracts all the complete frames.
+
+        :param data: new data coming from serial port.
+        :type data: bytes
+        :return: list of frames with a valid format.
+        :rtype: list[bytes]
+        """
+        buffer = self._buffer
+        buffer += data
+        buffer_size = len(buffer)
+        frames = []
+        index = 0
+        while True:
+            # Find the start of the next frame.
+            start_index = buffer.find(START_OF_FRAME_BYTE, index)
+            if start_index == -1:
+                index = buffer_size
+                break
+
+            # Wait for more data if the frame is incomplete.
+            stop_index = start_index + FRAME_SIZE
+            if stop_index > buffer_size:
+                index = start_index
+                break
+
+            # Resynchronize if the frame does not end where expected.
+            if buffer[stop_index - 1] != END_OF_FRAME:
+                index = start_index + 1
+                self.discarded_bytes += 1
+                continue
+
+            self.discarded_bytes += start_index - index
+            frames.append(bytes(buffer[start_index:stop_index]))
+            index = stop_index
+
+        # Remove the processed data from the buffer.
+        del buffer[:index]
+        return frames
+
+    def clear(self):
+        """Discards all the data stored in the stream.
+        """
+        self._buffer.clear()
+
+
 class CanTouchSdk:
     """This Class manages the communication with CAN devices over
     RS232 USB Adapter.
@@ -164,6 +272,8 @@ class CanTouchSdk:
             target=cls._can_data_thread)
         # list of devices that have to be polled for data.
         cls._device_list = []
+        # Stream parser of each device.
+        cls._stream_parsers = {}
         # Lock for internal variables.
         cls._lock = threading.Lock()
 
@@ -183,12 +293,67 @@ class CanTouchSdk:
         :rtype: list[CanDevice]
         """
         device_list = []
-        for port in comports():
-            if port.manufacturer in SUPPORTED_MANUFACTURERS_LIST:
-                device = CanDevice(port.name)
-                device_list.append(device)
+        for port in CanTouchSdk._find_ports():
+            device = CanDevice(port.name)
+            device_list.append(device)
         return device_list
 
+    @staticmethod
+    def find_cached_devices(
+            cache: DeviceCache,
+            callback: Callable[[list], None] = None) -> list[CanDevice]:
+        """Gets the devices seen in previous runs without searching. The
+        search runs in the background and updates the cache.
+
+        The SDK does not update the cache when a device is connected. Call
+        cache.update(device) and cache.save() after a successful connection
+        to store its settings as the last ones that worked.
+
+        :param cache: cache of devices.
+        :type cache: DeviceCache
+        :param callback: called with the devices found by the search that
+            were not in the cache, defaults to None
+        :type callback: Callable[[list], None], optional
+        :return: devices of the cache.
+        :rtype: list[CanDevice]
+        """
+        device_list = cache.create_devices(TouchDetectType.CAN)
+        thread = Thread(target=CanTouchSdk._reconcile_cache,
+                        args=(cache, callback), daemon=True)
+        thread.start()
+        return device_list
+
+    @staticmethod
+    def _reconcile_cache(cache: DeviceCache,
+                         callback: Callable[[list], None]):
+        """Searches the devices and updates the cache.
+
+        :param cache: cache of devices.
+        :type cache: DeviceCache
+        :param callback: called with the devices that were not in the
+            cache.
+        :type callback: Callable[[list], None]
+        """
+        device_list = []
+        serial_numbers = {}
+        for port in CanTouchSdk._find_ports():
+            device = CanDevice(port.name)
+            device_list.append(device)
+            serial_numbers[device.address] = port.serial_number
+        new_devices = cache.reconcile(device_list, serial_numbers)
+        if callback is not None:
+            callback(new_devices)
+
+    @staticmethod
+    def _find_ports() -> list:
+        """Lists the serial ports of supported manufacturers.
+
+        :return: information of the ports.
+        :rtype: list[ListPortInfo]
+        """
+        return [port for port in comports()
+                if port.manufacturer in SUPPORTED_MANUFACTURERS_LIST]
+
     @classmethod
     def connect(cls, can_device: CanDevice) -> bool:
         """connects to specific CAN device.
@@ -207,6 +372,7 @@ class CanTouchSdk:
         with cls._lock:
             if can_device not in cls._device_list:
                 cls._device_list.append(can_device)
+            cls._stream_parsers[can_device] = CanStreamParser()
 
         # Open the port.
         try:
@@ -250,6 +416,7 @@ class CanTouchSdk:
         with cls._lock:
             if can_device in cls._device_list:
                 cls._device_list.remove(can_device)
+            cls._stream_parsers.pop(can_device, None)
 
         # Disconnect port.
         try:
@@ -289,24 +456,84 @@ class CanTouchSdk:
         return can_device.taxels_array
 
     @staticmethod
-    def _get_frame(port: serial.Serial) -> bytes:
-        """Reads a valid package from Serial port.
+    def _get_frames(port: serial.Serial,
+                    stream_parser: CanStreamParser) -> list[bytes]:
+        """Reads all the data available from Serial port and splits it
+        into frames. It does not wait for new data.
 
         :param port: Serial Port to read
         :type port: serial.Serial
-        :raises serialutil.SerialTimeoutException: if failed to read data.
-        :return: package in byte format or None if there was a problem.
-        :rtype: bytes
+        :param stream_parser: parser that keeps the state of the stream.
+        :type stream_parser: CanStreamParser
+        :raises serialutil.SerialException: if failed to read data.
+        :return: list of frames with a valid format.
+        :rtype: list[bytes]
         """
-        # Read one frame.
-        data = port.read(FRAME_SIZE)
+        in_waiting = port.in_waiting
+        if not in_waiting:
+            return []
+        data = port.read(in_waiting)
 
         if not data:
+            return []
+        discarded_bytes = stream_parser.discarded_bytes
+        frames = stream_parser.feed(data)
+        if stream_parser.discarded_bytes != discarded_bytes:
+            logging.error('Data has not a valid format. %d bytes ignored',
+                          stream_parser.discarded_bytes - discarded_bytes)
+        return frames
+
+    @staticmethod
+    def _get_fileno(port: serial.Serial) -> int:
+        """Gets the file descriptor of a port to wait for data.
+
+        :param port: Serial Port
+        :type port: serial.Serial
+        :return: file descriptor, or None if the platform does not have one.
+        :rtype: int
+        """
+        try:
+            return port.fileno()
+        except (AttributeError, serialutil.SerialException):
             return None
-        if not CanFrameDecoder.check_frame_format(data):
-            logging.error('Package has not a valid format. It will be ignored')
-            return None
-        return data
+
+    @classmethod
+    def _read_device(cls, device: CanDevice, stream_parser: CanStreamParser):
+        """Reads the data available for a device and fires NEW_DATA for each
+        complete package.
+
+        :param device: device to read
+        :type device: CanDevice
+        :param stream_parser: parser that keeps the state of the stream.
+        :type stream_parser: CanStreamParser
+        """
+        # The port might be closed by disconnect() from another thread.
+        if not device.port_handler.is_open:
+            return
+
+        # Get all the frames available.
+        try:
+            frames = cls._get_frames(device.port_handler, stream_parser)
+        except (serialutil.SerialException, OSError):
+            logging.error('''Error reading data from serial
+                 port. Disconnecting port''')
+            cls.disconnect(device)
+            device.connection_status = ConnectionStatus.CONNECTION_LOST
+            return
+
+        for frame in frames:
+            # Add frame to buffer. Clear buffer if it is the first
+            # frame.
+            if CanFrameDecoder.is_starting_frame(frame):
+                device.data_buffer.clear()
+            device.data_buffer.append(frame)
+
+            # Decode package when there are enough frames.
+            if len(device.data_buffer) == PACKAGE_SIZE:
+                taxel_array = CanFrameDecoder.decode_package(
+                    device.data_buffer)
+                device.taxels_array = taxel_array
+                device.fire_event(CanEventType.NEW_DATA, taxel_array)
 
     @classmethod
     def _can_data_thread(cls):
@@ -315,45 +542,84 @@ class CanTouchSdk:
         # Event loop for running incomming data callback.
         loop_can_data = asyncio.new_event_loop()
         asyncio.set_event_loop(loop_can_data)
-        loop_can_data.run_until_complete(cls._can_data_task())
+        try:
+            loop_can_data.run_until_complete(cls._can_data_task())
+        finally:
+            loop_can_data.close()
 
     @classmethod
     async def _can_data_task(cls):
-        """Task for handling packages from CAN device.
+        """Task for handling packages from CAN device. The port of each
+        device is registered in the event loop and only read when it has
+        data, so a quiet device does not delay the others. Ports without a
+        file descriptor are polled without blocking.
         """
         logging.debug('CAN data task initialized')
+        loop = asyncio.get_running_loop()
+        # Device -> (file descriptor, stream parser) registered in the loop.
+        registered_devices = {}
+        # Device -> stream parser of the devices without file descriptor.
+        polled_devices = {}
+
         # Iterate until signal is sent.
         while not cls._stop_can_data_loop.is_set():
             # Copy objects and release the lock.
-            device_list = []
             with cls._lock:
-                device_list = copy.copy(cls._device_list)
-
-            # Iterate through devices.
-            for device in device_list:
-                # Get one Frame
+                stream_parsers = copy.copy(cls._stream_parsers)
+
+            # Forget the devices that were disconnected. Devices connected
+            # again get a new stream parser.
+            for device, (_, stream_parser) in list(
+                    registered_devices.items()):
+                if stream_parsers.get(device) is not stream_parser:
+                    cls._remove_reader(loop, registered_devices, device)
+            for device, stream_parser in list(polled_devices.items()):
+                if stream_parsers.get(device) is not stream_parser:
+                    del polled_devices[device]
+
+            # Register the new devices.
+            for device, stream_parser in stream_parsers.items():
+                if device in registered_devices or \
+                        device in polled_devices or \
+                        not device.port_handler.is_open:
+                    continue
+                fileno = cls._get_fileno(device.port_handler)
+                if fileno is None:
+                    polled_devices[device] = stream_parser
+                    continue
                 try:
-                    frame = cls._get_frame(device.port_handler)
-                    # Continue is no frame was decoded.
-                    if not frame:
-                        continue
-                except serialutil.SerialTimeoutException:
-                    logging.error('''Error reading data from serial
-                         port. Disconnecting port''')
-                    cls.disconnect(device)
-                    device.connection_status = ConnectionStatus.CONNECTION_LOST
+                    loop.add_reader(fileno, cls._read_device, device,
+                                    stream_parser)
+                except NotImplementedError:
+                    # The loop can not wait for this kind of descriptor.
+                    polled_devices[device] = stream_parser
                     continue
+                registered_devices[device] = (fileno, stream_parser)
+
+            for device, stream_parser in polled_devices.items():
+                cls._read_device(device, stream_parser)
+
+            await asyncio.sleep(DEVICE_LIST_UPDATE_SEC)
 
-                # Add frame to buffer. Clear buffer if it is not the first
-                # frame.
-                if CanFrameDecoder.is_starting_frame(frame):
-                    device.data_buffer.clear()
-                device.data_buffer.append(frame)
-
-                # Decode package when there are enough frames.
-                if len(device.data_buffer) == PACKAGE_SIZE:
-                    taxel_array = CanFrameDecoder.decode_package(
-                        device.data_buffer)
-                    device.taxels_array = taxel_array
-                    device.fire_event(CanEventType.NEW_DATA, taxel_array)
+        for device in list(registered_devices):
+            cls._remove_reader(loop, registered_devices, device)
         logging.debug('CAN data task finished')
+
+    @staticmethod
+    def _remove_reader(loop: asyncio.AbstractEventLoop,
+                       registered_devices: dict, device: CanDevice):
+        """Stop waiting for data of a device.
+
+        :param loop: loop where the device is registered.
+        :type loop: asyncio.AbstractEventLoop
+        :param registered_devices: device -> (file descriptor, stream
+            parser) registered.
+        :type registered_devices: dict
+        :param device: device to remove.
+        :type device: CanDevice
+        """
+        fileno, _ = registered_devices.pop(device)
+        # The descriptor might have been reused by a new port.
+        if all(fileno != registered_fileno
+               for registered_fileno, _ in registered_devices.values()):
+            loop.remove_reader(fileno)
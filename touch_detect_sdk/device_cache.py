@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+"""Stores the devices seen in previous runs for a fast startup."""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from threading import Lock
+
+from .ble_device import BleDevice
+from .can_device import CanDevice
+from .serial_device import SerialDevice
+from .touch_detect_device import TouchDetectDevice, TouchDetectType
+from .wsg_device import WsgDevice
+
+# Default location of the cache file.
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.touch_detect',
+                                  'devices.json')
+# Version of the format of the cache file.
+CACHE_VERSION = 1
+
+# Classes used for creating the devices of each type.
+_DEVICE_CLASSES = {
+    TouchDetectType.CAN: CanDevice,
+    TouchDetectType.BLE: BleDevice,
+    TouchDetectType.SERIAL: SerialDevice,
+    TouchDetectType.TCP: WsgDevice,
+}
+
+
+class CachedDevice():
+    """Information about a device seen in a previous run.
+    """
+
+    def __init__(self, device_type: TouchDetectType, address: str, *,
+                 name: str = None, taxels_array_size: tuple = (6, 6),
+                 serial_number: str = None, settings: dict = None,
+                 last_seen: float = 0.0):
+        """Initialize class
+
+        :param device_type: type of the device.
+        :type device_type: TouchDetectType
+        :param address: port path, MAC or IP address of the device.
+        :type address: str
+        :param name: name of the device, defaults to None
+        :type name: str, optional
+        :param taxels_array_size: size of the sensor array, defaults to (6, 6)
+        :type taxels_array_size: tuple, optional
+        :param serial_number: USB serial number, defaults to None
+        :type serial_number: str, optional
+        :param settings: arguments used the last time the device worked,
+            defaults to None
+        :type settings: dict, optional
+        :param last_seen: time when the device was last seen, as
+            time.time(), defaults to 0.0
+        :type last_seen: float, optional
+        """
+        self.device_type = device_type
+        self.address = address
+        self.name = name
+        self.taxels_array_size = tuple(taxels_array_size)
+        self.serial_number = serial_number
+        self.settings = settings or {}
+        self.last_seen = last_seen
+
+    @property
+    def key(self) -> tuple:
+        """Identifies the device in the cache. The serial number is
+        preferred because the port of an USB device may change.
+        :rtype: tuple
+        """
+        return (self.device_type, self.serial_number or self.address)
+
+    def create_device(self) -> TouchDetectDevice:
+        """Creates the device with the cached settings.
+
+        :return: device ready for connection.
+        :rtype: TouchDetectDevice
+        """
+        device_class = _DEVICE_CLASSES[self.device_type]
+        settings = dict(self.settings)
+        settings['taxels_array_size'] = self.taxels_array_size
+        if self.name is not None:
+            settings['name'] = self.name
+        if self.device_type == TouchDetectType.BLE:
+            settings.setdefault('device_id', self.name)
+        device = device_class(self.address, **settings)
+        return device
+
+    def to_dict(self) -> dict:
+        """Serializes the entry.
+
+        :return: entry as JSON compatible dictionary.
+        :rtype: dict
+        """
+        return {'type': self.device_type.name,
+                'address': self.address,
+                'name': self.name,
+                'taxels_array_size': list(self.taxels_array_size),
+                'serial_number': self.serial_number,
+                'settings': self.settings,
+                'last_seen': self.last_seen}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CachedDevice':
+        """Deserializes an entry.
+
+        :param data: entry created with to_dict.
+        :type data: dict
+        :return: cached device.
+        :rtype: CachedDevice
+        """
+        return cls(TouchDetectType[data['type']], data['address'],
+                   name=data.get('name'),
+                   taxels_array_size=data.get('taxels_array_size', (6, 6)),
+                   serial_number=data.get('serial_number'),
+                   settings=data.get('settings'),
+                   last_seen=data.get('last_seen', 0.0))
+
+
+def _get_settings(device: TouchDetectDevice) -> dict:
+    """Gets the arguments needed to create the device again.
+
+    :param device: device to inspect.
+    :type device: TouchDetectDevice
+    :return: keyword arguments for the constructor of the device.
+    :rtype: dict
+    """
+    if isinstance(device, CanDevice):
+        port = device.port_handler
+        return {'baudrate': port.baudrate, 'parity': port.parity,
+                'stop_bits': port.stopbits}
+    if isinstance(device, BleDevice):
+        return {'device_id': device.device_id}
+    if isinstance(device, WsgDevice):
+        return {'tcp_port': device.tcp_port}
+    return {}
+
+
+class DeviceCache():
+    """Persistent list of the devices seen in previous runs.
+
+    Devices are created from the cache and connected directly, while the
+    discovery runs in the background and reconciles the cache. Devices that
+    were not found by a discovery are kept, because they may be switched
+    off.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        """Initialize the cache and load it from disk.
+
+        :param path: file where the cache is stored, defaults to
+            DEFAULT_CACHE_PATH
+        :type path: str, optional
+        """
+        self._path = path
+        self._entries = {}
+        self._lock = Lock()
+        self.load()
+
+    @property
+    def path(self) -> str:
+        """File where the cache is stored.
+        :rtype: str
+        """
+        return self._path
+
+    def load(self):
+        """Loads the cache from disk. A missing or invalid file results in
+        an empty cache.
+        """
+        entries = {}
+        try:
+            with open(self._path, 'r', encoding='utf-8') as cache_file:
+                data = json.load(cache_file)
+            if data.get('version') == CACHE_VERSION:
+                for entry_data in data['devices']:
+                    entry = CachedDevice.from_dict(entry_data)
+                    entries[entry.key] = entry
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logging.warning('Could not load device cache %s: %s',
+                            self._path, error)
+        with self._lock:
+            self._entries = entries
+
+    def save(self):
+        """Writes the cache to disk. The file is replaced atomically, so a
+        crash never leaves a partial cache.
+        """
+        with self._lock:
+            data = {'version': CACHE_VERSION,
+                    'devices': [entry.to_dict()
+                                for entry in self._entries.values()]}
+        directory = os.path.dirname(os.path.abspath(self._path))
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory,
+                                                      suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w', encoding='utf-8') as file:
+                json.dump(data, file, indent=2)
+            os.replace(temp_path, self._path)
+        except OSError:
+            os.remove(temp_path)
+            raise
+
+    def entries(self, device_type: TouchDetectType = None) -> list:
+        """Gets the cached devices.
+
+        :param device_type: type of the devices, defaults to None for all.
+        :type device_type: TouchDetectType, optional
+        :return: cached devices, the most recently seen first.
+        :rtype: list[CachedDevice]
+        """
+        with self._lock:
+            entries = [entry for entry in self._entries.values()
+                       if device_type in (None, entry.device_type)]
+        entries.sort(key=lambda entry: entry.last_seen, reverse=True)
+        return entries
+
+    def create_devices(self, device_type: TouchDetectType) -> list:
+        """Creates the cached devices of a type.
+
+        :param device_type: type of the devices.
+        :type device_type: TouchDetectType
+        :return: devices ready for connection.
+        :rtype: list[TouchDetectDevice]
+        """
+        return [entry.create_device() for entry in self.entries(device_type)]
+
+    def update(self, device: TouchDetectDevice, serial_number: str = None,
+               settings: dict = None) -> CachedDevice:
+        """Adds or refreshes a device. Call it after a successful connection
+        to store the settings that worked. Settings of previous updates are
+        kept unless overwritten. The cache is not saved.
+
+        :param device: device seen.
+        :type device: TouchDetectDevice
+        :param serial_number: USB serial number, defaults to None
+        :type serial_number: str, optional
+        :param settings: extra arguments for the constructor of the device,
+            defaults to None
+        :type settings: dict, optional
+        :return: updated entry.
+        :rtype: CachedDevice
+        """
+        device_settings = _get_settings(device)
+        device_settings.update(settings or {})
+        entry = CachedDevice(device.device_type, device.address,
+                             name=device.name,
+                             taxels_array_size=device.taxels_array_size,
+                             serial_number=serial_number,
+                             settings=device_settings, last_seen=time.time())
+        with self._lock:
+            previous = self._entries.pop(entry.key, None)
+            if previous is not None:
+                entry.settings = {**previous.settings, **entry.settings}
+            self._entries[entry.key] = entry
+        return entry
+
+    def remove(self, device_type: TouchDetectType, address: str):
+        """Removes a device from the cache.
+
+        :param device_type: type of the device.
+        :type device_type: TouchDetectType
+        :param address: address or serial number of the device.
+        :type address: str
+        """
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.device_type == device_type and \
+                        address in (entry.address, entry.serial_number):
+                    del self._entries[key]
+
+    def reconcile(self, devices: list, serial_numbers: dict = None) -> list:
+        """Updates the cache with the result of a discovery and saves it.
+
+        :param devices: devices found by the discovery.
+        :type devices: list[TouchDetectDevice]
+        :param serial_numbers: USB serial number of each address, defaults
+            to None
+        :type serial_numbers: dict, optional
+        :return: devices that were not in the cache.
+        :rtype: list[TouchDetectDevice]
+        """
+        serial_numbers = serial_numbers or {}
+        new_devices = []
+        for device in devices:
+            serial_number = serial_numbers.get(device.address)
+            key = (device.device_type, serial_number or device.address)
+            with self._lock:
+                is_new = key not in self._entries
+            if is_new:
+                new_devices.append(device)
+            self.update(device, serial_number)
+        try:
+            self.save()
+        except OSError as error:
+            logging.warning('Could not save device cache %s: %s',
+                            self._path, error)
+        return new_devices
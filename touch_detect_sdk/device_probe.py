@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""Identifies the TouchDetect devices connected to serial ports."""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+
+import serial  # pyserial
+from serial.serialutil import SerialException
+from serial.tools.list_ports import comports
+# pylint: disable=no-name-in-module
+from yahdlc import FRAME_ACK, FRAME_DATA, FCSError, MessageError, get_data
+# pylint: enable=no-name-in-module
+
+from . import can_device
+from . import serial_device
+from .can_device import CanDevice
+from .can_touch_sdk import SUPPORTED_MANUFACTURERS_LIST, CanStreamParser
+from .serial_device import ACK_REPLY_FRAME, GET_DATA_REQUEST_FRAME, \
+    HdlcDeframer, SerialDevice
+from .touch_detect_device import TouchDetectType
+
+# Time to identify all the ports in seconds.
+DEFAULT_PROBE_TIMEOUT_SEC = 0.5
+# Part of the timeout used for listening to CAN frames. The rest is used
+# for the GET_DATA request of serial devices.
+CAN_LISTEN_RATIO = 0.5
+# Valid CAN frames needed for identifying a CAN stick.
+MIN_CAN_FRAMES = 2
+# Timeout of each read from the port in seconds.
+PROBE_READ_TIMEOUT_SEC = 0.01
+
+
+class DeviceProbe:
+    """Opens all the candidate ports at the same time and identifies the
+    ones connected to TouchDetect devices. CAN sticks are recognized by the
+    frames they stream and serial devices by their reply to GET_DATA, so
+    identifying many ports takes a single timeout.
+
+    Probing toggles DTR and RTS and writes a request, which may disturb
+    other devices. By default only the ports of supported manufacturers
+    are probed.
+    """
+
+    @staticmethod
+    def probe_ports(ports: list = None,
+                    timeout: float = DEFAULT_PROBE_TIMEOUT_SEC, *,
+                    probe_unknown_ports: bool = False) -> dict:
+        """Identifies the devices connected to the ports.
+
+        :param ports: paths of the ports to probe, defaults to None for the
+            serial ports of supported manufacturers.
+        :type ports: list, optional
+        :param timeout: maximum duration of the probe in seconds, defaults
+            to DEFAULT_PROBE_TIMEOUT_SEC
+        :type timeout: float, optional
+        :param probe_unknown_ports: probe all the serial ports of the system
+            when no ports are given, defaults to False
+        :type probe_unknown_ports: bool, optional
+        :return: ports that answered, by type of device.
+        :rtype: dict[TouchDetectType, list[str]]
+        """
+        if ports is None:
+            ports = [port.device for port in comports()
+                     if probe_unknown_ports or
+                     port.manufacturer in SUPPORTED_MANUFACTURERS_LIST]
+        result = {TouchDetectType.CAN: [], TouchDetectType.SERIAL: []}
+        if not ports:
+            return result
+
+        start_time = time.perf_counter()
+        can_deadline = start_time + timeout * CAN_LISTEN_RATIO
+        deadline = start_time + timeout
+        with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+            device_types = executor.map(
+                lambda port: DeviceProbe._probe_port(
+                    port, can_deadline, deadline), ports)
+            for port, device_type in zip(ports, device_types):
+                if device_type is not None:
+                    result[device_type].append(port)
+        return result
+
+    @staticmethod
+    def find_devices(ports: list = None,
+                     timeout: float = DEFAULT_PROBE_TIMEOUT_SEC, *,
+                     probe_unknown_ports: bool = False) -> list:
+        """Creates a device for each port that answered the probe.
+
+        :param ports: paths of the ports to probe, defaults to None for the
+            serial ports of supported manufacturers.
+        :type ports: list, optional
+        :param timeout: maximum duration of the probe in seconds, defaults
+            to DEFAULT_PROBE_TIMEOUT_SEC
+        :type timeout: float, optional
+        :param probe_unknown_ports: probe all the serial ports of the system
+            when no ports are given, defaults to False
+        :type probe_unknown_ports: bool, optional
+        :return: devices ready for connection.
+        :rtype: list[TouchDetectDevice]
+        """
+        result = DeviceProbe.probe_ports(
+            ports, timeout, probe_unknown_ports=probe_unknown_ports)
+        return [CanDevice(port) for port in result[TouchDetectType.CAN]] + \
+            [SerialDevice(port) for port in result[TouchDetectType.SERIAL]]
+
+    @staticmethod
+    def _probe_port(port: str, can_deadline: float,
+                    deadline: float) -> TouchDetectType:
+        """Identifies the device connected to a port.
+
+        :param port: path of the port.
+        :type port: str
+        :param can_deadline: time.perf_counter() value to stop listening
+            to CAN frames.
+        :type can_deadline: float
+        :param deadline: time.perf_counter() value to give up.
+        :type deadline: float
+        :return: type of device or None if it was not identified.
+        :rtype: TouchDetectType
+        """
+        try:
+            with serial.Serial(port, can_device.BAUDRATE,
+                               bytesize=can_device.BYTE_SIZE,
+                               parity=can_device.PARITY,
+                               stopbits=can_device.STOP_BITS,
+                               timeout=PROBE_READ_TIMEOUT_SEC) as port_handler:
+                if DeviceProbe._is_can_device(port_handler, can_deadline):
+                    return TouchDetectType.CAN
+                if DeviceProbe._is_serial_device(port_handler, deadline):
+                    return TouchDetectType.SERIAL
+        except (SerialException, OSError) as error:
+            logging.debug('Could not probe port %s: %s', port, error)
+        return None
+
+    @staticmethod
+    def _is_can_device(port_handler: serial.Serial, deadline: float) -> bool:
+        """Listens to the port for the frames streamed by CAN sticks.
+
+        :param port_handler: open port.
+        :type port_handler: serial.Serial
+        :param deadline: time.perf_counter() value to stop listening.
+        :type deadline: float
+        :return: True if valid CAN frames were received.
+        :rtype: bool
+        """
+        port_handler.reset_input_buffer()
+        DeviceProbe._set_control_lines(port_handler, False)
+        parser = CanStreamParser()
+        frame_count = 0
+        while time.perf_counter() < deadline:
+            new_data = port_handler.read(max(1, port_handler.in_waiting))
+            if new_data:
+                frame_count += len(parser.feed(new_data))
+                if frame_count >= MIN_CAN_FRAMES:
+                    return True
+        DeviceProbe._set_control_lines(port_handler, True)
+        return False
+
+    @staticmethod
+    def _is_serial_device(port_handler: serial.Serial,
+                          deadline: float) -> bool:
+        """Sends GET_DATA and waits for a valid reply. The reply is
+        acknowledged as SerialDevice does, otherwise the device considers
+        the transaction failed.
+
+        :param port_handler: open port.
+        :type port_handler: serial.Serial
+        :param deadline: time.perf_counter() value to give up.
+        :type deadline: float
+        :return: True if the port replied with sensor data.
+        :rtype: bool
+        """
+        port_handler.baudrate = serial_device.DEFAULT_BAUDRATE
+        port_handler.parity = serial_device.PARITY
+        port_handler.stopbits = serial_device.STOP_BITS
+        port_handler.reset_input_buffer()
+        port_handler.write(GET_DATA_REQUEST_FRAME)
+        deframer = HdlcDeframer()
+        data_received = False
+        while time.perf_counter() < deadline:
+            new_data = port_handler.read(max(1, port_handler.in_waiting))
+            if not new_data:
+                continue
+            for frame in deframer.feed(new_data):
+                try:
+                    data, frame_type, _ = get_data(bytes(frame))
+                except (FCSError, MessageError):
+                    continue
+                if frame_type == FRAME_DATA and \
+                        len(data) == serial_device.DEFAULT_SENSOR_ARRAY_SIZE:
+                    data_received = True
+                # The device ends its reply with an ACK.
+                elif frame_type == FRAME_ACK and data_received:
+                    port_handler.write(ACK_REPLY_FRAME)
+                    return True
+        # The ACK of the device was not received. Acknowledge the data
+        # anyway.
+        if data_received:
+            port_handler.write(ACK_REPLY_FRAME)
+        return data_received
+
+    @staticmethod
+    def _set_control_lines(port_handler: serial.Serial, state: bool):
+        """Sets DTR and RTS as CanTouchSdk does. Ports that do not support
+        them are ignored.
+
+        :param port_handler: open port.
+        :type port_handler: serial.Serial
+        :param state: new state of the lines.
+        :type state: bool
+        """
+        try:
+            port_handler.setDTR(state)
+            port_handler.setRTS(state)
+        except (SerialException, OSError):
+            pass
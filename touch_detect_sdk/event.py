@@ -2,7 +2,24 @@
 
 """Library for implementing custom events in classes"""
 
-from threading import Lock
+import logging
+from collections import deque
+from enum import Enum, unique
+from threading import Condition, Lock, Thread
+
+from .periodic_timer import PeriodicTimer, PeriodicTimerSuscriber
+
+# Default amount of events that can wait for delivery.
+DEFAULT_QUEUE_SIZE = 256
+
+
+@unique
+class EventOverflowPolicy(Enum):
+    """Describes what happens when the delivery queue of an event is full.
+    """
+    DROP_OLDEST = 0
+    DROP_NEWEST = 1
+    BLOCK = 2
 
 
 class EventSuscriberInterface():
@@ -15,50 +32,501 @@ class EventSuscriberInterface():
         pass    # pylint: disable=unnecessary-pass
 
 
+def _get_callback(func):
+    """Gets the function to call for delivering events to a suscriber.
+
+    :param func: EventSuscriberInterface object or callable.
+    :type func: EventSuscriberInterface or Callable
+    :raises TypeError: if func can not be called.
+    :return: callable that receives (sender, earg).
+    :rtype: Callable
+    """
+    if isinstance(func, EventSuscriberInterface):
+        return func.touch_detect_event
+    if callable(func):
+        return func
+    raise TypeError('''Only EventSuscriberInterface objects or
+                    callables can be added to EventHandler''')
+
+
+class ConflatingSuscriber(EventSuscriberInterface, PeriodicTimerSuscriber):
+    """Delivers only the most recent data event of each sender at a maximum
+    rate, from its own timer. The rest of the events are delivered
+    immediately and never dropped.
+    """
+
+    def __init__(self, func, max_rate: float, conflated_types):
+        """Initialize the suscriber.
+
+        :param func: EventSuscriberInterface object or callable that
+            receives (sender, earg).
+        :type func: EventSuscriberInterface or Callable
+        :param max_rate: maximum rate of delivery of data events in Hz.
+        :type max_rate: float
+        :param conflated_types: types of event where only the most recent
+            one is delivered, for example NEW_DATA.
+        :type conflated_types: Iterable
+        """
+        self.func = func
+        self._callback = _get_callback(func)
+        self._period = 1.0 / max_rate
+        self._conflated_types = frozenset(conflated_types)
+        self._timer = PeriodicTimer()
+        # Most recent data event of each sender.
+        self._latest_events = {}
+        self._lock = Lock()
+        # Ensures that func is not called from two threads at once.
+        self._delivery_lock = Lock()
+        self._conflated_events = 0
+
+    @property
+    def conflated_events(self) -> int:
+        """Amount of data events replaced by a newer one before delivery.
+        :rtype: int
+        """
+        with self._lock:
+            return self._conflated_events
+
+    def start(self):
+        """Start delivering data events.
+        """
+        self._timer.start(self, self._period)
+
+    def stop(self):
+        """Stop delivering data events.
+        """
+        self._timer.stop()
+
+    def touch_detect_event(self, sender: object, earg: object):
+        """Handles the event.
+        """
+        if getattr(earg, 'type', None) in self._conflated_types:
+            with self._lock:
+                if self._latest_events.pop(sender, None) is not None:
+                    self._conflated_events += 1
+                self._latest_events[sender] = earg
+            return
+
+        # Deliver pending data first to keep the order of the events.
+        with self._delivery_lock:
+            with self._lock:
+                pending_earg = self._latest_events.pop(sender, None)
+            if pending_earg is not None:
+                self._callback(sender, pending_earg)
+            self._callback(sender, earg)
+
+    def on_timer_event(self):
+        """Deliver the most recent data event of each sender.
+        """
+        with self._delivery_lock:
+            with self._lock:
+                latest_events = self._latest_events
+                self._latest_events = {}
+            for sender, earg in latest_events.items():
+                self._callback(sender, earg)
+
+
+class EventDispatcher():
+    """Delivers events to the suscribers from its own threads, so the thread
+    that fires the event does not wait for the suscribers.
+    """
+
+    def __init__(self, event: 'Event', max_size: int = DEFAULT_QUEUE_SIZE,
+                 overflow_policy: EventOverflowPolicy =
+                 EventOverflowPolicy.DROP_OLDEST,
+                 n_threads: int = 1):
+        """Initialize the dispatcher.
+
+        :param event: event whose suscribers are called.
+        :type event: Event
+        :param max_size: maximum amount of events waiting for delivery,
+            defaults to DEFAULT_QUEUE_SIZE
+        :type max_size: int, optional
+        :param overflow_policy: what to do when the queue is full, defaults
+            to DROP_OLDEST
+        :type overflow_policy: EventOverflowPolicy, optional
+        :param n_threads: amount of threads delivering events. With more
+            than one thread events may be delivered out of order, defaults
+            to 1
+        :type n_threads: int, optional
+        """
+        self._event = event
+        self._max_size = max_size
+        self._overflow_policy = overflow_policy
+        self._queue = deque()
+        self._condition = Condition()
+        self._running = True
+        self._dropped_events = 0
+        self._threads = [Thread(target=self._run, daemon=True)
+                         for _ in range(n_threads)]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def dropped_events(self) -> int:
+        """Amount of events discarded because the queue was full.
+        :rtype: int
+        """
+        with self._condition:
+            return self._dropped_events
+
+    @property
+    def pending_events(self) -> int:
+        """Amount of events waiting for delivery.
+        :rtype: int
+        """
+        with self._condition:
+            return len(self._queue)
+
+    def put(self, earg: object = None, sender: object = None):
+        """Adds an event to the delivery queue.
+
+        :param earg: parameters to send through the event, defaults to None
+        :type earg: object, optional
+        :param sender: object reported as sender of the event, defaults to
+            None
+        :type sender: object, optional
+        """
+        with self._condition:
+            if self._running and len(self._queue) >= self._max_size:
+                if self._overflow_policy == EventOverflowPolicy.DROP_NEWEST:
+                    self._dropped_events += 1
+                    return
+                if self._overflow_policy == EventOverflowPolicy.DROP_OLDEST:
+                    self._queue.popleft()
+                    self._dropped_events += 1
+                else:
+                    self._condition.wait_for(
+                        lambda: len(self._queue) < self._max_size or
+                        not self._running)
+            running = self._running
+            if running:
+                self._queue.append((earg, sender))
+                self._condition.notify_all()
+
+        # Nobody drains the queue after stop(), deliver from the caller.
+        if not running:
+            self._event.dispatch(earg, sender)
+
+    def stop(self):
+        """Delivers the events left in the queue and stops the threads.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        """Thread that delivers the events.
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._queue or not self._running)
+                if not self._queue:
+                    return
+                earg, sender = self._queue.popleft()
+                self._condition.notify_all()
+            try:
+                self._event.dispatch(earg, sender)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception('Error delivering event')
+
+
 class Event():
     """ Class for handling events.
     """
 
-    def __init__(self, doc: str = None):
+    def __init__(self, doc: str = None, sender: object = None,
+                 parent: 'Event' = None):
         """Initialize the event
 
         :param doc: Description about the event, defaults to None
         :type doc: str, optional
+        :param sender: object reported to the suscribers as sender of the
+            event. The event itself is reported if None, defaults to None
+        :type sender: object, optional
+        :param parent: event that is also fired every time this event is
+            fired, defaults to None
+        :type parent: Event, optional
         """
         self.__doc__ = doc
         self._lock = Lock()
-        self._suscriber_list = []
+        # Immutable snapshots of the suscribers and of the callbacks to call
+        # for each type of event. They are replaced on every change, so
+        # firing the event does not require the lock.
+        self._subscriptions = ()
+        self._suscriber_list = ()
+        self._dispatch_table = ({}, ())
+        # Dispatcher used when events are delivered asynchronously.
+        self._dispatcher = None
+        self._sender = sender
+        self._parent = parent
+
+    @property
+    def dispatcher(self) -> EventDispatcher:
+        """Dispatcher delivering the events, None if events are delivered
+        from the thread that fires them.
+        :rtype: EventDispatcher
+        """
+        return self._dispatcher
+
+    def enable_async_delivery(self, max_size: int = DEFAULT_QUEUE_SIZE,
+                              overflow_policy: EventOverflowPolicy =
+                              EventOverflowPolicy.DROP_OLDEST,
+                              n_threads: int = 1) -> EventDispatcher:
+        """Deliver events from dedicated threads instead of the thread that
+        fires them. Slow suscribers then do not delay the caller.
+
+        :param max_size: maximum amount of events waiting for delivery,
+            defaults to DEFAULT_QUEUE_SIZE
+        :type max_size: int, optional
+        :param overflow_policy: what to do when the queue is full, defaults
+            to DROP_OLDEST
+        :type overflow_policy: EventOverflowPolicy, optional
+        :param n_threads: amount of threads delivering events, defaults to 1
+        :type n_threads: int, optional
+        :return: dispatcher delivering the events.
+        :rtype: EventDispatcher
+        """
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = EventDispatcher(
+                    self, max_size, overflow_policy, n_threads)
+            return self._dispatcher
+
+    def disable_async_delivery(self):
+        """Deliver the events left in the queue and go back to delivering
+        events from the thread that fires them.
+        """
+        with self._lock:
+            dispatcher = self._dispatcher
+            self._dispatcher = None
+        if dispatcher is not None:
+            dispatcher.stop()
 
-    def _getfunctionlist(self) -> list:
+    def _getfunctionlist(self) -> tuple:
         """ Get reference to internal attributes of the class
 
-        :return: list of suscribers
-        :rtype: list
+        :return: snapshot of the suscribers
+        :rtype: tuple
         """
+        return self._suscriber_list
+
+    def subscribe(self, func, types=None):
+        """ Adds a suscriber to the event.
 
+        :param func: EventSuscriberInterface object or callable that
+            receives (sender, earg).
+        :type func: EventSuscriberInterface or Callable
+        :param types: types of event the suscriber is interested in. Events
+            are filtered by the type attribute of earg. All the events are
+            delivered if None, defaults to None
+        :type types: Iterable, optional
+        :raises TypeError: if func can not be called.
+        """
+        callback = _get_callback(func)
+        if types is not None:
+            types = frozenset(types)
         with self._lock:
-            return self._suscriber_list
+            self._publish(self._subscriptions + ((func, callback, types),))
+
+    def subscribe_conflated(self, func, max_rate: float,
+                            conflated_types) -> ConflatingSuscriber:
+        """ Adds a suscriber that only receives the most recent data event
+        at a maximum rate. Other events are delivered immediately.
+
+        :param func: EventSuscriberInterface object or callable that
+            receives (sender, earg).
+        :type func: EventSuscriberInterface or Callable
+        :param max_rate: maximum rate of delivery of data events in Hz.
+        :type max_rate: float
+        :param conflated_types: types of event that are conflated, for
+            example NEW_DATA.
+        :type conflated_types: Iterable
+        :return: suscriber added to the event. Pass it to unsubscribe to
+            remove it.
+        :rtype: ConflatingSuscriber
+        """
+        suscriber = ConflatingSuscriber(func, max_rate, conflated_types)
+        suscriber.start()
+        self.subscribe(suscriber)
+        return suscriber
+
+    def unsubscribe(self, func):
+        """ Removes a suscriber from the event.
+
+        :param func: suscriber to remove.
+        :type func: EventSuscriberInterface or Callable
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            for index, subscription in enumerate(subscriptions):
+                if subscription[0] == func:
+                    del subscriptions[index]
+                    self._publish(tuple(subscriptions))
+                    break
+            else:
+                return
+
+        # Conflating suscribers have their own timer.
+        if isinstance(func, ConflatingSuscriber):
+            func.stop()
+
+    def _publish(self, subscriptions: tuple):
+        """Replaces the snapshot of suscribers and rebuilds the dispatch
+        table. Must be called with the lock held.
+
+        :param subscriptions: (suscriber, callback, types) of each suscriber.
+        :type subscriptions: tuple
+        """
+        default_callbacks = tuple(
+            callback for _, callback, types in subscriptions if types is None)
+        event_types = set()
+        for _, _, types in subscriptions:
+            if types is not None:
+                event_types |= types
+        type_callbacks = {
+            event_type: tuple(
+                callback for _, callback, types in subscriptions
+                if types is None or event_type in types)
+            for event_type in event_types}
+
+        self._subscriptions = subscriptions
+        self._dispatch_table = (type_callbacks, default_callbacks)
+        self._suscriber_list = tuple(
+            suscriber for suscriber, _, _ in subscriptions)
 
     def __add__(self, func):
         """ Adds a suscriber to the event.
         """
-        if isinstance(func, EventSuscriberInterface):
-            self._getfunctionlist().append(func)
-        else:
-            raise TypeError('''Only EventSuscriberInterface
-                            objects can be added to EventHandler''')
+        self.subscribe(func)
         return self
 
     def __sub__(self, func):
         """ Removes a suscriber from the event.
         """
-        if func in self._getfunctionlist():
-            self._getfunctionlist().remove(func)
-            return self
+        self.unsubscribe(func)
         return self
 
     def __call__(self, earg=None):
         """Fire event and call all the suscribers.
         """
-        for func in self._getfunctionlist():
-            func.touch_detect_event(self, earg)
+        self._fire(earg, self._sender)
+
+    def dispatch(self, earg=None, sender: object = None):
+        """Call all the suscribers from the current thread.
+        """
+        if sender is None:
+            sender = self if self._sender is None else self._sender
+        type_callbacks, callbacks = self._dispatch_table
+        if type_callbacks:
+            callbacks = type_callbacks.get(
+                getattr(earg, 'type', None), callbacks)
+        for callback in callbacks:
+            callback(sender, earg)
+
+    def _fire(self, earg, sender: object):
+        """Deliver the event to the suscribers and to the parent event.
+        """
+        dispatcher = self._dispatcher
+        if dispatcher is not None:
+            dispatcher.put(earg, sender)
+        elif self._suscriber_list:
+            self.dispatch(earg, sender)
+        if self._parent is not None:
+            self._parent._fire(earg, sender)  # pylint: disable=protected-access
+
+
+class EventChannel():
+    """Gives each instance of a class its own Event, created the first time
+    it is used. Suscribers of an instance only receive the events of that
+    instance, with the instance as sender.
+
+    When accessed through the class it behaves as a class-wide Event that
+    receives the events of every instance.
+    """
+
+    def __init__(self, doc: str = None):
+        """Initialize the channel.
+
+        :param doc: Description about the event, defaults to None
+        :type doc: str, optional
+        """
+        self.__doc__ = doc
+        self.class_event = Event(doc)
+        self._attribute_name = None
+        self._lock = Lock()
+
+    def __set_name__(self, owner, name):
+        self._attribute_name = '_' + name + '_channel'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        event = instance.__dict__.get(self._attribute_name)
+        if event is None:
+            with self._lock:
+                event = instance.__dict__.setdefault(
+                    self._attribute_name,
+                    Event(self.__doc__, instance, self.class_event))
+        return event
+
+    def __set__(self, instance, value):
+        # Allows "instance.events += suscriber", which assigns the event
+        # back to the attribute.
+        if value is not self.__get__(instance):
+            raise AttributeError('Event channel can not be replaced')
+
+    def subscribe(self, func, types=None):
+        """ Adds a suscriber to the class-wide event.
+
+        :param func: EventSuscriberInterface object or callable that
+            receives (sender, earg).
+        :type func: EventSuscriberInterface or Callable
+        :param types: types of event the suscriber is interested in,
+            defaults to None
+        :type types: Iterable, optional
+        """
+        self.class_event.subscribe(func, types)
+
+    def subscribe_conflated(self, func, max_rate: float,
+                            conflated_types) -> ConflatingSuscriber:
+        """ Adds a conflating suscriber to the class-wide event. The most
+        recent data event of each device is delivered.
+
+        :param func: EventSuscriberInterface object or callable that
+            receives (sender, earg).
+        :type func: EventSuscriberInterface or Callable
+        :param max_rate: maximum rate of delivery of data events in Hz.
+        :type max_rate: float
+        :param conflated_types: types of event that are conflated.
+        :type conflated_types: Iterable
+        :return: suscriber added to the event.
+        :rtype: ConflatingSuscriber
+        """
+        return self.class_event.subscribe_conflated(
+            func, max_rate, conflated_types)
+
+    def unsubscribe(self, func):
+        """ Removes a suscriber from the class-wide event.
+        """
+        self.class_event.unsubscribe(func)
+
+    def __add__(self, func):
+        """ Adds a suscriber to the class-wide event.
+        """
+        self.class_event += func
+        return self
+
+    def __sub__(self, func):
+        """ Removes a suscriber from the class-wide event.
+        """
+        self.class_event -= func
+        return self
+
+    def __call__(self, earg=None):
+        """Fire the class-wide event.
+        """
+        self.class_event(earg)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+"""Keeps the most recent frames of a device in preallocated memory."""
+
+from threading import Lock
+import time
+
+import numpy as np
+
+
+class HistoryWindow():
+    """Consecutive frames of a FrameHistory. The arrays are readonly views
+    of the history and new frames overwrite the oldest ones, so a window of
+    n frames starts to change after capacity - n + 1 appends. A window of
+    the whole capacity changes with the next append. Frames are usually
+    appended from another thread, so copy() the window and check it with
+    FrameHistory.is_intact() before using it.
+    """
+
+    def __init__(self, frames: np.ndarray, timestamps: np.ndarray,
+                 sequence_numbers: np.ndarray,
+                 first_sequence_number: int = 0):
+        """Initialize class
+
+        :param frames: frames, the oldest first.
+        :type frames: np.ndarray
+        :param timestamps: time when each frame arrived.
+        :type timestamps: np.ndarray
+        :param sequence_numbers: number of each frame since the history was
+            created.
+        :type sequence_numbers: np.ndarray
+        :param first_sequence_number: sequence number of the oldest frame
+            when the window was created, defaults to 0
+        :type first_sequence_number: int, optional
+        """
+        self.frames = frames
+        self.timestamps = timestamps
+        self.sequence_numbers = sequence_numbers
+        self.first_sequence_number = first_sequence_number
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def copy(self) -> 'HistoryWindow':
+        """Copies the window so it is not overwritten by new frames.
+
+        :return: window that owns its data.
+        :rtype: HistoryWindow
+        """
+        return HistoryWindow(self.frames.copy(), self.timestamps.copy(),
+                             self.sequence_numbers.copy(),
+                             self.first_sequence_number)
+
+
+class FrameHistory():
+    """Ring buffer with the most recent frames of a device.
+
+    Every frame is written twice, at its position and one capacity later,
+    so any window of up to capacity frames is contiguous in memory and can
+    be returned as a view without copying. Memory is allocated once.
+    Timestamps never decrease, so windows are found by binary search.
+    """
+
+    def __init__(self, capacity: int, rows: int, cols: int,
+                 dtype: np.dtype = np.float64):
+        """Initialize the history.
+
+        :param capacity: amount of frames stored.
+        :type capacity: int
+        :param rows: rows of each frame.
+        :type rows: int
+        :param cols: columns of each frame.
+        :type cols: int
+        :param dtype: type of the data of the frames, defaults to
+            np.float64
+        :type dtype: np.dtype, optional
+        :raises ValueError: if capacity is not positive.
+        """
+        if capacity < 1:
+            raise ValueError('Capacity of the history must be positive')
+        self._capacity = capacity
+        self._frames = np.zeros((2 * capacity, rows, cols), dtype=dtype)
+        self._timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self._sequence_numbers = np.zeros(2 * capacity, dtype=np.int64)
+        # Amount of frames appended since the history was created.
+        self._count = 0
+        self._lock = Lock()
+
+    @property
+    def capacity(self) -> int:
+        """Amount of frames stored.
+        :rtype: int
+        """
+        return self._capacity
+
+    @property
+    def frame_count(self) -> int:
+        """Amount of frames appended since the history was created.
+        :rtype: int
+        """
+        with self._lock:
+            return self._count
+
+    def __len__(self) -> int:
+        with self._lock:
+            return min(self._count, self._capacity)
+
+    def append(self, frame: np.ndarray, timestamp: float = None) -> int:
+        """Stores a frame, overwriting the oldest one if the history is full.
+
+        :param frame: data of the frame.
+        :type frame: np.ndarray
+        :param timestamp: time when the frame arrived, defaults to None for
+            time.monotonic(). Earlier values than the previous frame are
+            replaced by the timestamp of the previous frame.
+        :type timestamp: float, optional
+        :return: sequence number of the frame.
+        :rtype: int
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            sequence_number = self._count
+            index = sequence_number % self._capacity
+            if sequence_number > 0:
+                timestamp = max(timestamp, self._timestamps[
+                    (sequence_number - 1) % self._capacity])
+            for position in (index, index + self._capacity):
+                self._frames[position] = frame
+                self._timestamps[position] = timestamp
+                self._sequence_numbers[position] = sequence_number
+            self._count = sequence_number + 1
+        return sequence_number
+
+    def latest(self, amount: int = 1) -> HistoryWindow:
+        """Gets the most recent frames.
+
+        :param amount: amount of frames, defaults to 1. Limited to the
+            frames stored.
+        :type amount: int, optional
+        :return: frames, the oldest first.
+        :rtype: HistoryWindow
+        """
+        with self._lock:
+            amount = max(0, min(amount, self._count, self._capacity))
+            return self._window(self._count - amount, self._count)
+
+    def since(self, timestamp: float) -> HistoryWindow:
+        """Gets the frames that arrived at or after a time.
+
+        :param timestamp: time of the oldest frame, in the same clock as
+            the timestamps given to append.
+        :type timestamp: float
+        :return: frames, the oldest first.
+        :rtype: HistoryWindow
+        """
+        with self._lock:
+            first = max(0, self._count - self._capacity)
+            start = first % self._capacity
+            timestamps = self._timestamps[start:start + self._count - first]
+            offset = int(np.searchsorted(timestamps, timestamp, side='left'))
+            return self._window(first + offset, self._count)
+
+    def is_intact(self, window: HistoryWindow) -> bool:
+        """Checks that none of the frames of a window was overwritten yet.
+        Checking a copy after making it proves that the copy is consistent::
+
+            window = history.latest(n).copy()
+            if history.is_intact(window):
+                process(window)
+
+        :param window: window returned by this history or a copy of it.
+        :type window: HistoryWindow
+        :return: True if the window still holds the frames it had when it
+            was created.
+        :rtype: bool
+        """
+        with self._lock:
+            return self._count - self._capacity <= \
+                window.first_sequence_number
+
+    def clear(self):
+        """Discards all the frames. Sequence numbers start again from 0.
+        """
+        with self._lock:
+            self._count = 0
+
+    def _window(self, first: int, end: int) -> HistoryWindow:
+        """Creates a readonly view of a range of frames. Must be called
+        with the lock held.
+
+        :param first: sequence number of the oldest frame.
+        :type first: int
+        :param end: sequence number after the newest frame.
+        :type end: int
+        :return: view of the frames.
+        :rtype: HistoryWindow
+        """
+        start = first % self._capacity if end > first else 0
+        stop = start + end - first
+        views = [array[start:stop] for array in
+                 (self._frames, self._timestamps, self._sequence_numbers)]
+        for view in views:
+            view.flags.writeable = False
+        return HistoryWindow(*views, first_sequence_number=first)
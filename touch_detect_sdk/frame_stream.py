@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""Delivers the data of a device to asyncio applications."""
+
+import asyncio
+from threading import Lock
+import time
+
+from .event import Event, EventSuscriberInterface
+
+# Default amount of frames stored before dropping the oldest one.
+DEFAULT_FRAME_QUEUE_SIZE = 64
+
+
+class DeviceFrame():
+    """Data received from a device together with the time of arrival.
+    """
+
+    def __init__(self, timestamp: float, data: object):
+        """Initialize class
+
+        :param timestamp: time when the data was received, as time.time().
+        :type timestamp: float
+        :param data: data of the NEW_DATA event.
+        :type data: object
+        """
+        self.timestamp = timestamp
+        self.data = data
+
+
+class FrameStream(EventSuscriberInterface):
+    """Asynchronous iterator over the data events of a device.
+
+    Events are fired from the threads of the SDK. They are collected in a
+    list and moved to a bounded asyncio.Queue with a single
+    call_soon_threadsafe, so one wakeup of the loop delivers all the frames
+    received in the meantime. When the queue is full the oldest frame is
+    dropped. The iteration finishes when the device is disconnected or
+    the stream is closed.
+    """
+
+    def __init__(self, event: Event, data_event_type, end_event_type,
+                 max_size: int = DEFAULT_FRAME_QUEUE_SIZE):
+        """Initialize the stream. Must be called from the running loop.
+
+        :param event: event of the device.
+        :type event: Event
+        :param data_event_type: type of event that carries new data.
+        :type data_event_type: Enum
+        :param end_event_type: type of event that finishes the stream.
+        :type end_event_type: Enum
+        :param max_size: size of the queue, defaults to
+            DEFAULT_FRAME_QUEUE_SIZE
+        :type max_size: int, optional
+        """
+        self._event = event
+        self._end_event_type = end_event_type
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(max_size)
+        # Frames waiting for the loop to move them into the queue. None
+        # marks the end of the stream.
+        self._pending_frames = []
+        self._wakeup_scheduled = False
+        self._closed = False
+        self._dropped_frames = 0
+        self._lock = Lock()
+
+        event.subscribe(self, {data_event_type, end_event_type})
+
+    @property
+    def dropped_frames(self) -> int:
+        """Amount of frames dropped because the queue was full.
+        :rtype: int
+        """
+        return self._dropped_frames
+
+    def touch_detect_event(self, sender: object, earg: object):
+        """Handles the event. Called from the thread of the SDK.
+        """
+        if earg.type == self._end_event_type:
+            frame = None
+        else:
+            frame = DeviceFrame(time.time(), earg.data)
+
+        with self._lock:
+            if self._closed:
+                return
+            if frame is None:
+                self._closed = True
+            self._pending_frames.append(frame)
+            wakeup_scheduled = self._wakeup_scheduled
+            self._wakeup_scheduled = True
+
+        if frame is None:
+            self._event.unsubscribe(self)
+        if wakeup_scheduled:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._flush)
+        except RuntimeError:
+            # The loop is already closed, nobody is waiting for frames.
+            pass
+
+    def close(self):
+        """Stop receiving frames. Pending iterations finish.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending_frames.append(None)
+        self._event.unsubscribe(self)
+        self._flush()
+
+    def _flush(self):
+        """Move the pending frames into the queue. Runs in the loop.
+        """
+        with self._lock:
+            pending_frames = self._pending_frames
+            self._pending_frames = []
+            self._wakeup_scheduled = False
+
+        for frame in pending_frames:
+            if self._queue.full():
+                self._queue.get_nowait()
+                self._dropped_frames += 1
+            self._queue.put_nowait(frame)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> DeviceFrame:
+        frame = await self._queue.get()
+        if frame is None:
+            # Keep the end of the stream for next iterations.
+            self._queue.put_nowait(None)
+            raise StopAsyncIteration
+        return frame
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        self.close()
@@ -1,63 +1,306 @@
-#!/usr/bin/env python3
-
-"""This library creates a timer that calles periodically a function.
-"""
-
-from typing import Type
-from threading import Event, Thread
-import time
-
-
-class PeriodicTimerSuscriber():
-    """Interface for periodic timer suscriber.
-    """
-
-    def on_timer_event(self):
-        """Event called on each period of the timer.
-        """
-
-
-class PeriodicTimer():
-    """Set of utils for touch detect SDK
-    """
-
-    def __init__(self):
-        self._thread = None
-        self._stop_timer = Event()
-        self._period = None
-        self._target = None
-
-    def start(self, target: Type[PeriodicTimerSuscriber], period: float):
-        """Start the periodic timer.
-
-        :param target: Target object to call on_timer_event.
-        :type target: Type[PeriodicTimerSuscriber]
-        :param period: period in sec in which the event is produced.
-        :type period: float
-        """
-        # Set the target object and period.
-        self._target = target
-        self._period = period
-
-        # Clear flag to stop timer.
-        self._stop_timer.clear()
-
-        # Create thread and start it.
-        self._thread = Thread(target=self._run)
-        self._thread.start()
-
-    def stop(self):
-        """Stop the periodic timer.
-        """
-        self._stop_timer.set()
-        self._thread.join()
-
-    def _run(self):
-        """thread that runs the timer.
-        """
-        while not self._stop_timer.is_set():
-            self._target.on_timer_event()
-            start_time = time.perf_counter()
-            current_time = start_time
-            while (current_time - start_time) < self._period:
-                current_time = time.perf_counter()
+#!/usr/bin/env python3
+
+"""This library creates a timer that calles periodically a function.
+"""
+
+from typing import Type
+from threading import Condition, Event, Thread, current_thread
+import heapq
+import math
+import time
+
+# Default time in sec spent spinning before each deadline. Spinning gives a
+# more precise tick but keeps a core busy.
+DEFAULT_SPIN_TIME_SEC = 0.0
+
+
+class PeriodicTimerSuscriber():
+    """Interface for periodic timer suscriber.
+    """
+
+    def on_timer_event(self):
+        """Event called on each period of the timer.
+        """
+
+
+class PeriodicTimer():
+    """Calls a suscriber periodically. Ticks are scheduled on absolute
+    deadlines so the period does not drift with the duration of the
+    callback. The thread sleeps until the deadline and optionally spins
+    during the last part of the interval.
+    """
+
+    def __init__(self, spin_time: float = DEFAULT_SPIN_TIME_SEC):
+        """Initialize the timer.
+
+        :param spin_time: time in sec before each deadline spent spinning
+            instead of sleeping, defaults to DEFAULT_SPIN_TIME_SEC
+        :type spin_time: float, optional
+        """
+        self._thread = None
+        self._stop_timer = Event()
+        self._period = None
+        self._target = None
+        self._spin_time = spin_time
+        self._overruns = 0
+        self._missed_deadlines = 0
+
+    @property
+    def overruns(self) -> int:
+        """Amount of ticks that finished after the next deadline.
+        :rtype: int
+        """
+        return self._overruns
+
+    @property
+    def missed_deadlines(self) -> int:
+        """Amount of ticks skipped because the timer was late.
+        :rtype: int
+        """
+        return self._missed_deadlines
+
+    def start(self, target: Type[PeriodicTimerSuscriber], period: float):
+        """Start the periodic timer.
+
+        :param target: Target object to call on_timer_event.
+        :type target: Type[PeriodicTimerSuscriber]
+        :param period: period in sec in which the event is produced.
+        :type period: float
+        """
+        # Set the target object and period.
+        self._target = target
+        self._period = period
+        self._overruns = 0
+        self._missed_deadlines = 0
+
+        # Clear flag to stop timer.
+        self._stop_timer.clear()
+
+        # Create thread and start it.
+        self._thread = Thread(target=self._run)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the periodic timer. The thread is woken up immediately.
+        """
+        self._stop_timer.set()
+        self._thread.join()
+
+    def _run(self):
+        """thread that runs the timer.
+        """
+        deadline = time.perf_counter()
+        while not self._stop_timer.is_set():
+            self._target.on_timer_event()
+
+            deadline += self._period
+            current_time = time.perf_counter()
+            if current_time > deadline:
+                # The callback took longer than the period. Run the next
+                # tick now and skip the ones that can not be done in time.
+                self._overruns += 1
+                missed_deadlines = int(
+                    (current_time - deadline) // self._period)
+                self._missed_deadlines += missed_deadlines
+                deadline += missed_deadlines * self._period
+                continue
+
+            # Sleep most of the interval, stop() wakes the thread up.
+            sleep_time = deadline - current_time - self._spin_time
+            if sleep_time > 0 and self._stop_timer.wait(sleep_time):
+                break
+
+            while time.perf_counter() < deadline:
+                pass
+
+
+class _ScheduledTarget():
+    """Suscriber registered in a TimerScheduler.
+    """
+
+    def __init__(self, target: PeriodicTimerSuscriber, period: float,
+                 deadline: float):
+        self.target = target
+        self.period = period
+        self.deadline = deadline
+        self.removed = False
+
+
+class TimerScheduler():
+    """Calls many suscribers periodically from a single thread.
+
+    Deadlines are kept in a heap, so the thread only wakes up when the next
+    suscriber is due. Each suscriber has its own period, and suscribers are
+    staggered inside their period so they do not all fire at once. Phases
+    are measured from the creation of the scheduler, so suscribers added
+    at different times keep the relative phases they were given. The
+    thread is started with the first suscriber and finishes when the last
+    one is removed.
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    # Fraction of the period added to the phase of each new suscriber. The
+    # golden ratio spreads any amount of suscribers evenly.
+    _PHASE_STEP = 0.6180339887498949
+
+    def __init__(self, spin_time: float = DEFAULT_SPIN_TIME_SEC):
+        """Initialize the scheduler.
+
+        :param spin_time: time in sec before each deadline spent spinning
+            instead of sleeping, defaults to DEFAULT_SPIN_TIME_SEC
+        :type spin_time: float, optional
+        """
+        self._spin_time = spin_time
+        self._heap = []
+        self._targets = {}
+        # Time from which the phases of the suscribers are measured.
+        self._epoch = time.perf_counter()
+        # Amount of suscribers added, used for staggering them.
+        self._added_targets = 0
+        # Breaks ties between equal deadlines in the heap.
+        self._sequence = 0
+        self._thread = None
+        self._running_target = None
+        self._condition = Condition()
+        self._overruns = 0
+        self._missed_deadlines = 0
+
+    @property
+    def overruns(self) -> int:
+        """Amount of ticks that finished after the next deadline.
+        :rtype: int
+        """
+        return self._overruns
+
+    @property
+    def missed_deadlines(self) -> int:
+        """Amount of ticks skipped because the scheduler was late.
+        :rtype: int
+        """
+        return self._missed_deadlines
+
+    def add(self, target: Type[PeriodicTimerSuscriber], period: float,
+            phase: float = None):
+        """Start calling a suscriber periodically.
+
+        :param target: Target object to call on_timer_event.
+        :type target: Type[PeriodicTimerSuscriber]
+        :param period: period in sec in which the event is produced.
+        :type period: float
+        :param phase: offset in sec of the calls from the epoch of the
+            scheduler, defaults to a staggered fraction of the period.
+        :type phase: float, optional
+        """
+        with self._condition:
+            if target in self._targets:
+                return
+            if phase is None:
+                phase = (self._added_targets * self._PHASE_STEP) % 1.0 * \
+                    period
+            self._added_targets += 1
+            entry = _ScheduledTarget(
+                target, period, self._first_deadline(period, phase))
+            self._targets[target] = entry
+            self._push(entry)
+
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def remove(self, target: Type[PeriodicTimerSuscriber]):
+        """Stop calling a suscriber. Waits until the current call of the
+        suscriber finishes.
+
+        :param target: Target object to remove.
+        :type target: Type[PeriodicTimerSuscriber]
+        """
+        with self._condition:
+            entry = self._targets.pop(target, None)
+            if entry is None:
+                return
+            entry.removed = True
+            self._condition.notify_all()
+
+            # Suscribers can remove themselves from on_timer_event.
+            if current_thread() is self._thread:
+                return
+            while self._running_target is entry:
+                self._condition.wait()
+
+    def _first_deadline(self, period: float, phase: float) -> float:
+        """Compute the first deadline in the future that is aligned to the
+        epoch of the scheduler.
+
+        :param period: period in sec of the suscriber.
+        :type period: float
+        :param phase: offset in sec from the epoch.
+        :type phase: float
+        :return: deadline as time.perf_counter() value.
+        :rtype: float
+        """
+        start_time = self._epoch + phase
+        elapsed_periods = math.ceil(
+            (time.perf_counter() - start_time) / period)
+        return start_time + max(0, elapsed_periods) * period
+
+    def _push(self, entry: _ScheduledTarget):
+        """Add an entry to the heap. The condition must be held.
+        """
+        heapq.heappush(self._heap, (entry.deadline, self._sequence, entry))
+        self._sequence += 1
+
+    def _run(self):
+        """thread that calls the suscribers.
+        """
+        while True:
+            with self._condition:
+                entry = self._next_entry()
+                if entry is None:
+                    return
+                self._running_target = entry
+
+            while time.perf_counter() < entry.deadline:
+                pass
+            entry.target.on_timer_event()
+
+            with self._condition:
+                self._running_target = None
+                self._condition.notify_all()
+                if not entry.removed:
+                    self._reschedule(entry)
+
+    def _next_entry(self):
+        """Wait for the next suscriber that is due. The condition must be
+        held.
+
+        :return: entry to call, or None when there are no suscribers left.
+        :rtype: _ScheduledTarget
+        """
+        while True:
+            while self._heap and self._heap[0][2].removed:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._thread = None
+                return None
+
+            deadline = self._heap[0][0]
+            sleep_time = deadline - time.perf_counter() - self._spin_time
+            if sleep_time <= 0:
+                return heapq.heappop(self._heap)[2]
+            # New suscribers wake the thread up.
+            self._condition.wait(sleep_time)
+
+    def _reschedule(self, entry: _ScheduledTarget):
+        """Compute the next deadline of an entry. The condition must be
+        held.
+        """
+        entry.deadline += entry.period
+        current_time = time.perf_counter()
+        if current_time > entry.deadline:
+            self._overruns += 1
+            missed_deadlines = int(
+                (current_time - entry.deadline) // entry.period)
+            self._missed_deadlines += missed_deadlines
+            entry.deadline += missed_deadlines * entry.period
+        self._push(entry)
@@ -2,10 +2,12 @@
 
 """Describes a serial touch detect Device"""
 
+from collections import OrderedDict
 from enum import Enum, unique
 
 import logging
-from threading import Thread
+from threading import Event, Thread
+import time
 import numpy as np
 import serial  # pyserial
 
@@ -19,8 +21,8 @@ from yahdlc import (
 )
 # pylint: enable=no-name-in-module
 
-from .event import Event
-from .periodic_timer import PeriodicTimer, PeriodicTimerSuscriber
+from .event import EventChannel
+from .periodic_timer import PeriodicTimerSuscriber, TimerScheduler
 from .touch_detect_device import ConnectionStatus, TouchDetectDevice, \
     TouchDetectType
 from .touch_detect_utils import TouchDetectUtils
@@ -32,6 +34,15 @@ STOP_BITS = serial.STOPBITS_ONE
 BYTE_SIZE = 8
 DEFAULT_TIMEOUT_SEC = 0.05
 DEFAULT_UPDATE_RATE_SEC = 0.03
+# Maximum rate of GET_DATA requests when the device is read by its own
+# thread.
+DEFAULT_MAX_RATE_HZ = 100.0
+# Time to wait for the complete reply before sending a new request.
+DEFAULT_REPLY_TIMEOUT_SEC = 0.1
+# Amount of GET_DATA requests waiting for a reply at the same time.
+DEFAULT_WINDOW_SIZE = 1
+# HDLC sequence numbers use 3 bits.
+SEQUENCE_NUMBER_MODULO = 8
 
 # Constants for serial communication.
 FRAME_START_BYTE = bytes(b'\x7e')
@@ -41,6 +52,10 @@ SERIAL_COMMAND_GET_DATA = bytes(b'\x01')
 SERIAL_COMMAND_GET_DATA_SIZE = 84
 DEFAULT_SENSOR_ARRAY_SIZE = 72
 
+# Frames sent to the device. They never change, so they are built once.
+GET_DATA_REQUEST_FRAME = frame_data(SERIAL_COMMAND_GET_DATA, FRAME_DATA, 1)
+ACK_REPLY_FRAME = frame_data('', FRAME_ACK, 5)
+
 
 @unique
 class SerialEventType(Enum):
@@ -77,14 +92,197 @@ class SerialEventData():
         self.data = data
 
 
+class HdlcDeframer():
+    """Splits the data coming from serial port into HDLC frames. Incomplete
+    frames are kept until the rest of the frame arrives in the next read.
+    """
+
+    def __init__(self):
+        # Data of the incomplete frame received in the previous read.
+        self._pending_data = b''
+
+    def feed(self, new_data: bytes) -> list[memoryview]:
+        """Process new data from serial port and extract all the complete
+        HDLC frames.
+
+        :param new_data: data read from serial port.
+        :type new_data: bytes
+        :return: complete frames including the delimiters.
+        :rtype: list[memoryview]
+        """
+        serial_data = self._pending_data + new_data \
+            if self._pending_data else bytes(new_data)
+        data_view = memoryview(serial_data)
+        result = []
+        index = 0
+        while True:
+            # Find the start of the frame
+            start_index = serial_data.find(FRAME_START_BYTE, index)
+            if start_index == -1:
+                # There is no starting frame, ignore the data.
+                index = len(serial_data)
+                break
+
+            # Find the end of frame
+            stop_index = serial_data.find(FRAME_END_BYTE, start_index + 1)
+            if stop_index == -1:
+                # Frame is incomplete, keep it for the next read.
+                index = start_index
+                break
+
+            # Consecutive delimiters, the second one starts the frame.
+            if stop_index == start_index + 1:
+                index = stop_index
+                continue
+
+            # There is a complete frame detected.
+            stop_index = stop_index + 1
+            result.append(data_view[start_index:stop_index])
+            index = stop_index
+
+        self._pending_data = serial_data[index:]
+        return result
+
+    @property
+    def has_pending_data(self) -> bool:
+        """Checks if there is an incomplete frame waiting for more data.
+        :rtype: bool
+        """
+        return len(self._pending_data) != 0
+
+    def clear(self):
+        """Discards the incomplete frame.
+        """
+        self._pending_data = b''
+
+
+class HdlcRequestWindow():
+    """Keeps track of the requests waiting for a reply. Each request gets
+    the next N(S) sequence number and the device replies with the same
+    number. Replies arrive in order, so a reply to a request marks every
+    older request as lost.
+    """
+
+    def __init__(self, size: int):
+        """Initialize the window.
+
+        :param size: maximum amount of requests without reply.
+        :type size: int
+        :raises ValueError: if the size does not fit the sequence numbers.
+        """
+        if not 1 <= size < SEQUENCE_NUMBER_MODULO:
+            raise ValueError(
+                f'Window size must be between 1 and '
+                f'{SEQUENCE_NUMBER_MODULO - 1}')
+        self._size = size
+        self._next_sequence_number = 0
+        # Sequence number -> time when the request was sent.
+        self._outstanding_requests = OrderedDict()
+        self._lost_replies = 0
+        self._duplicated_replies = 0
+
+    @property
+    def size(self) -> int:
+        """Maximum amount of requests without reply.
+        :rtype: int
+        """
+        return self._size
+
+    @property
+    def can_send(self) -> bool:
+        """Checks if another request can be sent.
+        :rtype: bool
+        """
+        return len(self._outstanding_requests) < self._size
+
+    @property
+    def outstanding_requests(self) -> int:
+        """Amount of requests waiting for a reply.
+        :rtype: int
+        """
+        return len(self._outstanding_requests)
+
+    @property
+    def lost_replies(self) -> int:
+        """Amount of requests that never got a reply.
+        :rtype: int
+        """
+        return self._lost_replies
+
+    @property
+    def duplicated_replies(self) -> int:
+        """Amount of replies that do not match any request.
+        :rtype: int
+        """
+        return self._duplicated_replies
+
+    def send(self, send_time: float) -> int:
+        """Register a new request.
+
+        :param send_time: time when the request is sent.
+        :type send_time: float
+        :return: sequence number of the request.
+        :rtype: int
+        """
+        sequence_number = self._next_sequence_number
+        self._next_sequence_number = \
+            (sequence_number + 1) % SEQUENCE_NUMBER_MODULO
+        self._outstanding_requests[sequence_number] = send_time
+        return sequence_number
+
+    def on_reply(self, sequence_number: int) -> bool:
+        """Match a reply with its request.
+
+        :param sequence_number: sequence number of the reply.
+        :type sequence_number: int
+        :return: True if the reply belongs to a request without reply.
+        :rtype: bool
+        """
+        if sequence_number not in self._outstanding_requests:
+            self._duplicated_replies += 1
+            return False
+
+        while True:
+            oldest_sequence_number, _ = \
+                self._outstanding_requests.popitem(last=False)
+            if oldest_sequence_number == sequence_number:
+                return True
+            self._lost_replies += 1
+
+    def expire(self, oldest_send_time: float):
+        """Give up the requests sent before a given time.
+
+        :param oldest_send_time: requests sent before are lost.
+        :type oldest_send_time: float
+        """
+        while self._outstanding_requests and \
+                next(iter(self._outstanding_requests.values())) < \
+                oldest_send_time:
+            self._outstanding_requests.popitem(last=False)
+            self._lost_replies += 1
+
+    def clear(self):
+        """Forget the requests without reply.
+        """
+        self._outstanding_requests.clear()
+
+
 class SerialDevice(TouchDetectDevice, PeriodicTimerSuscriber):
     """Represents a Serial device.
     """
-    # Event object
-    events = Event('')
+    # pylint: disable=too-many-instance-attributes
+    # Events of each device. Suscribing through the class receives the
+    # events of all the devices.
+    events = EventChannel('')
+    _new_data_event_type = SerialEventType.NEW_DATA
+    _disconnected_event_type = SerialEventType.DISCONNECTED
 
     def __init__(self, address: str = None, name: str = None,
-                 taxels_array_size: tuple = (6, 6)):
+                 taxels_array_size: tuple = (6, 6), *,
+                 scheduler: TimerScheduler = None,
+                 period: float = DEFAULT_UPDATE_RATE_SEC,
+                 max_rate: float = DEFAULT_MAX_RATE_HZ,
+                 window_size: int = DEFAULT_WINDOW_SIZE):
         """Initialize Serial object.
 
         :param address: Address of the device
@@ -93,6 +291,20 @@ class SerialDevice(TouchDetectDevice, PeriodicTimerSuscriber):
         :type name: str
         :param taxels_array_size: size of the array, defaults to (6, 6)
         :type taxels_array_size: tuple, optional
+        :param scheduler: scheduler that polls the device together with
+            other devices. By default the device has a thread that sends
+            the next request as soon as the reply arrives, defaults to None
+        :type scheduler: TimerScheduler, optional
+        :param period: period in sec in which the scheduler polls the
+            device, defaults to DEFAULT_UPDATE_RATE_SEC
+        :type period: float, optional
+        :param max_rate: maximum rate of requests in Hz when the device is
+            not polled by a scheduler, defaults to DEFAULT_MAX_RATE_HZ
+        :type max_rate: float, optional
+        :param window_size: requests sent without waiting for the reply of
+            the previous ones. Replies are matched with their requests by
+            the sequence number, defaults to DEFAULT_WINDOW_SIZE
+        :type window_size: int, optional
         """
         super().__init__(address, name, TouchDetectType.SERIAL,
                          taxels_array_size)
@@ -111,10 +323,19 @@ class SerialDevice(TouchDetectDevice, PeriodicTimerSuscriber):
         self._port_handler.bytesize = BYTE_SIZE
         self._port_handler.timeout = DEFAULT_TIMEOUT_SEC
         self._connection_status = ConnectionStatus.DISCONNECTED
-        self._periodic_timer = PeriodicTimer()
+        self._scheduler = scheduler
+        self._period = period
+        self._min_request_interval = 1.0 / max_rate
+        # Thread that sends requests and reads the replies.
+        self._reader_thread = None
+        self._stop_reader = Event()
+        self._reply_timeouts = 0
+        self._request_window = HdlcRequestWindow(window_size)
         # List of threads currently running
         self._thread_list = []
         self._request_sent = False
+        self._reply_incomplete = False
+        self._hdlc_deframer = HdlcDeframer()
 
     def connect(self) -> Thread:
         """Connects to SerialTouchDetect device.
@@ -143,7 +364,30 @@ class SerialDevice(TouchDetectDevice, PeriodicTimerSuscriber):
         """return the update rate of the device in milliseconds.
         :rtype: str
         """
-        return int(DEFAULT_UPDATE_RATE_SEC * 1000)
+        if self._scheduler is not None:
+            return int(self._period * 1000)
+        return int(self._min_request_interval * 1000)
+
+    @property
+    def reply_timeouts(self) -> int:
+        """Amount of requests that did not get a complete reply in time.
+        :rtype: int
+        """
+        return self._reply_timeouts
+
+    @property
+    def lost_replies(self) -> int:
+        """Amount of requests of the window that never got a reply.
+        :rtype: int
+        """
+        return self._request_window.lost_replies
+
+    @property
+    def duplicated_replies(self) -> int:
+        """Amount of replies that do not match any request of the window.
+        :rtype: int
+        """
+        return self._request_window.duplicated_replies
 
     def _connect(self):
         """Connect to Serial device.
@@ -167,8 +411,15 @@ class SerialDevice(TouchDetectDevice, PeriodicTimerSuscriber):
         self._connection_status = ConnectionStatus.CONNECTED
         self._fire_event(SerialEventType.CONNECTED)
 
-        # Start the thread.
-        self._periodic_timer.start(self, DEFAULT_UPDATE_RATE_SEC)
+        # Start polling the device.
+        if self._scheduler is not None:
+            self._scheduler.add(self, self._period)
+        else:
+            self._stop_reader.clear()
+            reader_task = self._windowed_reader_task \
+                if self._request_window.size > 1 else self._reader_task
+            self._reader_thread = Thread(target=reader_task)
+            self._reader_thread.start()
 
     def _disconnect(self):
         """Thread that handles disconnection of devices.
@@ -178,8 +429,14 @@ class SerialDevice(TouchDetectDevice, PeriodicTimerSuscriber):
             logging.info('Already disconnected')
             return
 
-        # Stop timer.
-        self._periodic_timer.stop()
+        # Stop polling the device.
+        if self._scheduler is not None:
+            self._scheduler.remove(self)
+        else:
+            self._stop_reader.set()
+            # Wake up the reader if it is waiting for data.
+            self._port_handler.cancel_read()
+            self._reader_thread.join()
 
         # Notify disconnection.
         self._connection_status = ConnectionStatus.DISCONNECTED
@@ -200,53 +457,31 @@ class SerialDevice(TouchDetectDevice, PeriodicTimerSuscriber):
         event_data = SerialEventData(event_type, event_data)
         self.events(event_data)
 
-    def _get_hdlc_frame(self, new_data: bytes) -> list[bytes]:
-        """Process all the data comming from serial port. Filters the
-        data into HDLC frames.
-
-        :param serial_device: Device to get the data from.
-        :type serial_device: SerialDevice
-        :return: Incomming HDLC frame, None otherwise.
-        :rtype: bytes
-        """
-        result = []
-        serial_data = new_data
-        while len(serial_data) != 0:
-            # Find the start of the frame
-            start_index = serial_data.find(FRAME_START_BYTE)
-            if start_index == -1:
-                # There is no starting frame, ignore package.
-                return None
-
-            # Find the end of frame
-            stop_index = serial_data.find(FRAME_END_BYTE, start_index + 1)
-            if stop_index == -1:
-                # There is no end frame, ignore package.
-                return None
-
-            # There is a complete frame detected. create a new array.
-            stop_index = stop_index + 1
-            frame = serial_data[start_index:stop_index]
-            result.append(frame)
-
-            # Remove from the serial data the processed frame.
-            serial_data = serial_data[stop_index:]
-        return result
-
-    def _process_frame(self, frames: list[bytes]):
+    def _process_frame(self, frames: list[bytes],
+                       window: HdlcRequestWindow = None) -> bool:
         """Process raw data coming from serial port and updates the data
         accordingly.
 
         :param frames: raw data to process
-        :type frames: list[bytes]
+        :type frames: list[memoryview]
+        :param window: requests waiting for a reply. Data frames that do
+            not match a request are ignored, defaults to None
+        :type window: HdlcRequestWindow, optional
+        :return: True if the ACK that ends the reply was received.
+        :rtype: bool
         """
+        ack_received = False
         for frame in frames:
-            data, frame_type, _ = get_data(frame)
+            data, frame_type, sequence_number = get_data(bytes(frame))
 
             # Reply ACK with another ACK
             if frame_type == FRAME_ACK:
-                reply = frame_data('', FRAME_ACK, 5)
-                self._port_handler.write(reply)
+                self._port_handler.write(ACK_REPLY_FRAME)
+                ack_received = True
+            # Ignore replies lost or duplicated.
+            elif (frame_type == FRAME_DATA and window is not None and
+                    not window.on_reply(sequence_number)):
+                continue
             # Ignore non-valid packages.
             elif (frame_type == FRAME_DATA and
                     len(data) == DEFAULT_SENSOR_ARRAY_SIZE):
@@ -256,6 +491,101 @@ class SerialDevice(TouchDetectDevice, PeriodicTimerSuscriber):
             else:
                 self._logger.warning(
                     'Received payload with wrong size. Ignoring package.')
+        return ack_received
+
+    def _read_reply(self, deadline: float) -> bool:
+        """Read from the port until the reply of the device is complete.
+
+        :param deadline: time.perf_counter() value to give up waiting.
+        :type deadline: float
+        :return: True if the complete reply was received.
+        :rtype: bool
+        """
+        while not self._stop_reader.is_set() and \
+                time.perf_counter() < deadline:
+            # Blocks until there is data or the timeout of the port.
+            new_data = self._port_handler.read(
+                max(1, self._port_handler.in_waiting))
+            if not new_data:
+                continue
+            hdlc_frames = self._hdlc_deframer.feed(new_data)
+            if hdlc_frames and self._process_frame(hdlc_frames):
+                return True
+        return False
+
+    def _reader_task(self):
+        """Thread that sends a request as soon as the previous reply is
+        complete, limited by the maximum rate of the device.
+        """
+        try:
+            while not self._stop_reader.is_set():
+                request_time = time.perf_counter()
+                self._hdlc_deframer.clear()
+                self._port_handler.write(GET_DATA_REQUEST_FRAME)
+
+                if not self._read_reply(
+                        request_time + DEFAULT_REPLY_TIMEOUT_SEC):
+                    # Discard the rest of the lost reply.
+                    self._reply_timeouts += 1
+                    self._port_handler.reset_input_buffer()
+
+                wait_time = request_time + self._min_request_interval - \
+                    time.perf_counter()
+                if wait_time > 0 and self._stop_reader.wait(wait_time):
+                    break
+
+        except (RuntimeError, SerialException, ConnectionAbortedError):
+            error = '''Error getting data from sensor.
+                Disconnecting device'''
+            logging.error(error)
+            self._fire_event(SerialEventType.CONNECTION_ERROR, error)
+            self.disconnect()
+
+    def _windowed_reader_task(self):
+        """Thread that keeps several requests waiting for a reply, limited
+        by the maximum rate of the device.
+        """
+        window = self._request_window
+        window.clear()
+        self._hdlc_deframer.clear()
+        next_request_time = time.perf_counter()
+        try:
+            while not self._stop_reader.is_set():
+                current_time = time.perf_counter()
+                window.expire(current_time - DEFAULT_REPLY_TIMEOUT_SEC)
+
+                if window.can_send and current_time >= next_request_time:
+                    sequence_number = window.send(current_time)
+                    self._port_handler.write(frame_data(
+                        SERIAL_COMMAND_GET_DATA, FRAME_DATA,
+                        sequence_number))
+                    next_request_time = max(
+                        next_request_time + self._min_request_interval,
+                        current_time)
+
+                if window.can_send:
+                    # Do not wait for data beyond the next request.
+                    if not self._port_handler.in_waiting:
+                        self._stop_reader.wait(
+                            max(0.0, next_request_time - time.perf_counter()))
+                        continue
+                    new_data = self._port_handler.read(
+                        self._port_handler.in_waiting)
+                else:
+                    # Blocks until there is data or the timeout of the port.
+                    new_data = self._port_handler.read(
+                        max(1, self._port_handler.in_waiting))
+
+                hdlc_frames = self._hdlc_deframer.feed(new_data)
+                if hdlc_frames:
+                    self._process_frame(hdlc_frames, window)
+
+        except (RuntimeError, SerialException, ConnectionAbortedError):
+            error = '''Error getting data from sensor.
+                Disconnecting device'''
+            logging.error(error)
+            self._fire_event(SerialEventType.CONNECTION_ERROR, error)
+            self.disconnect()
 
     def on_timer_event(self):
         """Event called on each period of the timer.
@@ -263,21 +593,24 @@ class SerialDevice(TouchDetectDevice, PeriodicTimerSuscriber):
         try:
             if not self._request_sent:
                 self._port_handler.reset_input_buffer()
-                data_request_frame = frame_data(
-                    SERIAL_COMMAND_GET_DATA, FRAME_DATA, 1)
-                self._port_handler.write(data_request_frame)
+                self._hdlc_deframer.clear()
+                self._port_handler.write(GET_DATA_REQUEST_FRAME)
                 self._request_sent = True
             elif self._request_sent:
-                self._request_sent = False
                 new_data = \
                     self._port_handler.read_all()
-                # Ignore package if the size is not correct.
-                data_size = len(new_data)
-                if data_size < SERIAL_COMMAND_GET_DATA_SIZE:
-                    return
 
-                # Get HDLC frame.
-                hdlc_frames = self._get_hdlc_frame(new_data)
+                # Get HDLC frames.
+                hdlc_frames = self._hdlc_deframer.feed(new_data)
+
+                # Wait one more period if the reply is incomplete.
+                if self._hdlc_deframer.has_pending_data and \
+                        not self._reply_incomplete:
+                    self._reply_incomplete = True
+                else:
+                    self._request_sent = False
+                    self._reply_incomplete = False
+
                 if not hdlc_frames:
                     return
 
@@ -8,6 +8,10 @@ import logging
 import threading
 import numpy as np
 
+from .event import EventChannel
+from .frame_history import FrameHistory
+from .frame_stream import DEFAULT_FRAME_QUEUE_SIZE, FrameStream
+
 
 @unique
 class TouchDetectType(Enum):
@@ -31,6 +35,15 @@ class ConnectionStatus(Enum):
 class TouchDetectDevice():
     """Represents a Touch Detect device.
     """
+    # pylint: disable=too-many-instance-attributes
+    # Events of each device. Suscribing through the class receives the
+    # events of all the devices.
+    events = EventChannel('')
+
+    # Types of event fired by the device when new data arrives and when it
+    # is disconnected. Defined by each type of device.
+    _new_data_event_type = None
+    _disconnected_event_type = None
 
     def __init__(self,
                  address: str = None,
@@ -56,6 +69,8 @@ class TouchDetectDevice():
         self._touch_detect_type = touch_detect_type
         self._taxels_array_size = taxels_array_size
         self._taxel_array = np.zeros(shape=self._taxels_array_size)
+        # Frames received before the latest one. Disabled by default.
+        self._history = None
 
         # Lock for sharing variables across different threads.
         self._lock = threading.Lock()
@@ -141,6 +156,43 @@ class TouchDetectDevice():
                 logging.error(log_msg)
                 return
             self._taxel_array = data
+            history = self._history
+        if history is not None:
+            history.append(data)
+
+    @property
+    def history(self) -> FrameHistory:
+        """Most recent taxel arrays received from the device.
+        :return: history or None if it was not enabled.
+        :rtype: FrameHistory
+        """
+        with self._lock:
+            return self._history
+
+    def enable_history(self, capacity: int,
+                       dtype: np.dtype = np.uint16) -> FrameHistory:
+        """Stores the most recent taxel arrays in a preallocated ring
+        buffer. Enabling it again discards the stored frames.
+
+        :param capacity: amount of frames stored.
+        :type capacity: int
+        :param dtype: type of the stored taxel values, defaults to
+            np.uint16 which holds any 16 bit taxel value.
+        :type dtype: np.dtype, optional
+        :return: history of the device.
+        :rtype: FrameHistory
+        """
+        rows, cols = self.taxels_array_size
+        history = FrameHistory(capacity, rows, cols, dtype)
+        with self._lock:
+            self._history = history
+        return history
+
+    def disable_history(self):
+        """Stops storing the taxel arrays and frees the history.
+        """
+        with self._lock:
+            self._history = None
 
     @property
     def connection_status(self) -> ConnectionStatus:
@@ -177,3 +229,24 @@ class TouchDetectDevice():
         """
         with self._lock:
             self._acquisition_running = data
+
+    def frames(self, max_size: int = DEFAULT_FRAME_QUEUE_SIZE) -> FrameStream:
+        """Asynchronous iterator over the data received from the device.
+        Must be called from a running asyncio loop::
+
+            async with device.frames() as frames:
+                async for frame in frames:
+                    print(frame.timestamp, frame.data)
+
+        :param max_size: frames stored before dropping the oldest one,
+            defaults to DEFAULT_FRAME_QUEUE_SIZE
+        :type max_size: int, optional
+        :raises NotImplementedError: if the device does not produce data.
+        :return: stream of frames. It finishes when the device is
+            disconnected or the stream is closed.
+        :rtype: FrameStream
+        """
+        if self._new_data_event_type is None:
+            raise NotImplementedError('Device does not produce data')
+        return FrameStream(self.events, self._new_data_event_type,
+                           self._disconnected_event_type, max_size)
@@ -3,8 +3,14 @@
 """Set of utils for touch detect SDK
 """
 
+import sys
+from array import array
+
 import numpy as np
 
+# Data type of a single taxel value inside raw data (little endian uint16).
+TAXEL_DTYPE = np.dtype('<u2')
+
 # Polynomial table for CRC16 calculation.
 CRC_TABLE_CCITT16 = [
     0x0000, 0x1021, 0x2042, 0x3063, 0x4084, 0x50a5, 0x60c6, 0x70e7,
@@ -42,18 +48,51 @@ CRC_TABLE_CCITT16 = [
 ]
 
 
+def _make_crc_word_table(byte_table: np.ndarray) -> np.ndarray:
+    """Creates a table for calculating the CRC of 2 bytes in one step.
+
+    Processing byte a and then byte b only depends on
+    crc ^ (a | (b << 8)), so this value is used as index of the table.
+
+    :param byte_table: table for calculating the CRC of one byte.
+    :type byte_table: np.ndarray
+    :return: table with 65536 entries.
+    :rtype: np.ndarray
+    """
+    word = np.arange(0x10000, dtype=np.uint16)
+    first_crc = byte_table[word & 0xFF]
+    second_index = (first_crc ^ (word >> 8)) & 0xFF
+    return byte_table[second_index] ^ (first_crc >> 8)
+
+
+# Polynomial table for CRC16 calculation as numpy array.
+CRC_BYTE_TABLE = np.array(CRC_TABLE_CCITT16, dtype=np.uint16)
+# Table for CRC16 calculation processing 2 bytes at once.
+CRC_WORD_TABLE = _make_crc_word_table(CRC_BYTE_TABLE)
+CRC_WORD_TABLE_ARRAY = array('H', CRC_WORD_TABLE.tobytes())
+
+
 class TouchDetectUtils():
     """Set of utils for touch detect SDK
     """
 
     @classmethod
-    def to_taxel_array(cls, taxels_array_size: tuple, data: bytes) -> np.array:
+    def to_taxel_array(cls, taxels_array_size: tuple, data: bytes,
+                       out: np.ndarray = None) -> np.array:
         """ Convert raw data from sensor array into a valid taxel array.
 
+        Each taxel is sent as a little endian 16 bit value, so the payload
+        is viewed as an array of uint16 and reshaped to the size of the
+        sensor array without iterating through the data.
+
         :param taxels_array_size: Size of the sensor array.
         :type taxels_array_size: tuple
-        :param data: raw data to process.
+        :param data: raw data to process. Other sequences of byte values,
+            as lists of ints, are converted to bytes first.
         :type data: bytes
+        :param out: array where the result is written. Allows decoding
+            without allocating a new array, defaults to None
+        :type out: np.ndarray, optional
         :return: numpy array with the data from sensor array processed.
         :rtype: np.array
         """
@@ -64,35 +103,137 @@ class TouchDetectUtils():
         if len(data) != (max_row * max_column * 2):
             return None
 
-        # Create the array.
-        taxel_array = np.zeros(shape=taxels_array_size, dtype=int)
-        # Process the data.
-        for row in range(max_row):
-            for column in range(max_column):
-                # Calculate the index inside data.
-                index = (2 * row * max_column) + (2 * column)
-                # Build the taxel value.
-                value = int(data[index + 1] * 256 + data[index])
-                # Add it to the list.
-                taxel_array[row, column] = value
-        return taxel_array
+        # Lists of byte values can not be viewed as an array.
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+
+        # View the raw data as taxel values. This does not copy the data.
+        taxel_view = np.frombuffer(data, dtype=TAXEL_DTYPE).reshape(
+            (max_row, max_column))
+
+        # Create the array if the caller did not provide one.
+        if out is None:
+            return taxel_view.astype(int)
+        np.copyto(out, taxel_view)
+        return out
+
+    @classmethod
+    def stack_frames(cls, frames, frame_size: int) -> tuple:
+        """Arrange several frames of the same size into a 2D byte matrix.
+
+        :param frames: contiguous buffer with the frames one after the other
+            or list of frames.
+        :type frames: bytes or list[bytes]
+        :param frame_size: expected size of each frame in bytes.
+        :type frame_size: int
+        :return: (N, frame_size) uint8 matrix and a boolean mask with the
+            frames that have the right size. Invalid rows are filled with 0.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        if isinstance(frames, (list, tuple)):
+            valid = np.fromiter((len(frame) == frame_size
+                                 for frame in frames),
+                                dtype=bool, count=len(frames))
+            # Replace invalid frames so every row has the same size.
+            blank = bytes(frame_size)
+            data = b''.join(frame if is_valid else blank
+                            for frame, is_valid in zip(frames, valid))
+            matrix = np.frombuffer(data, dtype=np.uint8).reshape(
+                (len(frames), frame_size))
+            return matrix, valid
+
+        data = np.frombuffer(frames, dtype=np.uint8)
+        n_complete = len(data) // frame_size
+        n_frames = -(-len(data) // frame_size)
+        valid = np.zeros(n_frames, dtype=bool)
+        valid[:n_complete] = True
+        if n_frames == n_complete:
+            return data.reshape((n_frames, frame_size)), valid
+
+        # Trailing incomplete frame is reported as an invalid entry.
+        matrix = np.zeros(shape=(n_frames, frame_size), dtype=np.uint8)
+        matrix[:n_complete] = data[:n_complete * frame_size].reshape(
+            (n_complete, frame_size))
+        return matrix, valid
+
+    @classmethod
+    def to_taxel_array_batch(cls, taxels_array_size: tuple,
+                             data) -> tuple:
+        """Convert several raw payloads into a stack of taxel arrays.
+
+        :param taxels_array_size: Size of the sensor array.
+        :type taxels_array_size: tuple
+        :param data: contiguous buffer with the payloads one after the other
+            or list of payloads.
+        :type data: bytes or list[bytes]
+        :return: (N, rows, columns) uint16 array and a boolean mask with the
+            payloads that were decoded. Invalid entries are filled with 0.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        max_row = taxels_array_size[0]
+        max_column = taxels_array_size[1]
+        matrix, valid = cls.stack_frames(data, max_row * max_column * 2)
+
+        # Convert the whole matrix in one pass.
+        taxel_arrays = matrix.view(TAXEL_DTYPE).astype(np.uint16)
+        return taxel_arrays.reshape((len(valid), max_row, max_column)), valid
 
     @classmethod
     def checksum_update_crc16(cls, data: bytearray,
                               init_value: int = 0xFFFF) -> int:
         """Calculates CRC16 with 0x1021 polynomial representation.
 
-        :param data: data being used to calculate CRC.
+        :param data: data being used to calculate CRC. Other sequences of
+            byte values, as lists of ints, are converted to bytes first.
         :type data: bytearray
         :param init_value: initial value for CRC. Defaults to 0xFFFF.
         :type init_value: int
         :return: CRC16 generated.
         :rtype: int
         """
-        crc = init_value
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+        crc = init_value & 0xFFFF
         data_size = len(data)
-        for index in range(data_size):
-            idx = (crc ^ data[index]) & 0x00FF
+
+        # Process the data in little endian words of 2 bytes.
+        words = array('H')
+        words.frombytes(data[:data_size & ~1])
+        if sys.byteorder == 'big':
+            words.byteswap()
+        word_table = CRC_WORD_TABLE_ARRAY
+        for word in words:
+            crc = word_table[crc ^ word]
+
+        # Process the last byte if data has an odd size.
+        if data_size & 1:
+            idx = (crc ^ data[-1]) & 0x00FF
             crc = CRC_TABLE_CCITT16[idx] ^ (crc >> 8)
-            crc &= 0xFFFF
+        return crc
+
+    @classmethod
+    def checksum_crc16_batch(cls, frames: np.ndarray,
+                             init_value: int = 0xFFFF) -> np.ndarray:
+        """Calculates CRC16 of several frames of the same size at once.
+
+        :param frames: (N, frame_size) matrix with one frame per row.
+        :type frames: np.ndarray
+        :param init_value: initial value for CRC. Defaults to 0xFFFF.
+        :type init_value: int
+        :return: CRC16 of each frame.
+        :rtype: np.ndarray
+        """
+        frames = np.asarray(frames, dtype=np.uint8)
+        n_frames, frame_size = frames.shape
+        crc = np.full(n_frames, init_value & 0xFFFF, dtype=np.uint16)
+
+        # Process all the frames one column of words at a time.
+        words = np.ascontiguousarray(
+            frames[:, :frame_size & ~1]).view('<u2')
+        for column in range(words.shape[1]):
+            crc = CRC_WORD_TABLE[crc ^ words[:, column]]
+
+        # Process the last byte if frames have an odd size.
+        if frame_size & 1:
+            crc = CRC_BYTE_TABLE[(crc ^ frames[:, -1]) & 0xFF] ^ (crc >> 8)
         return crc
@@ -6,7 +6,7 @@ from enum import Enum, unique
 import socket
 import numpy as np
 
-from .event import Event
+from .event import EventChannel
 from .touch_detect_device import TouchDetectDevice, TouchDetectType
 
 # Default port for WSG connection.
@@ -43,8 +43,11 @@ class WsgEventData():
 class WsgDevice(TouchDetectDevice):
     """Represents a WSG device.
     """
-    # Event object
-    events = Event('')
+    # Events of each device. Suscribing through the class receives the
+    # events of all the devices.
+    events = EventChannel('')
+    _new_data_event_type = WsgEventType.NEW_DATA
+    _disconnected_event_type = WsgEventType.DISCONNECTED
 
     def __init__(self, address: str, tcp_port: int = TCP_PORT,
                  name: str = None,
@@ -4,10 +4,14 @@
    to access TouchDetect information it is required to run
    a LUA script inside WSG gripper.
 """
+import asyncio
+import concurrent.futures
 import logging
-import time
+import socket
 
-from threading import Event, Lock, Thread
+from threading import Lock, Thread
+
+import numpy as np
 
 from .wsg_device import WsgDevice, WsgEventType
 from .touch_detect_device import ConnectionStatus
@@ -17,6 +21,8 @@ from .touch_detect_utils import TouchDetectUtils
 TRANSACTION_ID = bytearray(b'\xaa\xaa')
 # Value that represents the end of the frame.
 PROTOCOL_ID = bytearray(b'\xaa\xbb')
+# Header that identifies the start of a frame.
+HEADER_ID = bytes(TRANSACTION_ID + PROTOCOL_ID)
 # Command for reading left touch_detect
 READ_LEFT_SENSOR_COMMAND = bytearray(b'\x01')
 # Command for reading right touch_detect
@@ -25,11 +31,177 @@ READ_RIGHT_SENSOR_COMMAND = bytearray(b'\x02')
 RESPONSE_MIN_LENGTH = 9
 # Update rate of the data of all the sensors in seconds.
 UPDATE_RATE = 0.01
+# Time to wait for the TCP connection with the gripper in seconds.
+CONNECT_TIMEOUT_SEC = 5.0
+# Time to wait for the response of the gripper in seconds.
+RESPONSE_TIMEOUT_SEC = 1.0
+# Time to wait for the polling task of a device to stop in seconds.
+STOP_TIMEOUT_SEC = 2.0
+# Size of the header of a frame (TID, PID and payload size).
+HEADER_SIZE = 6
+# Size of the CRC at the end of a frame.
+CRC_SIZE = 2
+# Initial size of the receive buffer of each device.
+RECEIVE_BUFFER_SIZE = 1024
+
+
+class WsgStreamReader:
+    """Reassembles the frames sent by WSG gripper over TCP. Data is received
+    into a buffer that is reused for all the frames, so frames split across
+    several reads or several frames received together are handled. Frames
+    can be read from a blocking socket or from the loop of the SDK.
+    """
+
+    def __init__(self, buffer_size: int = RECEIVE_BUFFER_SIZE):
+        """Initialize the reader.
+
+        :param buffer_size: initial size of the receive buffer, defaults to
+            RECEIVE_BUFFER_SIZE
+        :type buffer_size: int, optional
+        """
+        self._buffer = bytearray(buffer_size)
+        self._buffer_view = memoryview(self._buffer)
+        # Range of the buffer with data that was not processed yet.
+        self._start = 0
+        self._end = 0
+
+    def read_frame(self, port: socket.socket) -> memoryview:
+        """Reads from the socket until a complete frame is available.
+
+        :param port: socket connected to WSG gripper.
+        :type port: socket.socket
+        :return: view of the frame or None if the connection was closed. The
+            view is only valid until the next call to read_frame.
+        :rtype: memoryview
+        """
+        while True:
+            frame = self._next_frame()
+            if frame is not None:
+                return frame
+
+            n_bytes = port.recv_into(self._free_space())
+            if not n_bytes:
+                return None
+            self._end += n_bytes
+
+    async def read_frame_async(self, loop: asyncio.AbstractEventLoop,
+                               port: socket.socket) -> memoryview:
+        """Same as read_frame for a non-blocking socket used by a loop.
+
+        :param loop: loop where the socket is used.
+        :type loop: asyncio.AbstractEventLoop
+        :param port: socket connected to WSG gripper.
+        :type port: socket.socket
+        :return: view of the frame or None if the connection was closed. The
+            view is only valid until the next call to read_frame_async.
+        :rtype: memoryview
+        """
+        while True:
+            frame = self._next_frame()
+            if frame is not None:
+                return frame
+
+            n_bytes = await loop.sock_recv_into(port, self._free_space())
+            if not n_bytes:
+                return None
+            self._end += n_bytes
+
+    def _next_frame(self) -> memoryview:
+        """Takes the next complete frame out of the buffer.
+
+        :return: view of the frame or None if more data is required.
+        :rtype: memoryview
+        """
+        frame_size = self._get_frame_size()
+        if not frame_size:
+            return None
+        frame = self._buffer_view[self._start:self._start + frame_size]
+        self._start += frame_size
+        return frame
+
+    def _free_space(self) -> memoryview:
+        """Gets the part of the buffer where new data is received.
+
+        :return: view of the free space of the buffer.
+        :rtype: memoryview
+        """
+        self._prepare_buffer()
+        return self._buffer_view[self._end:]
+
+    def _get_frame_size(self) -> int:
+        """Checks if there is a complete frame at the start of the data.
+        Data that does not start with a valid header is discarded.
+
+        :return: size of the complete frame, 0 if more data is required.
+        :rtype: int
+        """
+        while self._end - self._start >= HEADER_SIZE:
+            header = self._buffer_view[self._start:self._start + 4]
+            if header != HEADER_ID:
+                # Look for the next header.
+                next_index = self._buffer.find(
+                    HEADER_ID, self._start + 1, self._end)
+                self._start = self._end - 3 if next_index == -1 \
+                    else next_index
+                logging.warning('Invalid data received from WSG gripper.')
+                continue
+
+            payload_size = self._buffer[self._start + 4] | \
+                (self._buffer[self._start + 5] << 8)
+            frame_size = HEADER_SIZE + payload_size + CRC_SIZE
+            if self._end - self._start >= frame_size:
+                return frame_size
+            self._reserve(frame_size)
+            return 0
+        return 0
+
+    def _prepare_buffer(self):
+        """Moves the unprocessed data to the start of the buffer.
+        """
+        if self._start == 0:
+            return
+        size = self._end - self._start
+        self._buffer_view[:size] = self._buffer_view[self._start:self._end]
+        self._start = 0
+        self._end = size
+
+    def _reserve(self, frame_size: int):
+        """Grows the buffer if the frame does not fit into it.
+
+        :param frame_size: size of the frame to receive.
+        :type frame_size: int
+        """
+        if frame_size <= len(self._buffer):
+            return
+        size = self._end - self._start
+        buffer = bytearray(frame_size)
+        buffer[:size] = self._buffer_view[self._start:self._end]
+        self._buffer = buffer
+        self._buffer_view = memoryview(buffer)
+        self._start = 0
+        self._end = size
+
+
+class WsgReadPlan:
+    """Requests and buffers used for polling one device. They never change
+    while the device is connected, so they are created only once.
+    """
+
+    def __init__(self):
+        """Initialize the plan.
+        """
+        self.left_request = bytes(
+            WsgGripperTouchSdk.make_frame(READ_LEFT_SENSOR_COMMAND))
+        self.right_request = bytes(
+            WsgGripperTouchSdk.make_frame(READ_RIGHT_SENSOR_COMMAND))
+        # Both requests are sent together before waiting for the responses.
+        self.requests = self.left_request + self.right_request
 
 
 class WsgGripperTouchSdk:
     """This Class manages the communication with the sensors installed in
-       WSG gripper.
+       WSG gripper. All the grippers are polled concurrently by tasks of an
+       asyncio loop running in its own thread.
     """
 
     @classmethod
@@ -38,14 +210,19 @@ class WsgGripperTouchSdk:
         cls._logger = logging.getLogger(__name__)
         # Set basic configurations for logging.
         logging.basicConfig(encoding='utf-8', level=logging.INFO)
-        # Event for stopping incomming_data_thread.
-        cls._stop_wsg_data_loop = Event()
+        # Loop that polls the devices. It runs while there are devices.
+        cls._loop = None
         # list of devices that have to be polled for data.
         cls._device_list = []
+        # Read plan of each device.
+        cls._read_plans = {}
+        # Polling task, stream reader and stop event of each device. Only
+        # used from the loop.
+        cls._poll_tasks = {}
+        cls._stream_readers = {}
+        cls._stop_events = {}
         # Lock for internal variables.
         cls._lock = Lock()
-        # Checks the status of the task for gathering data from WSG.
-        cls._is_data_task_running = False
         # List of threads currently running.
         cls._thread_list = []
 
@@ -53,9 +230,10 @@ class WsgGripperTouchSdk:
     def __del__(cls):
         """Ensure that threads stopped and connection closed
         """
-        if cls._is_data_task_running:
-            cls._stop_wsg_data_loop.set()
-            cls._is_data_task_running = False
+        with cls._lock:
+            if cls._loop is not None:
+                cls._loop.call_soon_threadsafe(cls._loop.stop)
+                cls._loop = None
         # Finish all running threads
         for thread in cls._thread_list:
             if thread.is_alive():
@@ -101,18 +279,23 @@ class WsgGripperTouchSdk:
             logging.info('Already connected to a device')
             return None
 
-        # Add device if wasn't already in the list.
+        # Add device if wasn't already in the list. The loop keeps running
+        # while there are devices in the list.
         with cls._lock:
             if wsg_device not in cls._device_list:
                 cls._device_list.append(wsg_device)
+            read_plan = WsgReadPlan()
+            cls._read_plans[wsg_device] = read_plan
+            loop = cls._get_loop()
 
         # Open the port.
         try:
-            wsg_device.port_handler.connect((
-                wsg_device.address, wsg_device.tcp_port))
-        except ConnectionRefusedError as error:
+            asyncio.run_coroutine_threadsafe(
+                cls._open_device(wsg_device), loop).result()
+        except (OSError, asyncio.TimeoutError) as error:
             logging.error("Could could not connect to WSG at %s: %s",
                           wsg_device.address, error)
+            cls._remove_device(wsg_device)
             wsg_device.fire_event(WsgEventType.ERROR_OPENING_PORT, [error])
             return False
 
@@ -120,15 +303,9 @@ class WsgGripperTouchSdk:
         wsg_device.connection_status = ConnectionStatus.CONNECTED
         wsg_device.fire_event(WsgEventType.CONNECTED)
 
-        # Start the thread in case it wasn't running before.
-        if not cls._is_data_task_running:
-            cls._is_data_task_running = True
-            cls._stop_wsg_data_loop.clear()
-            thread = Thread(target=cls._wsg_data_task)
-            thread.start()
-            cls._thread_list.append(thread)
-            return thread
-        return None
+        # Start polling the device.
+        loop.call_soon_threadsafe(cls._start_polling, wsg_device, read_plan)
+        return True
 
     @classmethod
     def _disconnect(cls, wsg_device: WsgDevice):
@@ -142,12 +319,17 @@ class WsgGripperTouchSdk:
             logging.info('Already disconnected')
             return
 
-        # Remove device from the list.
+        # Stop polling and disconnect port.
         with cls._lock:
-            if wsg_device in cls._device_list:
-                cls._device_list.remove(wsg_device)
-
-        # Disconnect port.
+            loop = cls._loop
+        if loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    cls._close_device(wsg_device), loop).result(
+                        STOP_TIMEOUT_SEC + RESPONSE_TIMEOUT_SEC)
+            except concurrent.futures.TimeoutError:
+                logging.error("Polling of WSG at %s did not stop",
+                              wsg_device.address)
         try:
             wsg_device.port_handler.close()
         except RuntimeError as error:
@@ -155,17 +337,107 @@ class WsgGripperTouchSdk:
                           wsg_device.name, error)
             wsg_device.fire_event(WsgEventType.ERROR_CLOSING_PORT, [error])
             wsg_device.connection_status = ConnectionStatus.CONNECTION_LOST
+            cls._remove_device(wsg_device)
             return
 
         # Notify disconnection.
         wsg_device.connection_status = ConnectionStatus.DISCONNECTED
         wsg_device.fire_event(WsgEventType.DISCONNECTED)
 
-        # Stop WSG thread if no device is listed for pooling.
+        # Stop WSG loop if no device is listed for pooling.
+        cls._remove_device(wsg_device)
+
+    @classmethod
+    def _get_loop(cls) -> asyncio.AbstractEventLoop:
+        """Gets the loop that polls the devices, starting it if it was not
+        running. Must be called with the lock held.
+
+        :return: loop running in its own thread.
+        :rtype: asyncio.AbstractEventLoop
+        """
+        if cls._loop is None:
+            cls._loop = asyncio.new_event_loop()
+            thread = Thread(target=cls._wsg_data_task, args=(cls._loop,))
+            thread.start()
+            cls._thread_list.append(thread)
+        return cls._loop
+
+    @classmethod
+    def _remove_device(cls, wsg_device: WsgDevice):
+        """Removes a device from the list and stops the loop if there are
+        no devices left.
+
+        :param wsg_device: Device to remove.
+        :type wsg_device: WsgDevice
+        """
         with cls._lock:
-            if len(cls._device_list) == 0:
-                cls._stop_wsg_data_loop.set()
-                cls._is_data_task_running = False
+            if wsg_device in cls._device_list:
+                cls._device_list.remove(wsg_device)
+            cls._read_plans.pop(wsg_device, None)
+            if len(cls._device_list) == 0 and cls._loop is not None:
+                cls._loop.call_soon_threadsafe(cls._loop.stop)
+                cls._loop = None
+
+    @classmethod
+    async def _open_device(cls, wsg_device: WsgDevice):
+        """Connects the socket of a device and creates its stream reader.
+
+        :param wsg_device: Device to connect.
+        :type wsg_device: WsgDevice
+        :raises OSError: if the connection failed.
+        :raises asyncio.TimeoutError: if the gripper did not answer within
+            CONNECT_TIMEOUT_SEC.
+        """
+        port = wsg_device.port_handler
+        port.setblocking(False)
+        await asyncio.wait_for(asyncio.get_running_loop().sock_connect(
+            port, (wsg_device.address, wsg_device.tcp_port)),
+            CONNECT_TIMEOUT_SEC)
+        cls._stream_readers[wsg_device] = WsgStreamReader()
+
+    @classmethod
+    def _start_polling(cls, wsg_device: WsgDevice, read_plan: WsgReadPlan):
+        """Creates the task that polls a device. Runs in the loop.
+
+        :param wsg_device: Device to poll.
+        :type wsg_device: WsgDevice
+        :param read_plan: requests of the device.
+        :type read_plan: WsgReadPlan
+        """
+        stream_reader = cls._stream_readers.get(wsg_device)
+        if stream_reader is None:
+            return
+        stop_event = asyncio.Event()
+        cls._stop_events[wsg_device] = stop_event
+        cls._poll_tasks[wsg_device] = asyncio.get_running_loop().create_task(
+            cls._poll_device(wsg_device, read_plan, stream_reader,
+                             stop_event))
+
+    @classmethod
+    async def _close_device(cls, wsg_device: WsgDevice):
+        """Stops polling a device. The socket is closed by the caller.
+
+        The task is not cancelled, because asyncio.wait_for of Python 3.11
+        and older drops the cancellation if the read finishes at the same
+        time. The task checks the stop event on every cycle instead, and
+        shutting down the socket wakes up a pending read.
+
+        :param wsg_device: Device to close.
+        :type wsg_device: WsgDevice
+        """
+        stop_event = cls._stop_events.pop(wsg_device, None)
+        if stop_event is not None:
+            stop_event.set()
+        task = cls._poll_tasks.pop(wsg_device, None)
+        if task is not None and task is not asyncio.current_task():
+            try:
+                wsg_device.port_handler.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            await asyncio.wait({task}, timeout=STOP_TIMEOUT_SEC)
+            if not task.done():
+                task.cancel()
+        cls._stream_readers.pop(wsg_device, None)
 
     @classmethod
     def make_frame(cls, payload: bytearray) -> bytearray:
@@ -202,7 +474,9 @@ class WsgGripperTouchSdk:
 
         :param frame: Frame to decode
         :type frame: bytes
-        :return: payload of the frame or None
+        :return: payload of the frame or None if the frame is not valid. It
+            is a slice of frame, so passing a memoryview does not copy the
+            payload.
         :rtype: bytearray
         """
         if len(frame) < RESPONSE_MIN_LENGTH:
@@ -217,63 +491,137 @@ class WsgGripperTouchSdk:
             return None
 
         payload_size = frame[4] | (frame[5] << 8)
-        payload = bytearray()
-        for index in range(payload_size):
-            payload.append(frame[index+6])
-        return payload
+        payload_end = HEADER_SIZE + payload_size
+        if len(frame) < payload_end + CRC_SIZE:
+            return None
+
+        # Verify the CRC of header and payload.
+        crc = frame[payload_end] | (frame[payload_end + 1] << 8)
+        if TouchDetectUtils.checksum_update_crc16(frame[:payload_end]) != crc:
+            return None
+        return frame[HEADER_SIZE:payload_end]
+
+    @staticmethod
+    def decode_frame_batch(frames, taxels_array_size: tuple) -> tuple:
+        """Decodes several sensor responses from WSG gripper at once.
+
+        :param frames: contiguous buffer with the frames one after the other
+            or list of frames.
+        :type frames: bytes or list[bytes]
+        :param taxels_array_size: Size of the sensor array.
+        :type taxels_array_size: tuple
+        :return: (N, rows, columns) uint16 array and a boolean mask with the
+            frames that were decoded. Invalid entries are filled with 0.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        payload_size = taxels_array_size[0] * taxels_array_size[1] * 2
+        matrix, valid = TouchDetectUtils.stack_frames(
+            frames, HEADER_SIZE + payload_size + CRC_SIZE)
+
+        # Check the header and the CRC of all the frames.
+        valid &= (matrix[:, :4] == np.frombuffer(
+            HEADER_ID, dtype=np.uint8)).all(axis=1)
+        valid &= (matrix[:, 4] | (matrix[:, 5].astype(np.uint16) << 8)) == \
+            payload_size
+        crc = matrix[:, -2] | (matrix[:, -1].astype(np.uint16) << 8)
+        valid &= TouchDetectUtils.checksum_crc16_batch(matrix[:, :-2]) == crc
+
+        payloads = np.ascontiguousarray(
+            matrix[:, HEADER_SIZE:HEADER_SIZE + payload_size])
+        taxel_arrays, _ = TouchDetectUtils.to_taxel_array_batch(
+            taxels_array_size, payloads)
+        taxel_arrays[~valid] = 0
+        return taxel_arrays, valid
+
+    @staticmethod
+    async def _read_payload(loop: asyncio.AbstractEventLoop,
+                            port: socket.socket,
+                            stream_reader: WsgStreamReader,
+                            taxels_array_size: tuple) -> np.ndarray:
+        """Reads the response to a request and decodes the sensor data.
+
+        :param loop: loop where the socket is used.
+        :type loop: asyncio.AbstractEventLoop
+        :param port: socket connected to the gripper.
+        :type port: socket.socket
+        :param stream_reader: reader of the gripper.
+        :type stream_reader: WsgStreamReader
+        :param taxels_array_size: Size of the sensor array.
+        :type taxels_array_size: tuple
+        :raises ConnectionResetError: if the connection was closed.
+        :return: taxel array or None if the frame was not valid.
+        :rtype: np.ndarray
+        """
+        frame = await asyncio.wait_for(
+            stream_reader.read_frame_async(loop, port), RESPONSE_TIMEOUT_SEC)
+        if frame is None:
+            raise ConnectionResetError('Connection closed by the gripper')
+        payload = WsgGripperTouchSdk.decode_frame(frame)
+        if not payload:
+            return None
+        # The frame is a view of the buffer of the reader, so it is
+        # decoded before reading the next one.
+        return TouchDetectUtils.to_taxel_array(taxels_array_size, payload)
 
     @classmethod
-    def _wsg_data_task(cls):
-        """Task for handling packages from WSG gripper.
+    async def _poll_device(cls, device: WsgDevice, read_plan: WsgReadPlan,
+                           stream_reader: WsgStreamReader,
+                           stop_event: asyncio.Event):
+        """Task that polls one gripper. Left and right requests are sent
+        together and then both responses are awaited, so each cycle takes
+        about one round trip.
+
+        :param device: Device to poll.
+        :type device: WsgDevice
+        :param read_plan: requests of the device.
+        :type read_plan: WsgReadPlan
+        :param stream_reader: reassembles the frames of the device.
+        :type stream_reader: WsgStreamReader
+        :param stop_event: set when the device is disconnected.
+        :type stop_event: asyncio.Event
         """
-        logging.debug('WSG data task initialized')
+        loop = asyncio.get_running_loop()
+        port = device.port_handler
+        taxels_array_size = device.taxels_array_size
+        try:
+            while not stop_event.is_set():
+                cycle_start = loop.time()
+                await loop.sock_sendall(port, read_plan.requests)
+
+                left_array = await cls._read_payload(
+                    loop, port, stream_reader, taxels_array_size)
+                right_array = await cls._read_payload(
+                    loop, port, stream_reader, taxels_array_size)
+                if stop_event.is_set():
+                    break
+                if left_array is not None and right_array is not None:
+                    device.taxels_array_left = left_array
+                    device.taxels_array_right = right_array
+                    device.fire_event(WsgEventType.NEW_DATA, [
+                        device.taxels_array_left,
+                        device.taxels_array_right])
+
+                await asyncio.sleep(cycle_start + UPDATE_RATE - loop.time())
+        except (RuntimeError, OSError, asyncio.TimeoutError):
+            # Reads fail after the socket is shut down by a disconnection.
+            if stop_event.is_set():
+                return
+            logging.error(
+                '''Error getting data from gripper.
+                Disconnecting device''')
+            cls.disconnect(device)
 
-        # Iterate until signal is set.
-        while not cls._stop_wsg_data_loop.is_set():
-            with cls._lock:
-                # Iterate through devices.
-                for device in cls._device_list:
-                    try:
-                        # Calculate biggest frame.
-                        n_bytes = device.taxels_array_size[0] * \
-                            device.taxels_array_size[1] * 2
-                        n_bytes += len(TRANSACTION_ID)
-                        n_bytes += len(PROTOCOL_ID)
-                        n_bytes += 4
-
-                        # Read left sensor
-                        frame = cls.make_frame(READ_LEFT_SENSOR_COMMAND)
-                        device.port_handler.send(frame)
-                        data = device.port_handler.recv(n_bytes)
-                        if not data:
-                            continue
-                        payload = cls.decode_frame(data)
-                        if not payload:
-                            continue
-                        device.taxel_array_left = \
-                            TouchDetectUtils.to_taxel_array(
-                                device.taxels_array_size, payload)
-
-                        # Read right sensor
-                        frame = cls.make_frame(READ_RIGHT_SENSOR_COMMAND)
-                        device.port_handler.send(frame)
-                        data = device.port_handler.recv(n_bytes)
-                        if not data:
-                            continue
-                        payload = cls.decode_frame(data)
-                        if not payload:
-                            continue
-                        device.taxel_array_right = \
-                            TouchDetectUtils.to_taxel_array(
-                                device.taxels_array_size, payload)
-                        device.fire_event(WsgEventType.NEW_DATA, [
-                            device.taxel_array_left, device.taxel_array_right])
-                    except (RuntimeError, ConnectionAbortedError):
-                        logging.error(
-                            '''Error getting data from gripper.
-                            Disconnecting device''')
-                        cls.disconnect(device)
-                        continue
-            time.sleep(UPDATE_RATE)
+    @classmethod
+    def _wsg_data_task(cls, loop: asyncio.AbstractEventLoop):
+        """Thread that runs the loop polling the grippers.
 
+        :param loop: loop to run.
+        :type loop: asyncio.AbstractEventLoop
+        """
+        logging.debug('WSG data task initialized')
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
         logging.debug('WSG data task finished')